@@ -0,0 +1,233 @@
+"""
+Admission control in front of the ASGI app (asgi.py), ahead of both the
+FastAPI routes and the Flask thread pool.
+
+- Expensive routes each get a RouteLimit: at most `concurrency` requests run
+  at once, up to `queue` more wait in FIFO order for at most `timeout`
+  seconds. A request finding the queue full, or timing out in it, is turned
+  away at once with 503. As long as the limits add up to less than the Flask
+  thread pool, full scans can never occupy every thread, so logins, health
+  checks and writes keep being served when analytics are overloaded.
+- Every caller gets a TokenBucket: authenticated callers keyed by user id,
+  anonymous ones by client address. An empty bucket answers 429.
+
+Both rejections carry Retry-After. All state is per process and only touched
+on the event loop, so nothing here takes a lock; stats() may be read from
+any thread.
+"""
+import asyncio
+import contextlib
+import json
+import math
+import time
+from collections import OrderedDict, deque
+
+import metrics
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """Spend a token; returns 0, or the seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """A TokenBucket per key; the least recently seen keys are forgotten past maxsize"""
+
+    def __init__(self, rate, burst, maxsize=10000):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self.limited = 0
+
+    def check(self, key):
+        """0 if key may proceed, else the seconds it should wait"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        wait = bucket.take(now)
+        if wait:
+            self.limited += 1
+        return wait
+
+    def stats(self):
+        return {"rate": self.rate, "burst": self.burst, "keys": len(self._buckets), "limited": self.limited}
+
+
+class RouteLimit:
+    def __init__(self, concurrency, queue, timeout):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self):
+        """Take a slot, queueing if needed; False if the request must be turned away"""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # handed a slot just as it gave up
+            else:
+                with contextlib.suppress(ValueError):  # already skipped by release()
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timeouts += 1
+            return False
+        self.admitted += 1
+        return True
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def release(self):
+        """Hand the slot to the longest waiting request, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued": self.queued,
+            "queue": self.queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts
+        }
+
+
+class AdmissionControl:
+    """
+    routes: {path: (concurrency, queue)}; user_rate/anonymous_rate:
+    (requests per second, burst) or None for no limit; identify(scope)
+    returns a user key, or None for anonymous requests.
+    """
+
+    def __init__(self, routes, queue_timeout, retry_after, user_rate, anonymous_rate, identify):
+        self.routes = {
+            path: RouteLimit(concurrency, queue, queue_timeout) for path, (concurrency, queue) in routes.items()
+        }
+        self.retry_after = retry_after
+        self.users = RateLimiter(*user_rate) if user_rate else None
+        self.anonymous = RateLimiter(*anonymous_rate) if anonymous_rate else None
+        self.identify = identify
+
+    def rate_check(self, scope):
+        """0 or the seconds the caller of scope should wait"""
+        user = self.identify(scope)
+        if user is not None:
+            return self.users.check(user) if self.users else 0
+        if self.anonymous is None:
+            return 0
+        client = scope.get("client")
+        return self.anonymous.check(client[0] if client else "")
+
+    def stats(self):
+        return {
+            "routes": {path: limit.stats() for path, limit in self.routes.items()},
+            "users": self.users.stats() if self.users else None,
+            "anonymous": self.anonymous.stats() if self.anonymous else None
+        }
+
+    def render_prometheus(self):
+        routes = [({"route": path}, limit) for path, limit in sorted(self.routes.items())]
+        limiters = [({"caller": name}, limiter) for name, limiter in (("user", self.users), ("anonymous", self.anonymous))
+                    if limiter is not None]
+        lines = []
+        lines += metrics.render_family(
+            "admission_active_requests", "gauge", "Requests holding a slot of a limited route.",
+            [(labels, limit.active) for labels, limit in routes]
+        )
+        lines += metrics.render_family(
+            "admission_queued_requests", "gauge", "Requests waiting for a slot of a limited route.",
+            [(labels, limit.queued) for labels, limit in routes]
+        )
+        lines += metrics.render_family(
+            "admission_rejected_total", "counter", "Requests turned away with 503, by reason.",
+            [({**labels, "reason": "queue_full"}, limit.rejected) for labels, limit in routes]
+            + [({**labels, "reason": "timeout"}, limit.timeouts) for labels, limit in routes]
+        )
+        lines += metrics.render_family(
+            "rate_limited_total", "counter", "Requests turned away with 429.",
+            [(labels, limiter.limited) for labels, limiter in limiters]
+        )
+        return "\n".join(lines) + "\n"
+
+
+async def _reject(send, status, message, retry_after):
+    body = json.dumps({"status": "error", "message": message}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            # Outside the apps' own CORS handling; both allow every origin
+            (b"access-control-allow-origin", b"*"),
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class ASGIMiddleware:
+    def __init__(self, app, control):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        wait = self.control.rate_check(scope)
+        if wait:
+            return await _reject(send, 429, "Too many requests", wait)
+
+        limit = self.control.routes.get(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+        if not await limit.acquire():
+            return await _reject(send, 503, "Server busy, try again later", self.control.retry_after)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
@@ -0,0 +1,81 @@
+"""
+Vectorized folds of sales rows into changes to the maintained aggregates
+(ProductStats, MonthlySales and the day grains of SalesRollup; see main.py).
+
+Rows are (product_id, sales, day, category_id) tuples, day the sale date
+as YYYYMMDD (see periods.py). Each fold is one np.unique over a packed
+int64 key plus bincounts, so an ingest batch of tens of thousands of rows
+folds in milliseconds instead of a Python loop per row.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# Arrays, one entry per touched product / cell
+ProductChanges = namedtuple("ProductChanges", ["products", "counts", "totals", "total_sqs", "mins", "maxs"])
+MonthlyChanges = namedtuple("MonthlyChanges", ["periods", "products", "categories", "counts", "totals"])
+DailyChanges = namedtuple("DailyChanges", ["days", "categories", "counts", "totals"])
+SalesChanges = namedtuple("SalesChanges", ["products", "monthly", "daily"])
+
+
+def _group(*parts):
+    """Distinct combinations of equal-length int64 arrays -> ([distinct part arrays], inverse)"""
+    bases = [int(part.max(initial=0)) + 1 for part in parts]
+    key = np.zeros(len(parts[0]), dtype=np.int64)
+    for part, base in zip(parts, bases):
+        key = key * base + part
+    keys, inverse = np.unique(key, return_inverse=True)
+
+    distinct = []
+    for base in reversed(bases):
+        distinct.append(keys % base)
+        keys = keys // base
+    return distinct[::-1], inverse
+
+
+def fold_sales(rows):
+    """Fold (product_id, sales, day, category_id) rows into SalesChanges"""
+    rows = list(rows)
+    if rows:
+        products, sales, days, categories = (np.array(column) for column in zip(*rows))
+    else:
+        products, sales, days, categories = (np.zeros(0) for _ in range(4))
+    products = products.astype(np.int64)
+    sales = sales.astype(np.float64)
+    days = days.astype(np.int64)
+    categories = categories.astype(np.int64)
+
+    # Per product; min/max from a sort by (product, sales)
+    (ids,), inverse = _group(products)
+    counts = np.bincount(inverse, minlength=len(ids))
+    order = np.lexsort((sales, inverse))
+    starts = np.cumsum(counts) - counts
+    product_changes = ProductChanges(
+        ids, counts, np.bincount(inverse, weights=sales, minlength=len(ids)),
+        np.bincount(inverse, weights=sales * sales, minlength=len(ids)),
+        sales[order[starts]], sales[order[starts + counts - 1]]
+    )
+
+    (periods, cell_products, cell_categories), inverse = _group(days // 100, products, categories)
+    monthly = MonthlyChanges(
+        periods, cell_products, cell_categories,
+        np.bincount(inverse, minlength=len(periods)), np.bincount(inverse, weights=sales, minlength=len(periods))
+    )
+
+    (cell_days, cell_categories), inverse = _group(days, categories)
+    daily = DailyChanges(
+        cell_days, cell_categories,
+        np.bincount(inverse, minlength=len(cell_days)), np.bincount(inverse, weights=sales, minlength=len(cell_days))
+    )
+    return SalesChanges(product_changes, monthly, daily)
+
+
+def from_rows(changes, rows):
+    """
+    MonthlyChanges or DailyChanges (the changes type) from (*key, count,
+    total) rows, e.g. cells read back from the database
+    """
+    rows = list(rows)
+    columns = [np.array(column) for column in (zip(*rows) if rows else [()] * len(changes._fields))]
+    *keys, counts, totals = columns
+    return changes(*(key.astype(np.int64) for key in keys), counts.astype(np.int64), totals.astype(np.float64))
@@ -0,0 +1,138 @@
+"""
+Vectorized anomaly scoring over monthly sales aggregates.
+
+All series (grand total, per product, per category) are stacked into one
+(series x periods) matrix and scored in a single NumPy pass. Cells a series
+never sold in are NaN and are left out of the statistics and the results.
+"""
+import warnings
+
+import numpy as np
+
+from periods import month_name, period_label
+
+MODES = ("zscore", "robust", "rolling")
+DIMENSIONS = ("total", "product", "category")
+
+DEFAULT_THRESHOLDS = {"zscore": 2.0, "robust": 3.5, "rolling": 2.0}
+
+
+def _row_mean_std(values):
+    """NaN-aware population mean/std along the last axis, plus observation count"""
+    observed = ~np.isnan(values)
+    count = observed.sum(axis=-1)
+    filled = np.where(observed, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = filled.sum(axis=-1) / count
+        sq = np.where(observed, (values - mean[..., None]) ** 2, 0.0)
+        std = np.sqrt(sq.sum(axis=-1) / count)
+    return mean, std, count
+
+
+def _zscore(matrix):
+    mean, std, _ = _row_mean_std(matrix)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = (matrix - mean[:, None]) / std[:, None]
+    return np.where(std[:, None] > 0, scores, 0.0)
+
+
+def _robust(matrix):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(matrix, axis=1)
+        mad = np.nanmedian(np.abs(matrix - median[:, None]), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = 0.6745 * (matrix - median[:, None]) / mad[:, None]
+    return np.where(mad[:, None] > 0, scores, 0.0)
+
+
+def _rolling(matrix, window):
+    # Each month is compared against the `window` months before it
+    padded = np.pad(matrix, ((0, 0), (window, 0)), constant_values=np.nan)
+    trailing = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)[:, :matrix.shape[1]]
+    mean, std, count = _row_mean_std(trailing)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = (matrix - mean) / std
+    return np.where((count >= 2) & (std > 0), scores, 0.0)
+
+
+def score_matrix(matrix, mode="zscore", window=3):
+    """Row-wise anomaly scores for a (series x periods) matrix"""
+    if mode == "zscore":
+        scores = _zscore(matrix)
+    elif mode == "robust":
+        scores = _robust(matrix)
+    elif mode == "rolling":
+        scores = _rolling(matrix, window)
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+    return np.where(np.isnan(matrix), np.nan, scores)
+
+
+def build_matrices(periods, products, categories, totals, dimensions=DIMENSIONS):
+    """
+    Pivot aggregate rows (parallel sequences, periods as YYYYMM ints) into
+    one stacked matrix. Returns (matrix, columns, series): columns are the
+    sorted periods, one per matrix column, and series is a list of
+    (dimension, label) pairs, one per matrix row.
+    """
+    labels, period_codes = np.unique(np.asarray(periods, dtype=np.int64), return_inverse=True)
+    n_periods = len(labels)
+    totals = np.asarray(totals, dtype=np.float64)
+    columns = labels.tolist()
+
+    blocks = []
+    series = []
+    for dimension in dimensions:
+        if dimension == "total":
+            labels = np.array(["total"])
+            codes = np.zeros(len(period_codes), dtype=np.int64)
+        else:
+            labels, codes = np.unique(
+                np.asarray(products if dimension == "product" else categories, dtype=object).astype(str),
+                return_inverse=True
+            )
+
+        flat = codes * n_periods + period_codes
+        size = len(labels) * n_periods
+        sums = np.bincount(flat, weights=totals, minlength=size)
+        seen = np.bincount(flat, minlength=size) > 0
+        blocks.append(np.where(seen, sums, np.nan).reshape(len(labels), n_periods))
+        series.extend((dimension, label) for label in labels.tolist())
+
+    matrix = np.vstack(blocks) if blocks else np.empty((0, n_periods))
+    return matrix, columns, series
+
+
+def detect(periods, products, categories, totals, mode="zscore", window=3,
+           threshold=None, dimensions=DIMENSIONS):
+    """Score every requested series and return {dimension: [result, ...]}"""
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLDS[mode]
+
+    results = {dimension: [] for dimension in dimensions}
+    if len(periods) == 0:
+        return results
+
+    matrix, columns, series = build_matrices(periods, products, categories, totals, dimensions)
+    scores = score_matrix(matrix, mode, window)
+
+    rows, cols = np.nonzero(~np.isnan(matrix))
+    values = matrix[rows, cols].tolist()
+    z_scores = np.round(scores[rows, cols], 2).tolist()
+    flags = (np.abs(scores[rows, cols]) >= threshold).tolist()
+
+    for row, col, value, z_score, flag in zip(rows.tolist(), cols.tolist(), values, z_scores, flags):
+        dimension, label = series[row]
+        result = {
+            "month": month_name(columns[col]),
+            "period": period_label(columns[col]),
+            "sales": value,
+            "z_score": z_score,
+            "anomaly": flag
+        }
+        if dimension != "total":
+            result[dimension] = label
+        results[dimension].append(result)
+
+    return results
@@ -0,0 +1,73 @@
+"""
+Single ASGI application serving every backend endpoint on one port.
+
+    flask --app main init-db          # once per deploy: migrate, create tables, seed
+    uvicorn asgi:app --port 5000      # one process, or:
+    gunicorn -c gunicorn.conf.py      # prefork workers, see gunicorn.conf.py
+
+Routes are matched in this order:
+- routers/analytics.py: recommendations, anomalies, forecasts, rollups and
+  distributions, async over aiosqlite
+- routers/stream.py: GET /stream/analytics, server-sent analytics deltas
+- routers/sales.py: the sales list, single and bulk writes, GET /sales
+- routers/anomalies.py, summary.py: the dashboard's anomalies, POST
+  /summarize (with or without a token) and GET /summaries
+- routers/auth.py, jobs.py: login, registration and the job routes
+- everything else: the Flask app in main.py behind a WSGI bridge, whose
+  requests run on a thread pool so they never block the event loop. That
+  is GET/POST /export/pdf, served by send_file with conditional and range
+  responses, POST /ingest-sales, which spools its upload by blocking reads
+  on the request stream, and the cheap /cache-stats, /metrics and /
+
+Both apps feed the same request metrics (GET /metrics): the Flask app
+records its own requests, the FastAPI side everything its routers handle
+except the event streams, whose duration is the client's to choose.
+
+Admission control (admission.py, limits in main.py's ADMISSION_* and
+RATE_LIMIT_* config) wraps both: expensive routes are capped per worker
+and callers rate limited before either app sees the request.
+"""
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Mount
+
+import admission
+import metrics
+from async_db import async_engine
+from main import admission_control, app as flask_app, job_scheduler, load_summarizer, request_metrics
+from routers import analytics, anomalies, auth, jobs, sales, stream, summary
+
+
+@asynccontextmanager
+async def lifespan(_):
+    # The database is initialized by `flask init-db`, not per worker. A model
+    # that won't load stops the worker here rather than failing its requests
+    await run_in_threadpool(load_summarizer)
+    yield
+    job_scheduler.shutdown()
+    await async_engine.dispose()
+
+
+api = FastAPI(title="AI Business Manager", lifespan=lifespan)
+api.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+api.add_middleware(
+    metrics.ASGIMiddleware, metrics=request_metrics,
+    skip_route=lambda route: isinstance(route, Mount) or route.path == "/stream/analytics"
+)
+
+api.include_router(analytics.router)
+api.include_router(stream.router)
+api.include_router(sales.router)
+api.include_router(anomalies.router)
+api.include_router(summary.router)
+api.include_router(auth.router)
+api.include_router(jobs.router)
+
+api.mount("/", WSGIMiddleware(flask_app, workers=flask_app.config['WSGI_THREADS']))
+
+# Outermost, so limited requests are turned away before taking a Flask thread
+app = admission.ASGIMiddleware(api, admission_control)
@@ -0,0 +1,26 @@
+"""
+Async SQLAlchemy engine (aiosqlite) on the same database file as the Flask
+app, for the natively async routes served by asgi.py. These routes only
+read, so its connections are query-only WAL readers like main.read_engine.
+"""
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import metrics
+import storage
+from main import app, db, logger, request_metrics
+
+
+def _async_url():
+    with app.app_context():
+        return db.engine.url.set(drivername="sqlite+aiosqlite")
+
+
+async_engine = create_async_engine(
+    _async_url(), pool_size=app.config['SQLITE_READ_POOL_SIZE'], max_overflow=0, pool_timeout=30
+)
+storage.apply_pragmas(async_engine.sync_engine, app.config['SQLITE_PRAGMAS'], read_only=True)
+storage.reset_after_fork(async_engine.sync_engine)
+metrics.instrument_engine(
+    async_engine.sync_engine, "async", request_metrics, app.config['SLOW_QUERY_THRESHOLD'], logger
+)
+async_session = async_sessionmaker(async_engine, expire_on_commit=False)
@@ -0,0 +1,407 @@
+"""
+Benchmarks for the sales endpoints.
+
+    python benchmark.py                                  # 10k rows, in-process and HTTP
+    python benchmark.py --rows 1m --mode inprocess --output results.json
+    python benchmark.py --rows 10k --save-baseline benchmark_baseline.json
+    python benchmark.py --rows 10k --baseline benchmark_baseline.json --tolerance 0.25
+
+A dataset is generated by datagen.py and ingested once into a pristine
+database under --data-dir, keyed by (rows, seed). Every run works on fresh
+copies of it, so every run starts from the same data.
+
+Each scenario sends a fixed number of requests to one endpoint:
+
+- inprocess: one by one through the Flask test client, so the numbers are
+  the app's own cost without a network or server in the way. "-cold"
+  scenarios bump the data version before each request, so every response
+  is rebuilt instead of served from the cache
+- http: over keep-alive connections from --concurrency threads against
+  uvicorn serving asgi:app in a child process; cold scenarios are skipped
+
+Results (throughput and latency percentiles per scenario) are printed and
+written as JSON. Against a --baseline, a scenario regresses when its p95
+latency grows or its throughput drops by more than --tolerance, and the
+exit status is 1. Baselines only make sense on the machine that recorded
+them, for the same rows and seed.
+"""
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import datagen
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ("inprocess", "http")
+BULK_BATCH_ROWS = 100
+SERVER_START_TIMEOUT = 60  # seconds
+
+# requests: per run, before --scale; auth: needs the admin token
+Scenario = namedtuple("Scenario", ["name", "method", "path", "auth", "cold", "requests"])
+
+SCENARIOS = (
+    Scenario("recommendation", "GET", "/recommendation", False, False, 200),
+    Scenario("recommendation-cold", "GET", "/recommendation", False, True, 20),
+    Scenario("anomalies", "GET", "/anomalies", False, False, 200),
+    Scenario("anomalies-cold", "GET", "/anomalies", False, True, 20),
+    Scenario("get-all-sales-page", "GET", "/get-all-sales?limit=500", True, False, 200),
+    Scenario("get-all-sales-stream", "GET", "/get-all-sales?format=csv", True, False, 3),
+    Scenario("bulk-add-sales", "POST", "/bulk-add-sales", True, False, 50),
+)
+
+
+class BenchmarkError(Exception):
+    """A benchmark request failed"""
+
+
+# ----- datasets -----
+
+def _database_env(path):
+    return dict(os.environ, FLASK_SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.abspath(path)}", FLASK_LOG_LEVEL="WARNING")
+
+
+def _remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+
+def build_database(rows, seed):
+    """Initialize the configured database and ingest the dataset (runs in a child process)"""
+    import main
+    from sqlalchemy import text
+
+    main.init_database()
+    with main.app.app_context():
+        started = time.perf_counter()
+        result = main.ingest_sales(datagen.SalesGenerator(rows, seed=seed).column_batches())
+        elapsed = time.perf_counter() - started
+        # Fold the WAL into the database file, which is then copied on its own
+        main.db.session.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        main.db.session.commit()
+        main.db.session.remove()
+        main.db.engine.dispose()
+    main.read_engine.dispose()
+    print(f"Ingested {result['inserted']:,} rows in {elapsed:.1f}s")
+
+
+def pristine_database(rows, seed, data_dir):
+    """Path of the prepared database for (rows, seed), building it if needed"""
+    path = os.path.join(data_dir, f"sales-{rows}-{seed}.db")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(data_dir, exist_ok=True)
+    building = path + ".building"
+    _remove_database(building)
+    print(f"Preparing a {rows:,}-row dataset (seed {seed}) in {path}")
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--build", "--rows", str(rows), "--seed", str(seed)],
+        cwd=BACKEND_DIR, env=_database_env(building), check=True
+    )
+    os.replace(building, path)
+    _remove_database(building)
+    return path
+
+
+def working_copy(pristine, name):
+    path = os.path.join(os.path.dirname(pristine), name)
+    _remove_database(path)
+    shutil.copyfile(pristine, path)
+    return path
+
+
+# ----- measurement -----
+
+def summarize(latencies, wall):
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "requests": len(ms),
+        "throughput_rps": round(len(ms) / wall, 2),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3)
+    }
+
+
+def bulk_bodies(count, seed):
+    """count /bulk-add-sales bodies of BULK_BATCH_ROWS generated rows each"""
+    records = datagen.SalesGenerator(count * BULK_BATCH_ROWS, seed=seed + 1).records()
+    return [
+        {"sales": [
+            {"product": product, "sales": sales, "date": date, "category": category}
+            for product, sales, date, category in itertools.islice(records, BULK_BATCH_ROWS)
+        ]}
+        for _ in range(count)
+    ]
+
+
+def _request_count(scenario, scale):
+    return max(1, round(scenario.requests * scale))
+
+
+def run_inprocess(scenarios, scale, seed):
+    import main
+
+    client = main.app.test_client()
+    response = client.post("/login", json={"username": "admin", "password": "123"})
+    headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+    def _bump_version():
+        with main.app.app_context():
+            main.bump_data_version()
+            main.db.session.commit()
+
+    results = {}
+    for scenario in scenarios:
+        count = _request_count(scenario, scale)
+        bodies = bulk_bodies(count + 1, seed) if scenario.method == "POST" else None
+
+        def _send(i):
+            response = client.open(
+                scenario.path, method=scenario.method, json=bodies[i] if bodies else None,
+                headers=headers if scenario.auth else None, buffered=True
+            )
+            if response.status_code >= 400:
+                raise BenchmarkError(f"{scenario.name}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+        _send(count)  # warm-up, not measured
+        latencies = []
+        for i in range(count):
+            if scenario.cold:
+                _bump_version()
+            started = time.perf_counter()
+            _send(i)
+            latencies.append(time.perf_counter() - started)
+        results[scenario.name] = summarize(latencies, sum(latencies))
+        _report("inprocess", scenario.name, results[scenario.name])
+    return results
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _http(conn, method, path, body=None, headers=None):
+    payload = None if body is None else json.dumps(body).encode()
+    headers = dict(headers or {})
+    if payload is not None:
+        headers["Content-Type"] = "application/json"
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def _wait_for_server(server, port):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise BenchmarkError(f"Server exited with status {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            status, _ = _http(conn, "GET", "/")
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise BenchmarkError("Server did not start")
+
+
+def _load(port, scenario, headers, bodies, count, concurrency):
+    """Send count requests from concurrency keep-alive connections; returns (latencies, wall)"""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+
+    def _worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        try:
+            while True:
+                with lock:
+                    i = next(counter)
+                if i >= count:
+                    return
+                started = time.perf_counter()
+                status, data = _http(conn, scenario.method, scenario.path, bodies[i] if bodies else None, headers)
+                elapsed = time.perf_counter() - started
+                if status >= 400:
+                    raise BenchmarkError(f"{scenario.name}: HTTP {status} {data[:200]!r}")
+                with lock:
+                    latencies.append(elapsed)
+        finally:
+            conn.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(_worker) for _ in range(concurrency)]:
+            future.result()
+    return latencies, time.perf_counter() - started
+
+
+def run_http(database, scenarios, scale, seed, concurrency):
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=_database_env(database)
+    )
+    results = {}
+    try:
+        _wait_for_server(server, port)
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        status, data = _http(conn, "POST", "/login", {"username": "admin", "password": "123"})
+        conn.close()
+        if status != 200:
+            raise BenchmarkError(f"Login failed: HTTP {status}")
+        headers = {"Authorization": f"Bearer {json.loads(data)['token']}"}
+
+        for scenario in scenarios:
+            if scenario.cold:
+                continue
+            count = _request_count(scenario, scale)
+            bodies = bulk_bodies(count + concurrency, seed) if scenario.method == "POST" else None
+            # Warm-up: one request per connection, not measured
+            _load(port, scenario, headers, bodies[count:] if bodies else None, concurrency, concurrency)
+            latencies, wall = _load(port, scenario, headers, bodies, count, concurrency)
+            results[scenario.name] = summarize(latencies, wall)
+            _report("http", scenario.name, results[scenario.name])
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+def _report(mode, name, result):
+    print(
+        f"{mode:<10} {name:<22} {result['throughput_rps']:>10.1f} req/s"
+        f"  p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms"
+    )
+
+
+# ----- baselines -----
+
+def compare(results, baseline, tolerance):
+    """Regression messages for scenarios that got slower than baseline allows"""
+    regressions = []
+    for mode in MODES:
+        for name, base in baseline.get(mode, {}).items():
+            current = results.get(mode, {}).get(name)
+            if current is None:
+                continue
+            if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{mode} {name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{mode} {name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s"
+                )
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sales endpoints")
+    parser.add_argument("--rows", type=datagen.parse_rows, default=10_000,
+                        help="Dataset size: a row count or one of " + ", ".join(datagen.SIZES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=MODES + ("all",), default="all")
+    parser.add_argument("--scenarios", help="Comma-separated scenario names (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for each scenario's request count")
+    parser.add_argument("--concurrency", type=int, default=8, help="HTTP connections")
+    parser.add_argument("--data-dir", default=os.path.join(BACKEND_DIR, "instance", "benchmark"))
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Fail when results regress past this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as the new baseline")
+    parser.add_argument("--build", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.build:
+        build_database(args.rows, args.seed)
+        return 0
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        names = set(args.scenarios.split(","))
+        unknown = names - {s.name for s in SCENARIOS}
+        if unknown:
+            parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = [s for s in SCENARIOS if s.name in names]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["meta"]["rows"], baseline["meta"]["seed"]) != (args.rows, args.seed):
+            parser.error("The baseline was recorded for a different --rows/--seed")
+
+    pristine = pristine_database(args.rows, args.seed, args.data_dir)
+    results = {
+        "meta": {
+            "rows": args.rows,
+            "seed": args.seed,
+            "scale": args.scale,
+            "concurrency": args.concurrency,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created_at": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        }
+    }
+
+    if args.mode in ("http", "all"):
+        # Before the app is imported here, so the server starts from a clean process state
+        results["http"] = run_http(
+            working_copy(pristine, "run-http.db"), scenarios, args.scale, args.seed, args.concurrency
+        )
+    if args.mode in ("inprocess", "all"):
+        os.environ.update(_database_env(working_copy(pristine, "run-inprocess.db")))
+        results["inprocess"] = run_inprocess(scenarios, args.scale, args.seed)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
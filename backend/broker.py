@@ -0,0 +1,111 @@
+"""
+In-process fan-out of server-sent events.
+
+Each subscriber gets a bounded asyncio queue. publish() never waits: when a
+subscriber's queue is full (a slow or stalled client), its pending events
+are dropped and replaced by a single "resync" event, telling the client to
+refetch its state. A slow reader therefore costs at most maxsize queued
+events and never holds up the publisher or the other subscribers.
+
+Everything runs on the event loop; notify() is the only thread-safe entry
+point (for code committing on other threads).
+"""
+import asyncio
+import json
+
+RESYNC = "resync"
+
+
+def format_event(event, data, event_id=None):
+    """One text/event-stream message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def diff(old, new):
+    """(keys added or changed, keys removed) between two dicts"""
+    changed = [key for key, value in new.items() if old.get(key) != value]
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    async def next(self, timeout):
+        """The next message, or None after timeout seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._wake = None
+        self._loop = None
+        self.published = 0
+        self.resyncs = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        subscription = Subscription(self.maxsize)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, message):
+        """Queue an already formatted message for every subscriber"""
+        self.published += 1
+        for subscription in self._subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.resync(subscription)
+
+    def resync(self, subscription, data=None):
+        """Replace whatever subscription has pending with a single resync event"""
+        queue = subscription.queue
+        subscription.dropped += queue.qsize()
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(format_event(RESYNC, data or {}))
+        self.resyncs += 1
+
+    # ----- change signal -----
+
+    async def wait_for_change(self, timeout):
+        """Wait until notify() is called or timeout seconds pass"""
+        if self._wake is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def notify(self):
+        """Wake wait_for_change() early; callable from any thread"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "dropped": sum(s.dropped for s in self._subscribers)
+        }
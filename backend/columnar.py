@@ -0,0 +1,260 @@
+"""
+Columnar, memory-mapped snapshot of the SalesData rows.
+
+Row-level analytics (distributions, percentiles) can't be answered from the
+maintained aggregates, and loading rows through the ORM costs about 1 KB per
+row. Instead each column is kept in a flat file of fixed-width values:
+
+    id          int64
+    product     int32            Product.id, i.e. a dictionary code
+    category    int32            Category.id
+    period      int32            YYYYMM
+    day         int32            YYYYMMDD, the sale date
+    sales       float64
+    timestamp   datetime64[us]   when the row was recorded (NaT if unknown)
+
+Every process maps the files read-only, so the pages are shared through the
+OS page cache instead of copied per worker, and NumPy group-bys run straight
+over them.
+
+Refreshes are incremental: rows are only ever appended (ids grow), so new
+rows are those with an id above the last one in the snapshot. Updates and
+deletes bump a rewrite counter (main.RewriteVersion); when it moved, the
+snapshot is rebuilt into a new generation of files. A file that is mapped
+is never truncated or rewritten; old generations are only unlinked.
+meta.json names the current generation, its columns and how many rows of
+it are valid, and is replaced atomically last; files written with other
+columns are rebuilt. A file lock (POSIX) serializes refreshes across
+processes.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development servers only
+    fcntl = None
+
+COLUMNS = {
+    "id": np.dtype(np.int64),
+    "product": np.dtype(np.int32),
+    "category": np.dtype(np.int32),
+    "period": np.dtype(np.int32),
+    "day": np.dtype(np.int32),
+    "sales": np.dtype(np.float64),
+    "timestamp": np.dtype("datetime64[us]"),
+}
+ROW = np.dtype(list(COLUMNS.items()))  # one fetched row; converts a list of row tuples in one call
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+# version: data version the rows are at least as recent as; columns: {name: read-only array}
+Snapshot = namedtuple("Snapshot", ["version", "generation", "rows", "columns"])
+
+
+def group_quantiles(keys, values, quantiles):
+    """
+    Per-key count, mean, min, max and quantiles (linear interpolation, as
+    np.quantile) of values, with one sort. Returns (unique keys, counts,
+    means, mins, maxs, [array per quantile]).
+    """
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.r_[starts, len(keys)])
+    ends = starts + counts - 1
+
+    result = []
+    for q in quantiles:
+        position = starts + q * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, ends)
+        result.append(values[low] + (values[high] - values[low]) * (position - low))
+    sums = np.add.reduceat(values, starts) if len(keys) else np.zeros(0)
+    return keys[starts], counts, sums / np.maximum(counts, 1), values[starts], values[ends], result
+
+
+def distribution(snapshot, group_by=None, periods=(None, None), recorded=(None, None), members=None,
+                 quantiles=(0.5,)):
+    """
+    group_quantiles of the sales of the snapshot rows matching every filter,
+    per group_by column value (None: one group, key 0).
+    periods: inclusive YYYYMM bounds; recorded: inclusive "YYYY-MM-DD"
+    bounds on the timestamp; members: {column: allowed ids}. None is open.
+    """
+    columns = snapshot.columns
+    mask = np.ones(snapshot.rows, dtype=bool)
+    if periods[0] is not None:
+        mask &= columns["period"] >= periods[0]
+    if periods[1] is not None:
+        mask &= columns["period"] <= periods[1]
+    if recorded[0] is not None:
+        mask &= columns["timestamp"] >= np.datetime64(recorded[0], "us")
+    if recorded[1] is not None:
+        mask &= columns["timestamp"] < np.datetime64(recorded[1], "us") + np.timedelta64(1, "D")
+    for column, ids in (members or {}).items():
+        mask &= np.isin(columns[column], np.asarray(ids, dtype=COLUMNS[column]))
+
+    values = columns["sales"][mask]
+    keys = columns[group_by][mask] if group_by is not None else np.zeros(len(values), dtype=np.int32)
+    return group_quantiles(keys, values, quantiles)
+
+
+def bucket_sums(snapshot, bucket, group_by=(), days=(None, None), members=None):
+    """
+    Count and total of the sales of the snapshot rows matching every filter,
+    per (bucket(day), *group_by column values). days: inclusive YYYYMMDD
+    bounds; members as distribution(). Returns (keys, counts, totals):
+    keys has one row per key part and one column per group, in key order.
+    """
+    columns = snapshot.columns
+    mask = np.ones(snapshot.rows, dtype=bool)
+    if days[0] is not None:
+        mask &= columns["day"] >= days[0]
+    if days[1] is not None:
+        mask &= columns["day"] <= days[1]
+    for column, ids in (members or {}).items():
+        mask &= np.isin(columns[column], np.asarray(ids, dtype=COLUMNS[column]))
+
+    parts = [np.asarray(bucket(columns["day"][mask]), dtype=np.int64)]
+    parts += [columns[column][mask].astype(np.int64) for column in group_by]
+    keys, inverse = np.unique(np.stack(parts), axis=1, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse, minlength=keys.shape[1])
+    totals = np.bincount(inverse, weights=columns["sales"][mask], minlength=keys.shape[1])
+    return keys, counts, totals
+
+
+class ColumnarStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.appended = 0
+
+    def _path(self, name, generation):
+        return os.path.join(self.directory, f"{name}-{generation}.bin")
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.directory, META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, version, read_rewrites, read_rows):
+        """
+        Snapshot holding at least the rows of data version `version`.
+        If neither this process nor the files are that recent, refresh:
+        read_rewrites() returns the current rewrite counter and
+        read_rows(after_id) yields lists of (id, product_id, category_id,
+        period, day, sales, timestamp) rows with a greater id, in id order.
+        The counter is read before the rows, so a rewrite racing the refresh
+        is caught by the next one.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version >= version:
+            return snapshot
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._file_lock():
+                meta = self._read_meta()
+                if meta is None or meta["version"] < version or meta.get("columns") != list(COLUMNS):
+                    meta = self._refresh(meta, version, read_rewrites(), read_rows)
+            snapshot = self._snapshot
+            if snapshot is None or (snapshot.generation, snapshot.rows) != (meta["generation"], meta["rows"]):
+                snapshot = self._map(meta)
+            self._snapshot = snapshot = snapshot._replace(version=meta["version"])
+        return snapshot
+
+    def _map(self, meta):
+        rows = meta["rows"]
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            if rows:
+                columns[name] = np.memmap(self._path(name, meta["generation"]), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        return Snapshot(meta["version"], meta["generation"], rows, columns)
+
+    def _refresh(self, meta, version, rewrites, read_rows):
+        rebuild = (
+            meta is None or meta["rewrites"] != rewrites or meta.get("columns") != list(COLUMNS)
+            or not all(os.path.exists(self._path(name, meta["generation"])) for name in COLUMNS)
+        )
+        if rebuild:
+            meta = {"generation": (meta["generation"] + 1) if meta else 1, "rows": 0, "last_id": 0}
+        generation, rows, last_id = meta["generation"], meta["rows"], meta["last_id"]
+
+        files = {}
+        try:
+            for name, dtype in COLUMNS.items():
+                f = files[name] = open(self._path(name, generation), "wb" if rebuild else "r+b")
+                f.truncate(rows * dtype.itemsize)  # drop a half-written append; nobody maps past rows
+                f.seek(0, os.SEEK_END)
+
+            for chunk in read_rows(last_id):
+                block = np.array(chunk, dtype=ROW)
+                for name, f in files.items():
+                    f.write(block[name].tobytes())
+                rows += len(block)
+                last_id = int(block["id"][-1])
+                self.appended += len(block)
+
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            for f in files.values():
+                f.close()
+
+        meta = {
+            "generation": generation, "rows": rows, "last_id": last_id, "rewrites": rewrites, "version": version,
+            "columns": list(COLUMNS)
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".meta-", suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.directory, META_FILE))
+
+        self.refreshes += 1
+        if rebuild:
+            self.rebuilds += 1
+            current = {os.path.basename(self._path(name, generation)) for name in COLUMNS}
+            for entry in os.listdir(self.directory):
+                if entry.endswith(".bin") and entry not in current:
+                    with contextlib.suppress(OSError):  # still mapped elsewhere (Windows)
+                        os.unlink(os.path.join(self.directory, entry))
+        return meta
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "directory": self.directory,
+            "rows": snapshot.rows if snapshot else None,
+            "version": snapshot.version if snapshot else None,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "appended": self.appended
+        }
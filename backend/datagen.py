@@ -0,0 +1,139 @@
+"""
+Deterministic synthetic sales data for benchmarks.
+
+    python datagen.py 1000000 sales.csv
+    python datagen.py 10m sales.ndjson --seed 7
+
+The same (rows, seed, options) always produce the same rows, generated
+CHUNK_ROWS at a time so memory stays flat at any size:
+
+- products are drawn from a Zipf-like distribution, so a few products carry
+  most of the rows, and each product belongs to one category
+- values follow a per-product base level, a yearly seasonal cycle with a
+  per-category phase, a slow upward trend and multiplicative noise
+- a small share of rows are anomalies: the value is multiplied by 4-10x
+- each sale falls on a uniformly random day of its month
+"""
+import argparse
+import calendar
+import csv
+import json
+import sys
+
+import numpy as np
+
+from periods import period_label
+
+CHUNK_ROWS = 100_000
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def default_products(rows):
+    """Catalog size that grows with the dataset: 100 at 10k rows, 10000 at 10M"""
+    return int(min(10_000, max(100, rows // 1000)))
+
+
+def parse_rows(value):
+    return SIZES.get(value.lower()) or int(value.replace("_", ""))
+
+
+class SalesGenerator:
+    def __init__(self, rows, seed=42, products=None, categories=20, months=36, first_year=2023,
+                 skew=1.1, anomaly_rate=0.001):
+        self.rows = rows
+        self.seed = seed
+        self.products = products or default_products(rows)
+        self.categories = categories
+        self.months = months
+        self.first_year = first_year
+        self.anomaly_rate = anomaly_rate
+
+        # The catalog comes from its own stream, so it doesn't depend on rows
+        catalog = np.random.default_rng([seed, 0])
+        weights = 1.0 / np.arange(1, self.products + 1) ** skew
+        self._product_p = weights / weights.sum()
+        self._product_category = catalog.integers(0, categories, self.products)
+        self._product_base = catalog.lognormal(np.log(100), 0.6, self.products)
+        self._category_phase = catalog.uniform(0, 2 * np.pi, categories)
+
+        t = np.arange(months)
+        self._trend = 1 + 0.01 * t
+        self._month_of_year = t % 12
+        self._labels = [
+            period_label((first_year + m // 12) * 100 + m % 12 + 1) for m in range(months)
+        ]
+        self._month_days = np.array([
+            calendar.monthrange(first_year + m // 12, m % 12 + 1)[1] for m in range(months)
+        ])
+
+    def chunks(self):
+        """Yield (products, sales, month indexes, days of the month, categories, anomaly mask) arrays per chunk"""
+        rng = np.random.default_rng([self.seed, 1])
+        # Days come from their own stream, so products and values match the month-only data
+        day_rng = np.random.default_rng([self.seed, 2])
+        for start in range(0, self.rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, self.rows - start)
+            product = rng.choice(self.products, size=n, p=self._product_p)
+            month = rng.integers(0, self.months, n)
+            category = self._product_category[product]
+
+            season = 1 + 0.3 * np.sin(2 * np.pi * self._month_of_year[month] / 12 + self._category_phase[category])
+            sales = self._product_base[product] * season * self._trend[month] * rng.lognormal(0, 0.2, n)
+            anomaly = rng.random(n) < self.anomaly_rate
+            sales[anomaly] *= rng.uniform(4, 10, anomaly.sum())
+            day = 1 + (day_rng.random(n) * self._month_days[month]).astype(np.int64)
+            yield product, np.round(sales, 2), month, day, category, anomaly
+
+    def column_batches(self):
+        """Batches in the upload_sales_data.read_batches format, ready for ingest_sales()"""
+        row = 1
+        for product, sales, month, day, category, _ in self.chunks():
+            n = len(product)
+            yield {
+                "product": [f"P{p:05d}" for p in product.tolist()],
+                "sales": sales.tolist(),
+                "date": [f"{self._labels[m]}-{d:02d}" for m, d in zip(month.tolist(), day.tolist())],
+                "category": [f"C{c:02d}" for c in category.tolist()],
+                "row": list(range(row, row + n))
+            }, []
+            row += n
+
+    def records(self):
+        for columns, _ in self.column_batches():
+            yield from zip(columns["product"], columns["sales"], columns["date"], columns["category"])
+
+
+def write(generator, path, fmt):
+    stream = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    with stream:
+        if fmt == "csv":
+            writer = csv.writer(stream)
+            writer.writerow(["product", "sales", "date", "category"])
+            writer.writerows(generator.records())
+        else:
+            for product, sales, date, category in generator.records():
+                stream.write(json.dumps({"product": product, "sales": sales, "date": date, "category": category}))
+                stream.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic sales data")
+    parser.add_argument("rows", type=parse_rows, help="Row count, or one of: " + ", ".join(SIZES))
+    parser.add_argument("path", help="Output .csv / .ndjson file, or '-' for stdout (CSV)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--products", type=int, help="Catalog size (default: grows with rows)")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--anomaly-rate", type=float, default=0.001)
+    args = parser.parse_args(argv)
+
+    generator = SalesGenerator(
+        args.rows, seed=args.seed, products=args.products, categories=args.categories,
+        months=args.months, anomaly_rate=args.anomaly_rate
+    )
+    write(generator, args.path, "ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
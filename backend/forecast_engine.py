@@ -0,0 +1,171 @@
+"""
+Vectorized sales forecasting over monthly sales aggregates.
+
+Every series of a dimension (each product, each category, or the grand
+total) becomes one row of a (series x months) matrix over the contiguous
+month range; months without sales are 0. Each model is fitted to all rows
+at once:
+
+- linear: least-squares trend, closed form
+- seasonal: trend plus month-of-year effects; one least-squares solve with
+  every series as a right-hand side (needs MIN_SEASONAL_MONTHS of history,
+  otherwise falls back to linear)
+- holt: Holt's linear exponential smoothing; the recursion runs over months
+  with all series and a grid of (alpha, beta) pairs side by side, and each
+  series keeps the pair with the lowest one-step-ahead error
+
+A Fit holds only the fitted parameters, so forecasts for any horizon are
+cheap once the fit is cached.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+MODELS = ("linear", "seasonal", "holt")
+SEASON = 12
+MIN_SEASONAL_MONTHS = 24
+HOLT_GRID = np.linspace(0.1, 0.9, 5)
+
+# start: month index (year * 12 + month - 1) of the first column
+Fit = namedtuple("Fit", ["model", "start", "months", "params", "rmse"])
+
+
+def month_index(periods):
+    periods = np.asarray(periods, dtype=np.int64)
+    return (periods // 100) * 12 + periods % 100 - 1
+
+
+def index_period(index):
+    """Month index -> YYYYMM"""
+    return (index // 12) * 100 + index % 12 + 1
+
+
+def build_series(periods, keys, totals):
+    """
+    Pivot aggregate rows into a (series x months) matrix.
+    Returns (matrix, labels, start): labels are the sorted distinct keys,
+    one per row, and start is the month index of the first column.
+    """
+    months = month_index(periods)
+    start = int(months.min())
+    n_months = int(months.max()) - start + 1
+    labels, codes = np.unique(np.asarray(keys), return_inverse=True)
+    flat = codes * n_months + (months - start)
+    matrix = np.bincount(
+        flat, weights=np.asarray(totals, dtype=np.float64), minlength=len(labels) * n_months
+    ).reshape(len(labels), n_months)
+    return matrix, labels, start
+
+
+def _rmse(residuals):
+    return np.sqrt(np.mean(residuals ** 2, axis=1)) if residuals.shape[1] else np.zeros(len(residuals))
+
+
+def _fit_linear(matrix):
+    t = np.arange(matrix.shape[1], dtype=np.float64)
+    tc = t - t.mean()
+    denom = tc @ tc
+    slope = matrix @ tc / denom if denom else np.zeros(len(matrix))
+    intercept = matrix.mean(axis=1) - slope * t.mean()
+    fitted = intercept[:, None] + slope[:, None] * t
+    return np.column_stack([intercept, slope]), _rmse(matrix - fitted)
+
+
+def _seasonal_design(start, t):
+    """[1, t, month-of-year dummies for Feb..Dec] rows for month offsets t"""
+    month_of_year = (start + t) % SEASON
+    dummies = (month_of_year[:, None] == np.arange(1, SEASON)).astype(np.float64)
+    return np.column_stack([np.ones(len(t)), t.astype(np.float64), dummies])
+
+
+def _fit_seasonal(matrix, start):
+    design = _seasonal_design(start, np.arange(matrix.shape[1]))
+    coef = np.linalg.lstsq(design, matrix.T, rcond=None)[0]
+    return coef.T, _rmse(matrix - (design @ coef).T)
+
+
+def _fit_holt(matrix):
+    n_series, n_months = matrix.shape
+    alpha, beta = (g.ravel()[:, None] for g in np.meshgrid(HOLT_GRID, HOLT_GRID))
+    level = np.broadcast_to(matrix[:, 0], (len(alpha), n_series)).copy()
+    trend = np.broadcast_to(
+        matrix[:, 1] - matrix[:, 0] if n_months > 1 else np.zeros(n_series), (len(alpha), n_series)
+    ).copy()
+    sse = np.zeros_like(level)
+
+    for t in range(1, n_months):
+        y = matrix[:, t]
+        predicted = level + trend
+        sse += (y - predicted) ** 2
+        new_level = alpha * y + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+
+    best = np.argmin(sse, axis=0)
+    pick = (best, np.arange(n_series))
+    params = np.column_stack([level[pick], trend[pick], alpha[best, 0], beta[best, 0]])
+    rmse = np.sqrt(sse[pick] / (n_months - 1)) if n_months > 1 else np.zeros(n_series)
+    return params, rmse
+
+
+def fit(matrix, start, model="holt"):
+    """Fit model to every row of a (series x months) matrix"""
+    n_months = matrix.shape[1]
+    if model == "seasonal" and n_months < MIN_SEASONAL_MONTHS:
+        model = "linear"
+
+    if model == "linear":
+        params, rmse = _fit_linear(matrix)
+    elif model == "seasonal":
+        params, rmse = _fit_seasonal(matrix, start)
+    elif model == "holt":
+        params, rmse = _fit_holt(matrix)
+    else:
+        raise ValueError(f"Unknown model: {model}")
+    return Fit(model, start, n_months, params, rmse)
+
+
+def forecast(fit, horizon):
+    """(series x horizon) forecasts for the months after the fitted range, floored at 0"""
+    steps = np.arange(1, horizon + 1)
+    if fit.model == "linear":
+        t = fit.months - 1 + steps
+        values = fit.params[:, :1] + fit.params[:, 1:2] * t
+    elif fit.model == "seasonal":
+        values = fit.params @ _seasonal_design(fit.start, fit.months - 1 + steps).T
+    else:
+        values = fit.params[:, :1] + fit.params[:, 1:2] * steps
+    return np.maximum(values, 0.0)
+
+
+def forecast_periods(fit, horizon):
+    """YYYYMM of each forecast column"""
+    return index_period(fit.start + fit.months + np.arange(horizon)).tolist()
+
+
+def forecast_lists(fit, horizon):
+    """(periods, forecast rows, rmse) as plain lists rounded to cents, for JSON"""
+    values = np.round(forecast(fit, horizon), 2).tolist()
+    return forecast_periods(fit, horizon), values, np.round(fit.rmse, 2).tolist()
+
+
+def fit_dimensions(cells, model="holt", dimensions=("total", "product")):
+    """
+    Fit model to every series of each requested dimension from
+    (period, product_id, category_id, total) rows.
+    Returns {dimension: (labels, Fit)}, labels being ids ("total" for the total).
+    """
+    cells = np.asarray(cells, dtype=np.float64).reshape(-1, 4)
+    if len(cells) == 0:
+        return {}
+
+    periods = cells[:, 0].astype(np.int64)
+    fits = {}
+    for dimension in dimensions:
+        if dimension == "total":
+            keys = np.zeros(len(cells), dtype=np.int64)
+        else:
+            keys = cells[:, 1 if dimension == "product" else 2].astype(np.int64)
+        matrix, labels, start = build_series(periods, keys, cells[:, 3])
+        fits[dimension] = (["total"] if dimension == "total" else labels.tolist(), fit(matrix, start, model))
+    return fits
@@ -0,0 +1,48 @@
+"""
+Production server: a gunicorn master forking uvicorn workers for asgi:app.
+
+    flask --app main init-db          # once per deploy, before the server starts
+    gunicorn -c gunicorn.conf.py      # from backend/
+
+The app is imported once, in the master (preload_app), and its caches are
+warmed there (main.warm_caches) before any worker is forked: workers start
+in milliseconds, already warm, and share the models, the neighbour index and
+the cached responses copy-on-write until they change them. Caches are keyed
+by the data version, so a worker never serves a stale entry.
+
+Environment:
+    BIND                  address to listen on (default 127.0.0.1:5000)
+    WEB_CONCURRENCY       worker processes (default: one per CPU)
+    FLASK_WSGI_THREADS    Flask request threads per worker (default 32)
+    GRACEFUL_TIMEOUT      seconds a stopping worker gets to finish requests
+
+Signals to the master:
+    HUP           graceful reload: new workers are forked from the preloaded
+                  app, old ones finish their requests and exit. Code changes
+                  need a binary upgrade instead:
+    USR2, WINCH   start a new master (re-importing the app) next to the old
+                  one, then stop the old workers; QUIT the old master when
+                  the new one is serving
+    TTIN, TTOU    one worker more / fewer
+    TERM          graceful shutdown
+"""
+import gc
+import os
+
+bind = os.environ.get("BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+wsgi_app = "asgi:app"
+preload_app = True
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+timeout = 120  # long ingests and exports run as jobs, not in the request
+keepalive = 5
+
+
+def when_ready(server):
+    from main import warm_caches
+
+    warm_caches()
+    # Keep the preloaded objects out of the workers' garbage collections, which
+    # would otherwise touch (and so copy) every page holding them
+    gc.freeze()
@@ -0,0 +1,187 @@
+"""
+Background jobs on a process pool.
+
+JobScheduler only decides when a job runs: it hands job ids to
+run(job_id) in worker processes, at most `limits[type]` of a type at once
+(the rest wait in FIFO order), and reports jobs whose worker died to
+on_crash(job_id, error). A dead worker breaks the whole pool and every job
+still in it; the broken pool is replaced, so waiting and later jobs run on
+fresh workers. Everything a job reads or writes, its status
+included, lives in the database (see the Job model in main.py), so
+workers and request handlers share nothing but job ids.
+
+Workers are started with forkserver where available: they import the app
+fresh instead of inheriting the threads, locks and connections of the
+request process. Each server process has its own scheduler, so limits are
+per process.
+
+While it holds jobs, a scheduler calls on_heartbeat(job_ids) every
+`heartbeat` seconds from a background thread with the ids of its waiting and
+running jobs. The app renews their leases with it, so the jobs of a server
+process that died stop being renewed and can be told apart from live ones.
+"""
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+DEFAULT_LIMIT = 1
+
+
+class JobCancelled(Exception):
+    """Raised inside a job that noticed it was cancelled"""
+
+
+class SchedulerUnavailable(Exception):
+    """No worker process could be started for a job"""
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class JobScheduler:
+    def __init__(self, run, on_crash, workers=2, limits=None, on_heartbeat=None, heartbeat=30):
+        self.run = run
+        self.on_crash = on_crash
+        self.on_heartbeat = on_heartbeat
+        self.heartbeat = heartbeat
+        self.workers = workers
+        self.limits = dict(limits or {})
+        self._executor = None
+        self._heartbeat_thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.RLock()  # done callbacks may run inside submit
+        self._running = {}  # type -> count
+        self._waiting = {}  # type -> deque of job ids
+        self._futures = {}  # job id -> Future
+        self.submitted = 0
+        self.completed = 0
+        self.crashed = 0
+        self.pools_replaced = 0
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+        return self._executor
+
+    def _discard_pool(self, executor):
+        """Replace executor on next use, if it is still the current one"""
+        if self._executor is executor:
+            self._executor = None
+            self.pools_replaced += 1
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _beat(self):
+        while not self._stopped.wait(self.heartbeat):
+            job_ids = self.job_ids()
+            if job_ids:
+                try:
+                    self.on_heartbeat(job_ids)
+                except Exception:
+                    pass  # the next beat retries; a lease outlives several beats
+
+    def _start_heartbeat(self):
+        # Called with self._lock held; started on first use, so a forked
+        # child never inherits a dead thread from the process it forked from
+        if self.on_heartbeat is not None and (self._heartbeat_thread is None or not self._heartbeat_thread.is_alive()):
+            self._stopped.clear()
+            self._heartbeat_thread = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+
+    def job_ids(self):
+        """Ids of the jobs this scheduler is waiting to start or running"""
+        with self._lock:
+            return [job_id for waiting in self._waiting.values() for job_id in waiting] + list(self._futures)
+
+    def submit(self, job_id, job_type):
+        """Run or queue job_id; SchedulerUnavailable if no worker can be started"""
+        with self._lock:
+            self._start_heartbeat()
+            self.submitted += 1
+            if self._running.get(job_type, 0) < self.limits.get(job_type, DEFAULT_LIMIT):
+                self._start(job_id, job_type)
+            else:
+                self._waiting.setdefault(job_type, deque()).append(job_id)
+
+    def _start(self, job_id, job_type):
+        # Called with self._lock held
+        try:
+            executor = self._pool()
+            try:
+                future = executor.submit(self.run, job_id)
+            except BrokenProcessPool:
+                # Broke before we heard from the done callbacks: one retry on a fresh pool
+                self._discard_pool(executor)
+                executor = self._pool()
+                future = executor.submit(self.run, job_id)
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            raise SchedulerUnavailable(f"Job workers unavailable: {e}") from e
+
+        self._running[job_type] = self._running.get(job_type, 0) + 1
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, job_type, executor, f))
+
+    def _start_waiting(self, job_type):
+        """
+        Start waiting jobs of job_type up to its limit; called with
+        self._lock held. Returns [(job_id, error)] for jobs that could not start.
+        """
+        failed = []
+        waiting = self._waiting.get(job_type)
+        while waiting and self._running.get(job_type, 0) < self.limits.get(job_type, DEFAULT_LIMIT):
+            job_id = waiting.popleft()
+            try:
+                self._start(job_id, job_type)
+            except SchedulerUnavailable as e:
+                failed.append((job_id, e))
+        return failed
+
+    def _finished(self, job_id, job_type, executor, future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self._futures.pop(job_id, None)
+            self._running[job_type] -= 1
+            self.completed += 1
+            if isinstance(error, BrokenProcessPool):
+                self._discard_pool(executor)
+            failed = self._start_waiting(job_type)
+
+        if error is not None:
+            self.crashed += 1
+            self.on_crash(job_id, error)
+        for waiting_id, waiting_error in failed:
+            self.crashed += 1
+            self.on_crash(waiting_id, waiting_error)
+
+    def cancel(self, job_id):
+        """
+        Stop a job that hasn't started; True if it was. Running jobs have to
+        notice cancellation themselves.
+        """
+        with self._lock:
+            for waiting in self._waiting.values():
+                if job_id in waiting:
+                    waiting.remove(job_id)
+                    return True
+            future = self._futures.get(job_id)
+        return future is not None and future.cancel()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": {t: n for t, n in self._running.items() if n},
+                "waiting": {t: len(q) for t, q in self._waiting.items() if q},
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "crashed": self.crashed,
+                "pools_replaced": self.pools_replaced
+            }
@@ -0,0 +1,62 @@
+"""
+Application logging.
+
+Log calls never write to the terminal themselves: the logger's only handler
+puts records on an in-memory queue, and a QueueListener thread formats and
+writes them. A request thread or the event loop only pays for building the
+record, however slow stderr is. Every process (server workers, job workers,
+CLI commands) sets up its own listener when it imports the app, and a
+process forked after setup (preloaded server workers) restarts it, since
+threads don't survive fork().
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOGGER_NAME = "business_manager"
+FORMAT = "%(asctime)s %(levelname)-7s %(process)d %(name)s: %(message)s"
+
+_listener = None
+
+
+def setup(level="INFO", stream=None):
+    """Configure the app logger once per process; later calls only change the level"""
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    if _listener is not None:
+        return logger
+
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)  # flushes what is still queued
+    os.register_at_fork(after_in_child=_restart_listener)
+
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.propagate = False
+    return logger
+
+
+def _stop_listener():
+    _listener.stop()
+
+
+def _restart_listener():
+    """In a forked child: a new queue (the inherited one may hold the parent's records) and thread"""
+    global _listener
+    records = queue.SimpleQueue()
+    for handler in logging.getLogger(LOGGER_NAME).handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = records
+    _listener = logging.handlers.QueueListener(records, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def get_logger(name=None):
+    return logging.getLogger(LOGGER_NAME if name is None else f"{LOGGER_NAME}.{name}")
@@ -1,11 +1,45 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import Integer, and_, bindparam, cast, delete, event, func, or_, select, tuple_, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import scoped_session, sessionmaker
+from werkzeug.security import generate_password_hash
 import jwt
+import base64
 import datetime
+import gc
+import hashlib
+import hmac
+import json
+import math
+from collections import ChainMap, namedtuple
 from functools import wraps
 import os
+import tempfile
+import uuid
+import zlib
+
+import admission
+import aggregates
+import anomaly_engine
+import broker
+import columnar
+import forecast_engine
+import jobs
+import logs
+import metrics
+import recommender
+import rollup
+from cache import LRUCache
+from passwords import PasswordHasher
+import reports
+from response_cache import VersionedResponseCache
+import storage
+from summarizer import EXTRACTIVE_VERSION, BatchingSummarizer, SummarizerUnavailable, extractive_summary
+import upload_sales_data
+from periods import day_label, day_number, month_name, move_to_month, parse_period, parse_sale_date, period_label
 
 app = Flask(__name__)
 CORS(app)
@@ -14,12 +48,91 @@ CORS(app)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///business_manager.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['AUTH_CACHE_SIZE'] = 10000
+app.config['AUTH_CACHE_TTL'] = 300  # seconds; bounds staleness across worker processes
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'  # werkzeug method string, e.g. 'pbkdf2:sha256:600000'
+app.config['PASSWORD_HASH_WORKERS'] = 2  # hashing threads per server worker
+app.config['PASSWORD_HASH_MAX_PENDING'] = 8  # hashes queued or running per server worker; more get 503
+app.config['LOGIN_FAILURE_CACHE_SIZE'] = 10000
+app.config['LOGIN_FAILURE_CACHE_TTL'] = 300
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(storage.WRITER_ENGINE_OPTIONS)  # one writer connection
+app.config['SQLITE_PRAGMAS'] = dict(storage.DEFAULT_PRAGMAS)
+app.config['SQLITE_READ_POOL_SIZE'] = 8
+app.config['SUMMARIZER_MODE'] = 'transformer'  # or 'extractive' (first sentences, no model)
+app.config['SUMMARIZER_MODEL'] = 'sshleifer/distilbart-cnn-12-6'  # hub id or local directory, see deployment.md
+app.config['SUMMARIZER_MAX_BATCH'] = 8
+app.config['SUMMARIZER_MAX_WAIT'] = 0.05  # seconds a batch waits to fill
+app.config['SUMMARIZER_THREADS'] = None  # torch intra-op threads; default: torch's choice
+app.config['SUMMARIZER_RETRY_AFTER'] = 60  # seconds before a failed model load is tried again
+app.config['SUMMARY_CACHE_SIZE'] = 1024
+app.config['REPORT_CACHE_DIR'] = None  # rendered PDFs; default: <instance>/reports
+app.config['REPORT_MAX_ROWS'] = 20000  # rows per PDF table (~500 pages); the rest are left out
+app.config['COLUMNAR_DIR'] = None  # memory-mapped SalesData columns; default: <database file>-columnar
+app.config['JOB_WORKERS'] = 2  # background job processes
+app.config['JOB_LIMITS'] = {"ingest": 1, "export": 2, "rebuild-aggregates": 1, "summarize": 2}  # concurrent jobs per type
+app.config['JOB_UPLOAD_DIR'] = None  # spooled ingest bodies; default: <instance>/uploads
+app.config['JOB_LEASE'] = 120  # seconds; a queued or running job not renewed for this long is orphaned
+app.config['SUMMARY_JOB_THRESHOLD'] = 20000  # characters; longer transformer summaries run as jobs
+app.config['SUMMARY_MAX_LENGTH'] = 1000000  # characters; longer texts are refused
+app.config['RECOMMENDER_TOP_K'] = 20  # neighbours kept per product
+app.config['LOG_LEVEL'] = 'INFO'
+app.config['SLOW_QUERY_THRESHOLD'] = 0.25  # seconds; slower SQL statements are logged, None: off
+app.config['WSGI_THREADS'] = 32  # Flask request threads per server worker (asgi.py)
+app.config['ADMISSION_ROUTES'] = {  # path: (concurrent, queued) requests per server worker; keep the sum under WSGI_THREADS
+    "/get-all-sales": (4, 16),
+    "/recommendation": (4, 32),
+    "/anomalies": (4, 32),
+    "/forecast": (2, 16),
+    "/analytics/rollup": (4, 32),
+    "/analytics/distribution": (2, 16),
+    "/summarize": (4, 16),
+    "/export/pdf": (2, 8),
+}
+app.config['ADMISSION_QUEUE_TIMEOUT'] = 10  # seconds a queued request waits before 503
+app.config['ADMISSION_RETRY_AFTER'] = 2  # seconds, sent with 503
+app.config['RATE_LIMIT_PER_USER'] = (20, 40)  # (requests per second, burst) per authenticated user; None: off
+app.config['RATE_LIMIT_ANONYMOUS'] = None  # the same per client address, for requests without a valid token
+app.config['STREAM_POLL_INTERVAL'] = 1.0  # seconds between data version checks while /stream/analytics has clients
+app.config['STREAM_HEARTBEAT'] = 15  # seconds; keeps idle event streams open through proxies
+app.config['STREAM_QUEUE_SIZE'] = 64  # pending events per client before it is told to resync
+app.config['STREAM_TOP_RECOMMENDATIONS'] = 10
+# Any of the above can be overridden per process with FLASK_<NAME> environment
+# variables, e.g. FLASK_SQLALCHEMY_DATABASE_URI=sqlite:////srv/sales.db
+app.config.from_prefixed_env()
+
+logger = logs.setup(app.config['LOG_LEVEL'])
+request_metrics = metrics.Metrics()
+app.wsgi_app = metrics.WSGIMiddleware(app.wsgi_app, request_metrics)
 
 db = SQLAlchemy(app)
 
-print("="*60)
-print("🚀 AI BUSINESS MANAGER - Backend Server")
-print("="*60)
+# Writes go through db.session on the single writer connection; reads that
+# don't need to see the current request's uncommitted writes use
+# read_session, backed by a pool of query-only WAL readers.
+with app.app_context():
+    storage.apply_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+    read_engine = storage.create_read_engine(
+        db.engine.url, app.config['SQLITE_READ_POOL_SIZE'], app.config['SQLITE_PRAGMAS']
+    )
+    metrics.instrument_engine(db.engine, "writer", request_metrics, app.config['SLOW_QUERY_THRESHOLD'], logger)
+    metrics.instrument_engine(read_engine, "reader", request_metrics, app.config['SLOW_QUERY_THRESHOLD'], logger)
+    storage.reset_after_fork(db.engine)
+    storage.reset_after_fork(read_engine)
+read_session = scoped_session(sessionmaker(bind=read_engine), scopefunc=db.session.registry.scopefunc)
+
+
+@app.teardown_appcontext
+def _remove_read_session(exc):
+    read_session.remove()
+
+
+@app.before_request
+def _label_request_metrics():
+    # Route templates, not paths, so /jobs/<job_id> is one series
+    if request.url_rule is not None:
+        request.environ["metrics.route"] = request.url_rule.rule
+
+logger.info("AI Business Manager backend loaded")
 
 # ============= DATABASE MODELS =============
 
@@ -30,23 +143,879 @@ class User(db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+class Category(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
 class SalesData(db.Model):
+    """Sales fact table: dimension ids, the sale date and its YYYYMM period (see periods.py)"""
+    __table_args__ = (
+        db.Index("ix_sales_data_period_product", "period", "product_id"),
+        db.Index("ix_sales_data_category_period", "category_id", "period"),
+        db.Index("ix_sales_data_product_sales", "product_id", "sales"),
+        db.Index("ix_sales_data_timestamp_id", "timestamp", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    product = db.Column(db.String(100), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
     sales = db.Column(db.Float, nullable=False)
-    month = db.Column(db.String(20), nullable=False)
-    category = db.Column(db.String(50))
+    sale_date = db.Column(db.Date, nullable=False)
+    period = db.Column(db.Integer, nullable=False)  # sale_date's YYYYMM, kept for the indexes
     timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
+    @property
+    def day(self):
+        return day_number(self.sale_date)
+
+# SalesData.sale_date as a YYYYMMDD int, for the aggregate rows read back in SQL
+SALE_DAY = cast(func.strftime("%Y%m%d", SalesData.sale_date), Integer)
+
+class ProductStats(db.Model):
+    """Running per-product aggregates, kept in step with every SalesData write"""
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    total_sq = db.Column(db.Float, nullable=False, default=0.0)
+    min_sales = db.Column(db.Float)
+    max_sales = db.Column(db.Float)
+    last_updated = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+class MonthlySales(db.Model):
+    """Sales totals per period x product x category, kept in step with SalesData writes"""
+    period = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+
+class ProductPair(db.Model):
+    """
+    Co-occurrence counts of two products (product_id <= other_id) across
+    month x category contexts, kept in step with MonthlySales; see recommender.py
+    """
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    other_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class SalesRollup(db.Model):
+    """
+    Sales per time bucket at every grain and rollup level, kept in step with
+    MonthlySales and, for the day grains, SalesData; product_id /
+    category_id 0 mean "all" (see rollup.py)
+    """
+    __table_args__ = (
+        db.Index("ix_sales_rollup_category_bucket", "grain", "category_id", "bucket"),
+    )
+    grain = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+
+class DataVersion(db.Model):
+    """Single-row counter bumped by every sales write; keys the response cache"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class RewriteVersion(db.Model):
+    """
+    Single-row counter bumped by every update or delete of SalesData rows;
+    inserts leave it alone, so the columnar snapshot knows when appending
+    the new rows is enough (see columnar.py)
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class MeetingText(db.Model):
+    """Submitted transcripts, zlib-compressed and stored once per distinct text"""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+    compressed = db.Column(db.LargeBinary, nullable=False)
+
+    @property
+    def text(self):
+        return zlib.decompress(self.compressed).decode()
+
+class Job(db.Model):
+    """A background job; see jobs.py and the BACKGROUND JOBS section"""
+    __table_args__ = (
+        db.Index("ix_job_user_id_created_at", "user_id", "created_at"),
+        db.Index("ix_job_status", "status"),
+    )
+    id = db.Column(db.String(32), primary_key=True)
+    type = db.Column(db.String(40), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    params = db.Column(db.Text, nullable=False, default="{}")  # JSON
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # lease, renewed by the scheduling server process
+
 class MeetingSummary(db.Model):
+    """
+    One row per /summarize call. summary_key hashes the text together with
+    the summarizer version, so identical requests can reuse the summary.
+    """
+    __table_args__ = (
+        db.Index("ix_meeting_summary_user_id", "user_id", "id"),
+        db.Index("ix_meeting_summary_summary_key", "summary_key"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    original_text = db.Column(db.Text, nullable=False)
+    text_id = db.Column(db.Integer, db.ForeignKey('meeting_text.id'), nullable=False)
+    summary_key = db.Column(db.String(64), nullable=False)
+    mode = db.Column(db.String(20), nullable=False)
     summary = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
+# ============= PRODUCT / CATEGORY DIMENSIONS =============
+
+# name -> id, per process. Only committed rows are cached (see dimension_ids).
+_dimension_ids = {Product: {}, Category: {}}
+DIMENSION_LOOKUP_CHUNK = 500
+
+
+def dimension_ids(model, names):
+    """
+    Map product/category names to ids, creating missing rows.
+    New names are inserted in the current db.session transaction; their ids
+    are held in the session until it commits and only then shared with other
+    requests, so a rolled back request never leaves dangling ids in the cache.
+    """
+    cache = _dimension_ids[model]
+    pending = db.session.info.setdefault("dimension_ids", {}).setdefault(model, {})
+    missing = [name for name in set(names) if name not in cache and name not in pending]
+    if missing:
+        table = model.__table__
+        db.session.execute(
+            sqlite_insert(table).on_conflict_do_nothing(index_elements=[table.c.name]),
+            [{"name": name} for name in missing]
+        )
+        for i in range(0, len(missing), DIMENSION_LOOKUP_CHUNK):
+            chunk = missing[i:i + DIMENSION_LOOKUP_CHUNK]
+            pending.update(
+                (name, id_) for id_, name in db.session.execute(
+                    select(table.c.id, table.c.name).where(table.c.name.in_(chunk))
+                )
+            )
+    return ChainMap(pending, cache) if pending else cache
+
+
+@event.listens_for(db.session, "after_commit")
+def _publish_dimension_ids(session):
+    for model, ids in session.info.pop("dimension_ids", {}).items():
+        _dimension_ids[model].update(ids)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_dimension_ids(session):
+    session.info.pop("dimension_ids", None)
+    session.info.pop("data_changed", None)
+
+
+def dimension_name(model, id_):
+    return db.session.get(model, id_).name
+
+# ============= SALES AGGREGATES MAINTENANCE =============
+
+def add_product_stats(changes):
+    """Add aggregates.ProductChanges to ProductStats in the current transaction"""
+    if not len(changes.products):
+        return
+
+    now = datetime.datetime.utcnow()
+    table = ProductStats.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.product_id],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "total": table.c.total + stmt.excluded.total,
+            "total_sq": table.c.total_sq + stmt.excluded.total_sq,
+            "min_sales": func.min(func.coalesce(table.c.min_sales, stmt.excluded.min_sales), stmt.excluded.min_sales),
+            "max_sales": func.max(func.coalesce(table.c.max_sales, stmt.excluded.max_sales), stmt.excluded.max_sales),
+            "last_updated": stmt.excluded.last_updated,
+        }
+    )
+    db.session.execute(stmt, [
+        {
+            "product_id": product,
+            "count": count,
+            "total": total,
+            "total_sq": total_sq,
+            "min_sales": lo,
+            "max_sales": hi,
+            "last_updated": now
+        }
+        for product, count, total, total_sq, lo, hi in zip(*(column.tolist() for column in changes))
+    ])
+
+
+def remove_product_stats(changes):
+    """
+    Remove aggregates.ProductChanges from ProductStats in the current transaction.
+    Call after the SalesData rows are deleted/changed and flushed, so min/max
+    can be re-read from the remaining rows when an extreme value goes away.
+    """
+    now = datetime.datetime.utcnow()
+    for product, count, total, total_sq, lo, hi in zip(*(column.tolist() for column in changes)):
+        stats = db.session.get(ProductStats, product)
+        if stats is None:
+            continue
+
+        stats.count -= count
+        if stats.count <= 0:
+            db.session.delete(stats)
+            continue
+
+        stats.total -= total
+        stats.total_sq -= total_sq
+        stats.last_updated = now
+
+        # Index seek on (product_id, sales)
+        if lo <= stats.min_sales or hi >= stats.max_sales:
+            stats.min_sales, stats.max_sales = db.session.query(
+                func.min(SalesData.sales), func.max(SalesData.sales)
+            ).filter(SalesData.product_id == product).one()
+
+    db.session.flush()
+
+
+def rebuild_product_stats():
+    """Recompute ProductStats from scratch with one GROUP BY over SalesData, in the current transaction"""
+    now = datetime.datetime.utcnow()
+    db.session.query(ProductStats).delete()
+    rows = db.session.query(
+        SalesData.product_id,
+        func.count(SalesData.id),
+        func.sum(SalesData.sales),
+        func.sum(SalesData.sales * SalesData.sales),
+        func.min(SalesData.sales),
+        func.max(SalesData.sales)
+    ).group_by(SalesData.product_id).all()
+
+    db.session.add_all([
+        ProductStats(
+            product_id=product,
+            count=count,
+            total=total,
+            total_sq=total_sq,
+            min_sales=lo,
+            max_sales=hi,
+            last_updated=now
+        )
+        for product, count, total, total_sq, lo, hi in rows
+    ])
+    db.session.flush()
+    return len(rows)
+
+
+# Raw SQL, like SALES_ROLLUP_UPSERT_SQL: an ingest batch touches tens of thousands of cells
+MONTHLY_SALES_UPSERT_SQL = (
+    "INSERT INTO monthly_sales (period, product_id, category_id, count, total) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (period, product_id, category_id) "
+    "DO UPDATE SET count = count + excluded.count, total = total + excluded.total"
+)
+
+
+def add_monthly_sales(changes, daily):
+    """
+    Add aggregates.MonthlyChanges to MonthlySales, and with the
+    aggregates.DailyChanges to ProductPair and SalesRollup, in the current
+    transaction
+    """
+    if not len(changes.periods):
+        return
+
+    cells = list(zip(changes.periods.tolist(), changes.products.tolist(), changes.categories.tolist()))
+    # The cells already in the contexts the batch touches; the batch's others are new
+    context_cells = _context_cells({(period, category) for period, _, category in cells})
+    db.session.connection().exec_driver_sql(
+        MONTHLY_SALES_UPSERT_SQL,
+        list(zip(changes.periods.tolist(), changes.products.tolist(), changes.categories.tolist(),
+                 changes.counts.tolist(), changes.totals.tolist()))
+    )
+    existing = set(context_cells)
+    new_cells = [cell for cell in cells if cell not in existing]
+    add_cooccurrence(new_cells, context_cells + new_cells)
+    add_sales_rollup(changes, daily)
+
+
+def remove_monthly_sales(changes, daily):
+    """
+    Remove aggregates.MonthlyChanges from MonthlySales, and with the
+    aggregates.DailyChanges from ProductPair and SalesRollup, in the current
+    transaction
+    """
+    if not len(changes.periods):
+        return
+
+    table = MonthlySales.__table__
+    key = (
+        (table.c.period == bindparam("key_period"))
+        & (table.c.product_id == bindparam("key_product"))
+        & (table.c.category_id == bindparam("key_category"))
+    )
+    db.session.execute(
+        table.update().where(key).values(
+            count=table.c.count - bindparam("delta_count"),
+            total=table.c.total - bindparam("delta_total")
+        ),
+        [
+            {
+                "key_period": period,
+                "key_product": product,
+                "key_category": category,
+                "delta_count": count,
+                "delta_total": total
+            }
+            for period, product, category, count, total in zip(*(column.tolist() for column in changes))
+        ]
+    )
+    gone = db.session.execute(
+        select(table.c.period, table.c.product_id, table.c.category_id).where(table.c.count <= 0)
+    ).tuples()
+    remove_cooccurrence(set(gone))
+    db.session.execute(table.delete().where(table.c.count <= 0))
+    remove_sales_rollup(changes, daily)
+
+
+def rebuild_monthly_sales():
+    """Recompute MonthlySales from scratch with one GROUP BY over SalesData, in the current transaction"""
+    db.session.query(MonthlySales).delete()
+    rows = db.session.query(
+        SalesData.period,
+        SalesData.product_id,
+        SalesData.category_id,
+        func.count(SalesData.id),
+        func.sum(SalesData.sales)
+    ).group_by(SalesData.period, SalesData.product_id, SalesData.category_id).all()
+
+    db.session.add_all([
+        MonthlySales(period=period, product_id=product, category_id=category, count=count, total=total)
+        for period, product, category, count, total in rows
+    ])
+    db.session.flush()
+    return len(rows)
+
+
+MONTHLY_CONTEXT_LOOKUP_CHUNK = 400  # (period, category_id) keys per IN (...)
+
+
+def _context_cells(contexts):
+    """The (period, product_id, category_id) MonthlySales cells in the given (period, category_id) contexts"""
+    table = MonthlySales.__table__
+    contexts = list(contexts)
+    context_cells = []
+    for i in range(0, len(contexts), MONTHLY_CONTEXT_LOOKUP_CHUNK):
+        context_cells += map(tuple, db.session.execute(
+            select(table.c.period, table.c.product_id, table.c.category_id).where(
+                tuple_(table.c.period, table.c.category_id).in_(contexts[i:i + MONTHLY_CONTEXT_LOOKUP_CHUNK])
+            )
+        ).all())
+    # Plain tuples: they are hashed and compared against the batch's cells, where Row is slow
+    return context_cells
+
+
+def _cooccurrence_counts(cells, context_cells):
+    """
+    Pair count changes for the (period, product_id, category_id) cells,
+    given every cell of their contexts (cells included), as (product_id,
+    other_id, count) rows for the ProductPair table
+    """
+    cells = set(cells)
+    periods, products, categories = zip(*context_cells)
+    a, b, counts = recommender.cooccurrence_counts(
+        periods, categories, products, [cell in cells for cell in context_cells]
+    )
+    return list(zip(a.tolist(), b.tolist(), counts.tolist()))
+
+
+PRODUCT_PAIR_UPSERT_SQL = (
+    "INSERT INTO product_pair (product_id, other_id, count) VALUES (?, ?, ?) "
+    "ON CONFLICT (product_id, other_id) DO UPDATE SET count = count + excluded.count"
+)
+
+
+def add_cooccurrence(cells, context_cells):
+    """
+    Count new MonthlySales cells into ProductPair in the current transaction,
+    given every cell of their contexts as it is now (see _cooccurrence_counts)
+    """
+    if not cells:
+        return
+
+    db.session.connection().exec_driver_sql(PRODUCT_PAIR_UPSERT_SQL, _cooccurrence_counts(cells, context_cells))
+
+
+def remove_cooccurrence(cells):
+    """
+    Withdraw MonthlySales cells about to be deleted from ProductPair in the
+    current transaction. Call while the cells still exist.
+    """
+    if not cells:
+        return
+
+    table = ProductPair.__table__
+    key = (table.c.product_id == bindparam("key_product")) & (table.c.other_id == bindparam("key_other"))
+    db.session.execute(
+        table.update().where(key).values(count=table.c.count - bindparam("delta_count")),
+        [
+            {"key_product": product, "key_other": other, "delta_count": count}
+            for product, other, count in _cooccurrence_counts(
+                cells, _context_cells({(period, category) for period, _, category in cells})
+            )
+        ]
+    )
+    db.session.execute(table.delete().where(table.c.count <= 0))
+
+
+def rebuild_cooccurrence():
+    """Recompute ProductPair from scratch from MonthlySales, in the current transaction"""
+    db.session.query(ProductPair).delete()
+    cells = db.session.execute(
+        select(MonthlySales.period, MonthlySales.product_id, MonthlySales.category_id)
+    ).tuples().all()
+
+    rows = []
+    if cells:
+        periods, products, categories = zip(*cells)
+        a, b, counts = recommender.cooccurrence_counts(periods, categories, products, [True] * len(cells))
+        rows = [
+            {"product_id": product, "other_id": other, "count": count}
+            for product, other, count in zip(a.tolist(), b.tolist(), counts.tolist())
+        ]
+        db.session.execute(ProductPair.__table__.insert(), rows)
+    return len(rows)
+
+
+def _sales_rollup_rows(changes, daily, sign=1):
+    """
+    SalesRollup (grain, product_id, category_id, bucket, count, total) rows
+    for aggregates.MonthlyChanges and DailyChanges (withdrawn with sign -1)
+    """
+    rows = []
+    for cube, cells in ((rollup.rollup_cells, changes), (rollup.day_rollup_cells, daily)):
+        *keys, counts, totals = cells
+        grains, buckets, products, categories, counts, totals = cube(*keys, sign * counts, sign * totals)
+        rows.extend(zip(
+            grains.tolist(), products.tolist(), categories.tolist(), buckets.tolist(), counts.tolist(), totals.tolist()
+        ))
+    return rows
+
+
+# Raw SQL: an ingest batch adds tens of thousands of cells, and building
+# Core parameter dicts for them costs more than the upsert itself
+SALES_ROLLUP_UPSERT_SQL = (
+    "INSERT INTO sales_rollup (grain, product_id, category_id, bucket, count, total) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (grain, product_id, category_id, bucket) "
+    "DO UPDATE SET count = count + excluded.count, total = total + excluded.total"
+)
+
+
+def add_sales_rollup(changes, daily):
+    """Add aggregates.MonthlyChanges and DailyChanges to SalesRollup in the current transaction"""
+    if not len(changes.periods):
+        return
+
+    db.session.connection().exec_driver_sql(SALES_ROLLUP_UPSERT_SQL, _sales_rollup_rows(changes, daily))
+
+
+def remove_sales_rollup(changes, daily):
+    """Withdraw aggregates.MonthlyChanges and DailyChanges from SalesRollup in the current transaction"""
+    if not len(changes.periods):
+        return
+
+    table = SalesRollup.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.grain, table.c.product_id, table.c.category_id, table.c.bucket],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "total": table.c.total + stmt.excluded.total,
+        }
+    ).returning(table.c.grain, table.c.product_id, table.c.category_id, table.c.bucket, table.c.count)
+    rows = _sales_rollup_rows(changes, daily, sign=-1)
+    cells = db.session.execute(stmt, [
+        {"grain": grain, "product_id": product, "category_id": category, "bucket": bucket, "count": count, "total": total}
+        for grain, product, category, bucket, count, total in rows
+    ])
+    emptied = [
+        {"key_grain": grain, "key_product": product, "key_category": category, "key_bucket": bucket}
+        for grain, product, category, bucket, count in cells
+        if count <= 0
+    ]
+    if emptied:
+        key = (
+            (table.c.grain == bindparam("key_grain"))
+            & (table.c.product_id == bindparam("key_product"))
+            & (table.c.category_id == bindparam("key_category"))
+            & (table.c.bucket == bindparam("key_bucket"))
+        )
+        db.session.execute(table.delete().where(key), emptied)
+
+
+def rebuild_sales_rollup():
+    """Recompute SalesRollup from scratch from MonthlySales and SalesData, in the current transaction"""
+    db.session.query(SalesRollup).delete()
+    cells = db.session.execute(select(
+        MonthlySales.period, MonthlySales.product_id, MonthlySales.category_id, MonthlySales.count, MonthlySales.total
+    )).tuples().all()
+    daily_cells = db.session.execute(
+        select(SALE_DAY, SalesData.category_id, func.count(SalesData.id), func.sum(SalesData.sales))
+        .group_by(SalesData.sale_date, SalesData.category_id)
+    ).tuples().all()
+
+    rows = _sales_rollup_rows(
+        aggregates.from_rows(aggregates.MonthlyChanges, cells), aggregates.from_rows(aggregates.DailyChanges, daily_cells)
+    )
+    if rows:
+        db.session.connection().exec_driver_sql(SALES_ROLLUP_UPSERT_SQL, rows)
+    return len(rows)
+
+
+def bump_data_version():
+    """Mark the sales data as changed, in the current transaction"""
+    if db.session.execute(update(DataVersion).values(version=DataVersion.version + 1)).rowcount == 0:
+        db.session.add(DataVersion(id=1, version=1))
+    db.session.info["data_changed"] = True
+
+
+def bump_rewrite_version():
+    """Mark existing SalesData rows as changed or deleted, in the current transaction"""
+    if db.session.execute(update(RewriteVersion).values(version=RewriteVersion.version + 1)).rowcount == 0:
+        db.session.add(RewriteVersion(id=1, version=1))
+
+
+DATA_VERSION_QUERY = select(func.coalesce(func.max(DataVersion.version), 0))
+
+
+def current_data_version():
+    return read_session.execute(DATA_VERSION_QUERY).scalar()
+
+
+def record_sales(rows):
+    """
+    Apply new (product_id, sales, day, category_id) rows to every derived
+    aggregate; day is the sale date as YYYYMMDD (see periods.py)
+    """
+    changes = aggregates.fold_sales(rows)
+    add_product_stats(changes.products)
+    add_monthly_sales(changes.monthly, changes.daily)
+    bump_data_version()
+
+
+def unrecord_sales(rows):
+    """
+    Withdraw (product_id, sales, day, category_id) rows from every derived aggregate.
+    Call after the SalesData rows themselves are deleted/changed and flushed.
+    """
+    changes = aggregates.fold_sales(rows)
+    remove_product_stats(changes.products)
+    remove_monthly_sales(changes.monthly, changes.daily)
+    bump_data_version()
+    bump_rewrite_version()
+
+
+def rebuild_aggregates():
+    """
+    Rebuild every derived aggregate from SalesData in one transaction, so
+    readers see either the old tables or the new ones; returns (products,
+    monthly cells, product pairs, rollup cells)
+    """
+    try:
+        products = rebuild_product_stats()
+        cells = rebuild_monthly_sales()
+        pairs = rebuild_cooccurrence()
+        rollup_cells = rebuild_sales_rollup()
+        bump_data_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return products, cells, pairs, rollup_cells
+
+
+@app.cli.command("rebuild-aggregates")
+def rebuild_aggregates_command():
+    """Rebuild the ProductStats, MonthlySales, ProductPair and SalesRollup summary tables from SalesData"""
+    products, cells, pairs, rollup_cells = rebuild_aggregates()
+    logger.info(
+        "Aggregates rebuilt: %d products, %d monthly cells, %d product pairs, %d rollup cells",
+        products, cells, pairs, rollup_cells
+    )
+
+# ============= MEETING TEXT STORAGE =============
+
+def text_digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def summary_key(digest, version):
+    """Content address of a summary: the text's digest under one summarizer version"""
+    return hashlib.sha256(f"{digest}|{version}".encode()).hexdigest()
+
+
+def compress_text(text):
+    return zlib.compress(text.encode(), 6)
+
+
+def store_meeting_texts(conn, texts):
+    """
+    Insert {digest: text} into meeting_text unless already stored, on a
+    Connection or Session; returns {digest: id}.
+    """
+    table = MeetingText.__table__
+    digests = list(texts)
+    conn.execute(
+        sqlite_insert(table).on_conflict_do_nothing(index_elements=[table.c.sha256]),
+        [{"sha256": d, "length": len(texts[d]), "compressed": compress_text(texts[d])} for d in digests]
+    )
+    ids = {}
+    for i in range(0, len(digests), DIMENSION_LOOKUP_CHUNK):
+        chunk = digests[i:i + DIMENSION_LOOKUP_CHUNK]
+        ids.update(conn.execute(select(table.c.sha256, table.c.id).where(table.c.sha256.in_(chunk))).all())
+    return ids
+
+# ============= SCHEMA MIGRATION =============
+
+LEGACY_MIGRATION_CHUNK = 10000
+
+
+def migrate_sales_schema():
+    """
+    Move a legacy sales_data table (free-text product/category/month columns)
+    onto the normalized schema. Month names take their year from the row's
+    timestamp; unparseable months fall back to the timestamp's own month.
+    Legacy rows only had a month, so each sale is dated the 1st of it.
+    Returns the number of rows migrated, or None if there was nothing to do.
+    """
+    inspector = sa_inspect(db.engine)
+    if "sales_data" not in inspector.get_table_names():
+        return None
+    if "product_id" in {column["name"] for column in inspector.get_columns("sales_data")}:
+        return None
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE sales_data RENAME TO sales_data_legacy")
+        # Derived tables are keyed differently now; rebuilt below
+        conn.exec_driver_sql("DROP TABLE IF EXISTS product_stats")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS monthly_sales")
+
+    db.create_all()
+
+    migrated = 0
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("INSERT OR IGNORE INTO product (name) SELECT DISTINCT product FROM sales_data_legacy")
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO category (name) "
+            "SELECT DISTINCT COALESCE(NULLIF(TRIM(category), ''), 'Uncategorized') FROM sales_data_legacy"
+        )
+        products = dict(conn.exec_driver_sql("SELECT name, id FROM product").all())
+        categories = dict(conn.exec_driver_sql("SELECT name, id FROM category").all())
+
+        result = conn.exec_driver_sql(
+            "SELECT id, product, sales, month, category, timestamp FROM sales_data_legacy ORDER BY id"
+        )
+        while True:
+            chunk = result.fetchmany(LEGACY_MIGRATION_CHUNK)
+            if not chunk:
+                break
+            rows = []
+            for id_, product, sales, month, category, timestamp in chunk:
+                stamp = datetime.datetime.fromisoformat(timestamp) if timestamp else datetime.datetime.utcnow()
+                try:
+                    period = parse_period(month, stamp.year)
+                except ValueError:
+                    period = stamp.year * 100 + stamp.month
+                category = (category or "").strip() or "Uncategorized"
+                sale_date = day_label(period * 100 + 1)
+                rows.append((id_, products[product], categories[category], sales, sale_date, period, timestamp))
+            conn.exec_driver_sql(
+                "INSERT INTO sales_data (id, product_id, category_id, sales, sale_date, period, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            migrated += len(rows)
+
+        conn.exec_driver_sql("DROP TABLE sales_data_legacy")
+
+    rebuild_product_stats()
+    rebuild_monthly_sales()
+    db.session.commit()
+    return migrated
+
+
+def migrate_sale_dates():
+    """
+    Add SalesData.sale_date to a table created before sales had a date,
+    dating each existing sale the 1st of its period.
+    Returns the number of rows dated, or None if there was nothing to do.
+    """
+    inspector = sa_inspect(db.engine)
+    if "sales_data" not in inspector.get_table_names():
+        return None
+    if "sale_date" in {column["name"] for column in inspector.get_columns("sales_data")}:
+        return None
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE sales_data ADD COLUMN sale_date DATE NOT NULL DEFAULT '1970-01-01'")
+        return conn.exec_driver_sql(
+            "UPDATE sales_data SET sale_date = printf('%04d-%02d-01', period / 100, period % 100)"
+        ).rowcount
+
+
+def migrate_job_leases():
+    """
+    Add Job.heartbeat_at to a job table created before jobs had leases.
+    Returns True if it was added, or None if there was nothing to do.
+    """
+    inspector = sa_inspect(db.engine)
+    if "job" not in inspector.get_table_names():
+        return None
+    if "heartbeat_at" in {column["name"] for column in inspector.get_columns("job")}:
+        return None
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE job ADD COLUMN heartbeat_at DATETIME")
+    return True
+
+
+def migrate_sales_indexes():
+    """
+    Create SalesData's indexes missing from an existing sales_data table,
+    which db.create_all() leaves alone (e.g. the period and category indexes
+    an earlier release dropped).
+    Returns the names created, or None if there was nothing to do.
+    """
+    inspector = sa_inspect(db.engine)
+    if "sales_data" not in inspector.get_table_names():
+        return None
+    existing = {index["name"] for index in inspector.get_indexes("sales_data")}
+    missing = [index for index in SalesData.__table__.indexes if index.name not in existing]
+    if not missing:
+        return None
+
+    with db.engine.begin() as conn:
+        for index in missing:
+            index.create(conn)
+    return [index.name for index in missing]
+
+
+def migrate_meeting_summaries():
+    """
+    Move a legacy meeting_summary table (full original_text per row) onto
+    compressed, deduplicated meeting_text rows. Legacy summaries came from
+    the extractive summarizer and are keyed as such.
+    Returns the number of rows migrated, or None if there was nothing to do.
+    """
+    inspector = sa_inspect(db.engine)
+    if "meeting_summary" not in inspector.get_table_names():
+        return None
+    if "text_id" in {column["name"] for column in inspector.get_columns("meeting_summary")}:
+        return None
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE meeting_summary RENAME TO meeting_summary_legacy")
+
+    db.create_all()
+
+    migrated = 0
+    with db.engine.begin() as conn:
+        result = conn.exec_driver_sql(
+            "SELECT id, user_id, original_text, summary, created_at FROM meeting_summary_legacy ORDER BY id"
+        )
+        while True:
+            chunk = result.fetchmany(DIMENSION_LOOKUP_CHUNK)
+            if not chunk:
+                break
+            texts = {text_digest(row[2]): row[2] for row in chunk}
+            text_ids = store_meeting_texts(conn, texts)
+            rows = []
+            for id_, user_id, original_text, summary, created_at in chunk:
+                digest = text_digest(original_text)
+                key = summary_key(digest, EXTRACTIVE_VERSION)
+                rows.append((id_, user_id, text_ids[digest], key, "extractive", summary, created_at))
+            conn.exec_driver_sql(
+                "INSERT INTO meeting_summary (id, user_id, text_id, summary_key, mode, summary, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            migrated += len(rows)
+        conn.exec_driver_sql("DROP TABLE meeting_summary_legacy")
+
+    return migrated
+
+
+@app.cli.command("migrate-schema")
+def migrate_schema_command():
+    """Migrate legacy sales_data and meeting_summary tables to the current schema"""
+    migrated = migrate_sales_schema()
+    dated = migrate_sale_dates()
+    indexed = migrate_sales_indexes()
+    leases = migrate_job_leases()
+    summaries = migrate_meeting_summaries()
+    if migrated is None and dated is None and indexed is None and leases is None and summaries is None:
+        logger.info("Schema already up to date")
+    if migrated is not None:
+        logger.info("Migrated %d sales rows to the normalized schema", migrated)
+    if dated is not None:
+        logger.info("Dated %d sales rows from their month", dated)
+    if indexed is not None:
+        logger.info("Created missing sales indexes: %s", ", ".join(indexed))
+    if leases is not None:
+        logger.info("Added job leases")
+    if summaries is not None:
+        logger.info("Migrated %d meeting summaries to compressed storage", summaries)
+
 # ============= JWT TOKEN DECORATOR =============
 
+# What handlers see as current_user: a detached snapshot, not an ORM object
+Principal = namedtuple("Principal", ["id", "username", "email"])
+
+# Verified token -> Principal
+auth_cache = LRUCache(maxsize=app.config['AUTH_CACHE_SIZE'], ttl=app.config['AUTH_CACHE_TTL'])
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_tokens(mapper, connection, target):
+    auth_cache.invalidate(lambda principal: principal.id == target.id)
+
+
+def verify_token(token, session=None):
+    """
+    Decode a JWT and load its user (through session, default read_session),
+    cached until the token expires or the user changes
+    """
+    principal = auth_cache.get(token)
+    if principal is not None:
+        return principal
+
+    data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+    user = (session or read_session).get(User, data['user_id'])
+    if user is None:
+        raise jwt.InvalidTokenError(f"Unknown user: {data['user_id']}")
+
+    principal = Principal(user.id, user.username, user.email)
+    ttl = app.config['AUTH_CACHE_TTL']
+    if 'exp' in data:
+        ttl = min(ttl, data['exp'] - datetime.datetime.utcnow().timestamp())
+    if ttl > 0:
+        auth_cache.set(token, principal, ttl=ttl)
+    return principal
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -58,249 +1027,1069 @@ def token_required(f):
         try:
             if token.startswith('Bearer '):
                 token = token.split(' ')[1]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.get(data['user_id'])
+            current_user = verify_token(token)
         except Exception as e:
-            print(f"Token error: {e}")
+            logger.debug("Token rejected: %s", e)
             return jsonify({'message': 'Token is invalid'}), 401
         
         return f(current_user, *args, **kwargs)
     
     return decorated
 
-# ============= AUTHENTICATION ENDPOINTS =============
 
-@app.route("/login", methods=["POST"])
-def login():
+# ============= ADMISSION CONTROL =============
+
+def _admission_identity(scope):
+    """
+    User key of an ASGI request, as token_required would see it, or None.
+    The verified token cache first; otherwise only the signature is checked,
+    so no request waits for the database before being admitted.
+    """
+    token = next((value for name, value in scope["headers"] if name == b"authorization"), None)
+    if token is None:
+        return None
+    token = token.decode("latin-1")
+    if token.startswith("Bearer "):
+        token = token.split(" ")[1]
+
+    principal = auth_cache.get(token)
+    if principal is not None:
+        return principal.id
     try:
-        data = request.get_json()
-        username = data.get("username")
-        password = data.get("password")
+        return jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])["user_id"]
+    except (jwt.InvalidTokenError, KeyError):
+        return None
 
-        print(f"🔐 Login attempt - Username: {username}")
 
-        if not username or not password:
-            print("❌ Missing username or password")
-            return jsonify({"status": "error", "message": "Username and password required"}), 400
+# Applied by asgi.py around both apps
+admission_control = admission.AdmissionControl(
+    app.config['ADMISSION_ROUTES'],
+    app.config['ADMISSION_QUEUE_TIMEOUT'],
+    app.config['ADMISSION_RETRY_AFTER'],
+    app.config['RATE_LIMIT_PER_USER'],
+    app.config['RATE_LIMIT_ANONYMOUS'],
+    _admission_identity
+)
 
-        user = User.query.filter_by(username=username).first()
+# ============= AUTHENTICATION =============
 
-        if not user:
-            print(f"❌ User not found: {username}")
-            return jsonify({"status": "error", "message": "Invalid credentials"}), 401
+password_hasher = PasswordHasher(
+    app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_MAX_PENDING']
+)
 
-        if not check_password_hash(user.password_hash, password):
-            print(f"❌ Wrong password for user: {username}")
-            return jsonify({"status": "error", "message": "Invalid credentials"}), 401
+# (username, password fingerprint) -> password_hash the attempt failed against.
+# A repeat of the same wrong password is refused without hashing again,
+# until the stored hash changes or the entry expires.
+login_failures = LRUCache(
+    maxsize=app.config['LOGIN_FAILURE_CACHE_SIZE'],
+    ttl=app.config['LOGIN_FAILURE_CACHE_TTL']
+)
 
-        # Create token
-        token = jwt.encode({
-            'user_id': user.id,
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-        }, app.config['SECRET_KEY'], algorithm="HS256")
 
-        print(f"✅ Login successful for: {username}")
+def _login_fingerprint(username, password):
+    message = f"{username}\0{password}".encode()
+    return hmac.new(app.config['SECRET_KEY'].encode(), message, hashlib.sha256).hexdigest()
 
-        return jsonify({
-            "status": "success",
-            "token": token,
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email
-            }
-        })
 
-    except Exception as e:
-        print(f"❌ Login error: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+def log_in(username, password):
+    """
+    Check a password, upgrading its hash if needed; returns (user, error
+    message) with the user None on failure. Blocks on the hash pool and
+    raises HashPoolFull when it is full.
+    """
+    user = read_session.query(User).filter_by(username=username).first()
+    if not user:
+        return None, f"unknown user {username}"
 
+    failure_key = (username, _login_fingerprint(username, password))
+    if login_failures.get(failure_key) == user.password_hash:
+        return None, f"repeated wrong password for {username}"
 
-@app.route("/register", methods=["POST"])
-def register():
-    try:
-        data = request.get_json()
-        username = data.get("username")
-        email = data.get("email")
-        password = data.get("password")
+    if not password_hasher.verify(user.password_hash, password):
+        login_failures.set(failure_key, user.password_hash)
+        return None, f"wrong password for {username}"
 
-        if not username or not email or not password:
-            return jsonify({"status": "error", "message": "Missing required fields"}), 400
+    # Upgrade hashes made with an older method or cost
+    if password_hasher.needs_rehash(user.password_hash):
+        db.session.execute(
+            update(User).where(User.id == user.id).values(password_hash=password_hasher.hash(password))
+        )
+        db.session.commit()
+        logger.info("Password hash upgraded for %s", username)
 
-        if User.query.filter_by(username=username).first():
-            return jsonify({"status": "error", "message": "Username already exists"}), 409
+    return user, None
 
-        if User.query.filter_by(email=email).first():
-            return jsonify({"status": "error", "message": "Email already exists"}), 409
 
-        password_hash = generate_password_hash(password)
-        new_user = User(username=username, email=email, password_hash=password_hash)
-        
-        db.session.add(new_user)
-        db.session.commit()
+def issue_token(user_id):
+    return jwt.encode({
+        'user_id': user_id,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+    }, app.config['SECRET_KEY'], algorithm="HS256")
 
-        print(f"✅ New user registered: {username}")
 
-        return jsonify({"status": "success", "message": "User registered successfully"}), 201
+def register_user(username, email, password):
+    """Create a user; returns (True, None), or (False, message) if the username or email is taken"""
+    if read_session.query(User).filter_by(username=username).first():
+        return False, "Username already exists"
+    if read_session.query(User).filter_by(email=email).first():
+        return False, "Email already exists"
+
+    db.session.add(User(username=username, email=email, password_hash=password_hasher.hash(password)))
+    db.session.commit()
+    return True, None
 
-    except Exception as e:
-        print(f"❌ Registration error: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+
+# ============= RESPONSE CACHE =============
+
+# Analytics payloads per (endpoint, params, data version), served with strong
+# ETags by the async routes (routers/common.py cached_json)
+response_cache = VersionedResponseCache(maxsize=256)
 
 
 # ============= SALES RECOMMENDATIONS =============
 
-@app.route("/recommendation", methods=["GET"])
-def recommendation():
-    try:
-        sales_data = SalesData.query.all()
-        
-        # Group by product and calculate stats
-        product_stats = {}
-        for sale in sales_data:
-            if sale.product not in product_stats:
-                product_stats[sale.product] = {'sales': [], 'count': 0}
-            product_stats[sale.product]['sales'].append(sale.sales)
-            product_stats[sale.product]['count'] += 1
-        
-        recommendations = []
-        for product, stats in product_stats.items():
-            avg_sales = sum(stats['sales']) / len(stats['sales'])
-            total_sales = sum(stats['sales'])
-            
-            # Simple scoring: higher avg and more data points = higher probability
-            score = (avg_sales * stats['count']) / 1000  # Normalize
-            probability = min(score / 10, 0.99)  # Cap at 0.99
-            
-            recommendations.append({
-                "product": product,
-                "probability": round(probability, 2),
-                "avg_sales": round(avg_sales, 2),
-                "total_sales": int(stats['count'])
-            })
+# One row per product, maintained on every sales write. Plain Core selects,
+# run by the async routes in routers/analytics.py.
+RECOMMENDATION_QUERY = select(Product.name, ProductStats.count, ProductStats.total).join(
+    Product, Product.id == ProductStats.product_id
+)
+
+
+def build_recommendations(rows):
+    """Score (product, count, total) rows into the /recommendation payload"""
+    recommendations = []
+    for product, count, total in rows:
+        avg_sales = total / count
         
-        # Sort by probability
-        recommendations.sort(key=lambda x: x['probability'], reverse=True)
+        # Simple scoring: higher avg and more data points = higher probability
+        score = (avg_sales * count) / 1000  # Normalize
+        probability = min(score / 10, 0.99)  # Cap at 0.99
         
-        return jsonify({"recommendations": recommendations})
+        recommendations.append({
+            "product": product,
+            "probability": round(probability, 2),
+            "avg_sales": round(avg_sales, 2),
+            "total_sales": int(count)
+        })
     
-    except Exception as e:
-        print(f"❌ Recommendation error: {e}")
-        return jsonify({"recommendations": []})
+    # Sort by probability
+    recommendations.sort(key=lambda x: x['probability'], reverse=True)
+    return {"recommendations": recommendations}
 
 
-# ============= TEXT SUMMARIZATION =============
+# Read with a raw DBAPI cursor, like FORECAST_CELLS_SQL
+PRODUCT_PAIRS_SQL = "SELECT product_id, other_id, count FROM product_pair"
+PRODUCT_NAMES_QUERY = select(Product.id, Product.name)
 
-@app.route("/summarize", methods=["POST"])
-@token_required
-def summarize(current_user):
+
+def build_neighbor_index(pairs, names):
+    """
+    (NeighborIndex, {id: name}, {name: id}) from (product_id, other_id,
+    count) ProductPair rows and {product id: name}
+    """
+    index = recommender.NeighborIndex(pairs, app.config['RECOMMENDER_TOP_K'])
+    return index, names, {name: id_ for id_, name in names.items()}
+
+
+def _load_neighbor_index():
+    cursor = read_session.connection().connection.cursor()
     try:
-        data = request.get_json()
-        text = data.get("text", "")
-        
-        if len(text) < 50:
-            return jsonify({"error": "Text too short to summarize"}), 400
-        
-        # Simple summarization: take first 3 sentences
-        sentences = text.replace('!', '.').replace('?', '.').split('.')
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        # Take first 3 sentences or up to 150 characters
-        summary_sentences = []
-        summary_length = 0
-        for sentence in sentences[:5]:
-            if summary_length + len(sentence) < 150:
-                summary_sentences.append(sentence)
-                summary_length += len(sentence)
-            else:
-                break
-        
-        summary = '. '.join(summary_sentences) + '.'
-        
-        # Save to database
+        pairs = cursor.execute(PRODUCT_PAIRS_SQL).fetchall()
+    finally:
+        cursor.close()
+    return build_neighbor_index(pairs, dict(read_session.execute(PRODUCT_NAMES_QUERY).all()))
+
+
+def _rebuild_neighbor_index(version):
+    """neighbor_index_cache's background build; None if it fails"""
+    try:
+        with app.app_context():
+            return _load_neighbor_index()
+    except Exception:
+        logger.exception("Neighbour index rebuild for data version %d failed", version)
+        return None
+
+
+# (NeighborIndex, {id: name}, {name: id}), rebuilt in the background as the
+# data version moves; see neighbor_index()
+neighbor_index_cache = recommender.NeighborIndexCache(_rebuild_neighbor_index)
+
+
+def neighbor_index(version):
+    """
+    Top-k co-occurrence neighbours of every product, from the maintained
+    ProductPair counts alone. Built inline only the first time; after that
+    a newer version is served the previous index while the cache rebuilds it.
+    """
+    entry = neighbor_index_cache.get(version)
+    if entry is None:
+        entry = neighbor_index_cache.put(version, _load_neighbor_index())
+    return entry
+
+
+def build_item_recommendations(entry, product, k):
+    """The /recommendation/<product> payload from a neighbor_index() entry, or None if product has no sales"""
+    index, names, ids = entry
+    product_id = ids.get(product)
+    if product_id is None or product_id not in index:
+        return None
+    return {
+        "product": product,
+        "recommendations": [
+            {"product": names[other], "score": score, "co_occurrences": shared}
+            for other, score, shared in index.neighbors(product_id, k)
+        ]
+    }
+
+
+# ============= TEXT SUMMARIZATION =============
+
+summarizer = BatchingSummarizer(
+    app.config['SUMMARIZER_MODEL'],
+    max_batch_size=app.config['SUMMARIZER_MAX_BATCH'],
+    max_wait=app.config['SUMMARIZER_MAX_WAIT'],
+    threads=app.config['SUMMARIZER_THREADS'],
+    retry_after=app.config['SUMMARIZER_RETRY_AFTER']
+)
+SUMMARIZER_MODES = ("transformer", "extractive")
+
+
+def load_summarizer():
+    """
+    Load the transformer now if it is the configured mode, so no request
+    waits for it (or for its download); raises SummarizerUnavailable when it
+    still fails after the retries
+    """
+    if app.config['SUMMARIZER_MODE'] == "transformer":
+        summarizer.load()
+        logger.info("Summarizer model %s loaded", summarizer.model_name)
+
+
+# summary_key -> summary; content-addressed, so entries never go stale
+summary_cache = LRUCache(maxsize=app.config['SUMMARY_CACHE_SIZE'])
+
+
+def summarizer_version(mode):
+    return summarizer.version if mode == "transformer" else EXTRACTIVE_VERSION
+
+
+def resolve_summary_mode(mode=None):
+    mode = mode or app.config['SUMMARIZER_MODE']
+    if mode == "transformer" and summarizer.failed:
+        mode = "extractive"
+    return mode
+
+
+def find_summary(digest, mode):
+    """An earlier summary of the text by the current version of mode, or None"""
+    key = summary_key(digest, summarizer_version(mode))
+    summary = summary_cache.get(key)
+    if summary is None:
+        summary = read_session.execute(
+            select(MeetingSummary.summary).where(MeetingSummary.summary_key == key).limit(1)
+        ).scalar()
+        if summary is not None:
+            summary_cache.set(key, summary)
+    return summary
+
+
+def _new_summary(digest, summary, mode):
+    key = summary_key(digest, summarizer_version(mode))
+    summary_cache.set(key, summary)
+    return summary, mode, key, False
+
+
+def cached_summary(text, digest, mode=None):
+    """
+    Summarize text, reusing an earlier summary of the same text by the same
+    summarizer version from summary_cache or meeting_summary. Without the
+    transformer, falls back to (a reused) extractive summary.
+    Returns (summary, mode, summary_key, cached).
+    """
+    mode = resolve_summary_mode(mode)
+    summary = find_summary(digest, mode)
+    if summary is None and mode == "transformer":
+        try:
+            return _new_summary(digest, summarizer.summarize(text), mode)
+        except SummarizerUnavailable as e:
+            logger.warning("Transformer summarizer unavailable, using extractive: %s", e)
+        # The fallback may have summarized this text before
+        mode = "extractive"
+        summary = find_summary(digest, mode)
+
+    if summary is not None:
+        return summary, mode, summary_key(digest, summarizer_version(mode)), True
+    return _new_summary(digest, extractive_summary(text), mode)
+
+
+def save_summary(user_id, text, digest, mode=None):
+    """
+    Summarize text (or reuse a summary) and record it for the user; returns
+    the /summarize payload. Anonymous summaries (user_id None) are not recorded.
+    """
+    summary, mode, key, cached = cached_summary(text, digest, mode)
+    
+    summary_id = None
+    if user_id is not None:
+        # Save to database; the text itself is stored once, compressed
         meeting = MeetingSummary(
-            user_id=current_user.id,
-            original_text=text,
+            user_id=user_id,
+            text_id=store_meeting_texts(db.session, {digest: text})[digest],
+            summary_key=key,
+            mode=mode,
             summary=summary
         )
         db.session.add(meeting)
         db.session.commit()
-        
-        print(f"✅ Summary created for user: {current_user.username}")
-        
-        return jsonify({
-            "summary": summary,
-            "original_length": len(text),
-            "summary_length": len(summary),
-            "compression_ratio": round(len(summary) / len(text) * 100, 1)
-        })
-        
-    except Exception as e:
-        print(f"❌ Summarization error: {e}")
-        return jsonify({"error": str(e)}), 500
+        summary_id = meeting.id
+    
+    return {
+        "id": summary_id,
+        "summary": summary,
+        "mode": mode,
+        "cached": cached,
+        "original_length": len(text),
+        "summary_length": len(summary),
+        "compression_ratio": round(len(summary) / len(text) * 100, 1)
+    }
+
+
+SUMMARY_MIN_LENGTH = 50  # characters
+
+
+def start_summary(user_id, text, mode=None):
+    """
+    The work of POST /summarize: summarize text for the user (see
+    save_summary), or start a "summarize" job for a long transcript the
+    model has not summarized before. Returns (payload, None) or (None, Job);
+    raises jobs.SchedulerUnavailable when no job worker can take the job.
+    """
+    digest = text_digest(text)
+    mode = resolve_summary_mode(mode)
+    
+    # Long transcripts through the model run in the background, for
+    # anonymous callers too (see own_job)
+    if (mode == "transformer" and len(text) > app.config['SUMMARY_JOB_THRESHOLD']
+            and find_summary(digest, mode) is None):
+        text_id = store_meeting_texts(db.session, {digest: text})[digest]
+        db.session.commit()
+        return None, submit_job("summarize", user_id, {"text_id": text_id, "mode": mode})
+    
+    return save_summary(user_id, text, digest, mode), None
+
+
+SUMMARY_PAGE_DEFAULT = 20
+SUMMARY_PAGE_MAX = 100
+
+
+def summary_history_query(user_id, before=None):
+    """The user's summaries, newest first, optionally before a summary id; without the texts"""
+    query = select(
+        MeetingSummary.id, MeetingSummary.summary, MeetingSummary.mode,
+        MeetingSummary.created_at, MeetingText.length
+    ).join(MeetingText, MeetingText.id == MeetingSummary.text_id).where(
+        MeetingSummary.user_id == user_id
+    ).order_by(MeetingSummary.id.desc())
+    if before is not None:
+        query = query.where(MeetingSummary.id < before)
+    return query
+
+
+# ============= ANOMALY DETECTION =============
+
+ANOMALY_CELLS_QUERY = select(
+    MonthlySales.period, Product.name, Category.name, MonthlySales.total
+).join(Product, Product.id == MonthlySales.product_id).join(
+    Category, Category.id == MonthlySales.category_id
+)
+
+
+def parse_anomaly_params(args):
+    """Validate /anomalies query args from any mapping; returns (params, error)"""
+    mode = args.get("mode", "zscore")
+    dimensions = [d.strip() for d in args.get("dimensions", "total").split(",") if d.strip()]
+
+    if mode not in anomaly_engine.MODES:
+        return None, f"Invalid mode: {mode}"
+    for dimension in dimensions:
+        if dimension not in anomaly_engine.DIMENSIONS:
+            return None, f"Invalid dimension: {dimension}"
+
+    try:
+        window = int(args.get("window", 3))
+    except ValueError:
+        return None, "Invalid window"
+    if window < 2:
+        return None, "Window must be at least 2"
+
+    try:
+        threshold = float(args["threshold"]) if args.get("threshold") else None
+    except ValueError:
+        return None, "Invalid threshold"
+
+    return {"mode": mode, "window": window, "threshold": threshold, "dimensions": dimensions}, None
+
+
+def build_anomaly_response(cells, params):
+    """Run the anomaly engine over (period, product, category, total) cells"""
+    if not cells:
+        logger.info("Anomalies: no sales data")
+        return {"data": []}
+    
+    periods, products, categories, totals = zip(*cells)
+    results = anomaly_engine.detect(periods, products, categories, totals, **params)
+    
+    flagged = sum(r["anomaly"] for series in results.values() for r in series)
+    logger.debug("Anomalies calculated: %d found", flagged)
+    
+    response = {"data": results.get("total", [])}
+    if "product" in results:
+        response["products"] = results["product"]
+    if "category" in results:
+        response["categories"] = results["category"]
+    return response
+
+
+# ============= SALES FORECAST =============
+
+# Read with a raw DBAPI cursor: plain tuples convert to an array an order of
+# magnitude faster than Row objects
+FORECAST_CELLS_SQL = "SELECT period, product_id, category_id, total FROM monthly_sales"
+FORECAST_DIMENSIONS = {"total": None, "product": Product, "category": Category}
+FORECAST_HORIZON_MAX = 24
+
+# (data version, model, dimensions) -> fit_forecasts() result
+forecast_cache = LRUCache(maxsize=32)
+
+
+def parse_forecast_params(args):
+    """Validate /forecast query args from any mapping; returns (params, error)"""
+    model = args.get("model", "holt")
+    dimensions = [d.strip() for d in args.get("dimensions", "total,product").split(",") if d.strip()]
+
+    if model not in forecast_engine.MODELS:
+        return None, f"Invalid model: {model}"
+    for dimension in dimensions:
+        if dimension not in FORECAST_DIMENSIONS:
+            return None, f"Invalid dimension: {dimension}"
+
+    try:
+        horizon = int(args.get("horizon", 3))
+    except ValueError:
+        return None, "Invalid horizon"
+    if not 1 <= horizon <= FORECAST_HORIZON_MAX:
+        return None, f"Horizon must be between 1 and {FORECAST_HORIZON_MAX}"
+
+    return {"model": model, "horizon": horizon, "dimensions": dimensions}, None
+
+
+def fit_forecasts(cells, names, model, dimensions):
+    """
+    {dimension: (names, Fit)} for every series of (period, product_id,
+    category_id, total) FORECAST_CELLS_SQL rows; names: {dimension:
+    {id: name}} for the named dimensions. Series are fitted on dimension
+    ids and named afterwards.
+    """
+    fits = forecast_engine.fit_dimensions(cells, model, dimensions)
+    for dimension, (ids, fit) in fits.items():
+        if FORECAST_DIMENSIONS[dimension] is not None:
+            fits[dimension] = ([names[dimension][id_] for id_ in ids], fit)
+    return fits
+
+
+def build_forecast_response(fits, horizon):
+    """Forecast horizon months ahead from fitted models"""
+    response = {"model": None, "horizon": horizon, "periods": [], "data": []}
+    for dimension, (names, fit) in fits.items():
+        periods, values, rmse = forecast_engine.forecast_lists(fit, horizon)
+        response["model"] = fit.model
+        response["periods"] = [period_label(p) for p in periods]
+
+        if dimension == "total":
+            response["data"] = [
+                {"month": month_name(p), "period": period_label(p), "sales": v}
+                for p, v in zip(periods, values[0])
+            ]
+            response["rmse"] = rmse[0]
+        else:
+            response["products" if dimension == "product" else "categories"] = [
+                {dimension: name, "forecast": row, "rmse": error}
+                for name, row, error in zip(names, values, rmse)
+            ]
+    return response
+
+
+# ============= ROLLUP ANALYTICS =============
+
+ROLLUP_DIMENSIONS = {"product": Product, "category": Category}
+
+
+def parse_period_range(args):
+    """from/to query args (YYYY, YYYY-Qn, YYYY-MM or YYYY-MM-DD) -> ((first, last) YYYYMM or None, error)"""
+    try:
+        start = rollup.parse_bound(args["from"]) if args.get("from") else None
+        end = rollup.parse_bound(args["to"], end=True) if args.get("to") else None
+    except ValueError as e:
+        return None, str(e)
+    if start is not None and end is not None and start > end:
+        return None, "from must not be after to"
+    return (start, end), None
+
+
+def parse_recorded_range(args):
+    """recorded_from/recorded_to query args (YYYY-MM-DD, inclusive) -> ({key: ISO date or None}, error)"""
+    recorded = {}
+    for key in ("recorded_from", "recorded_to"):
+        recorded[key] = None
+        if args.get(key):
+            try:
+                recorded[key] = datetime.date.fromisoformat(args[key]).isoformat()
+            except ValueError:
+                return None, f"Invalid {key}: {args[key]}"
+    return recorded, None
+
+
+def parse_name_filters(args):
+    """product=/category= names, comma separated or (from JSON bodies) a list -> {dimension: sorted names}"""
+    filters = {}
+    for dimension in ROLLUP_DIMENSIONS:
+        value = args.get(dimension) or ""
+        values = value if isinstance(value, list) else value.split(",")
+        names = sorted({str(name).strip() for name in values if str(name).strip()})
+        if names:
+            filters[dimension] = names
+    return filters
+
+
+def parse_day_range(args):
+    """from/to query args, as parse_period_range -> ((first, last) YYYYMMDD or None, error)"""
+    try:
+        start = rollup.parse_day_bound(args["from"]) if args.get("from") else None
+        end = rollup.parse_day_bound(args["to"], end=True) if args.get("to") else None
+    except ValueError as e:
+        return None, str(e)
+    if start is not None and end is not None and start > end:
+        return None, "from must not be after to"
+    return (start, end), None
+
+
+def parse_rollup_params(args):
+    """
+    Validate /analytics/rollup query args from any mapping; returns (params,
+    error). from/to are YYYYMM periods, or YYYYMMDD days for the day grains.
+    """
+    grain = args.get("grain", "month")
+    if grain not in rollup.GRAINS:
+        return None, f"Invalid grain: {grain}"
+
+    group_by = list(dict.fromkeys(d.strip() for d in args.get("group_by", "").split(",") if d.strip()))
+    for dimension in group_by:
+        if dimension not in ROLLUP_DIMENSIONS:
+            return None, f"Invalid group_by dimension: {dimension}"
+
+    period_range, error = (parse_day_range if grain in rollup.DAY_GRAINS else parse_period_range)(args)
+    if error:
+        return None, error
+    start, end = period_range
+
+    return {"grain": grain, "from": start, "to": end, "group_by": group_by, "filters": parse_name_filters(args)}, None
+
+
+def rollup_query(params):
+    """
+    Select (bucket, *group_by names, count, total) from the smallest
+    SalesRollup level holding every grouped and filtered dimension
+    """
+    grain = params["grain"]
+    table = SalesRollup.__table__
+    id_columns = {"product": table.c.product_id, "category": table.c.category_id}
+    bucket = rollup.day_buckets if grain in rollup.DAY_GRAINS else rollup.buckets
+
+    level = rollup.level_for(set(params["group_by"]) | set(params["filters"]))
+    conditions = [table.c.grain == rollup.GRAINS[grain]]
+    if level == "product_category":
+        # != rather than >: not an index range, so a product or category
+        # filter picks the key the plan is built on
+        conditions.append(table.c.product_id != 0)
+    else:
+        conditions.append(table.c.product_id == 0)
+        conditions.append(table.c.category_id > 0 if level == "category" else table.c.category_id == 0)
+
+    if params["from"] is not None:
+        conditions.append(table.c.bucket >= int(bucket(params["from"], grain)))
+    if params["to"] is not None:
+        conditions.append(table.c.bucket <= int(bucket(params["to"], grain)))
+    for dimension, names in params["filters"].items():
+        model = ROLLUP_DIMENSIONS[dimension]
+        conditions.append(id_columns[dimension].in_(select(model.id).where(model.name.in_(names))))
+
+    columns, groups, source = [table.c.bucket], [table.c.bucket], table
+    for dimension in params["group_by"]:
+        model = ROLLUP_DIMENSIONS[dimension]
+        source = source.join(model, model.id == id_columns[dimension])
+        columns.append(model.name)
+        groups.append(model.name)
+    return (
+        select(*columns, func.sum(table.c.count), func.sum(table.c.total))
+        .select_from(source)
+        .where(*conditions)
+        .group_by(*groups)
+        .order_by(*groups)
+    )
+
+
+def snapshot_rollup_rows(snapshot, params):
+    """
+    rollup_query's (bucket, *group_by names, count, total) rows computed
+    from the columnar snapshot, for the day grains below the category level
+    """
+    members = {
+        dimension: read_session.execute(
+            select(ROLLUP_DIMENSIONS[dimension].id).where(ROLLUP_DIMENSIONS[dimension].name.in_(names))
+        ).scalars().all()
+        for dimension, names in params["filters"].items()
+    }
+    group_by = params["group_by"]
+    keys, counts, totals = columnar.bucket_sums(
+        snapshot, lambda days: rollup.day_buckets(days, params["grain"]), group_by,
+        (params["from"], params["to"]), members
+    )
+
+    names = [
+        dict(read_session.execute(select(ROLLUP_DIMENSIONS[dimension].id, ROLLUP_DIMENSIONS[dimension].name)).all())
+        for dimension in group_by
+    ]
+    rows = [
+        (bucket, *(dimension_names.get(key) for dimension_names, key in zip(names, ids)), count, total)
+        for (bucket, *ids), count, total in zip(keys.T.tolist(), counts.tolist(), totals.tolist())
+    ]
+    # The order rollup_query gives: bucket, then names
+    rows.sort(key=lambda row: (row[0], *(name or "" for name in row[1:-2])))
+    return rows
+
+
+def build_rollup_response(rows, params):
+    grain = params["grain"]
+    group_by = params["group_by"]
+    label = day_label if grain in rollup.DAY_GRAINS else period_label
+    data = []
+    for bucket, *names, count, total in rows:
+        cell = {"period": rollup.bucket_label(bucket, grain)}
+        cell.update(zip(group_by, names))
+        cell.update({"count": count, "total": round(total, 2), "average": round(total / count, 2)})
+        data.append(cell)
+    return {
+        "grain": grain,
+        "from": label(params["from"]) if params["from"] is not None else None,
+        "to": label(params["to"]) if params["to"] is not None else None,
+        "group_by": group_by,
+        "filters": params["filters"],
+        "data": data
+    }
+
+
+# ============= ROW-LEVEL ANALYTICS =============
+
+def _default_columnar_dir():
+    with app.app_context():
+        database = db.engine.url.database
+    if not database or database == ":memory:":
+        return os.path.join(app.instance_path, "columnar")
+    return database + "-columnar"
+
+
+sales_columns_store = columnar.ColumnarStore(app.config['COLUMNAR_DIR'] or _default_columnar_dir())
+REWRITE_VERSION_QUERY = select(func.coalesce(func.max(RewriteVersion.version), 0))
+# Read with a raw DBAPI cursor, like FORECAST_CELLS_SQL
+SALES_COLUMNS_SQL = (
+    "SELECT id, product_id, category_id, period, CAST(strftime('%Y%m%d', sale_date) AS INTEGER), sales, timestamp "
+    "FROM sales_data WHERE id > ? ORDER BY id"
+)
+SALES_COLUMNS_CHUNK = 100_000
+DISTRIBUTION_GROUPS = {"total": None, "product": Product, "category": Category}
+DISTRIBUTION_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def _sales_rows_after(after_id):
+    cursor = read_session.connection().connection.cursor()
+    try:
+        cursor.execute(SALES_COLUMNS_SQL, (after_id,))
+        while True:
+            chunk = cursor.fetchmany(SALES_COLUMNS_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        cursor.close()
+
+
+def sales_columns(version):
+    """Columnar snapshot of SalesData as of data version `version` or later (see columnar.py)"""
+    return sales_columns_store.get(
+        version, lambda: read_session.execute(REWRITE_VERSION_QUERY).scalar(), _sales_rows_after
+    )
+
+
+def parse_distribution_params(args):
+    """Validate /analytics/distribution query args from any mapping; returns (params, error)"""
+    group_by = args.get("group_by", "total")
+    if group_by not in DISTRIBUTION_GROUPS:
+        return None, f"Invalid group_by: {group_by}"
+
+    period_range, error = parse_period_range(args)
+    if error:
+        return None, error
+    start, end = period_range
+
+    recorded, error = parse_recorded_range(args)
+    if error:
+        return None, error
+
+    return {
+        "group_by": group_by, "from": start, "to": end, "filters": parse_name_filters(args),
+        "recorded_from": recorded["recorded_from"], "recorded_to": recorded["recorded_to"]
+    }, None
+
+
+def build_distribution_response(snapshot, params):
+    """Per-group distribution of single sales entries, one vectorized pass over the snapshot"""
+    members = {
+        dimension: read_session.execute(
+            select(ROLLUP_DIMENSIONS[dimension].id).where(ROLLUP_DIMENSIONS[dimension].name.in_(names))
+        ).scalars().all()
+        for dimension, names in params["filters"].items()
+    }
+    group_by = params["group_by"]
+    keys, counts, means, mins, maxs, quantiles = columnar.distribution(
+        snapshot, None if group_by == "total" else group_by, (params["from"], params["to"]),
+        (params["recorded_from"], params["recorded_to"]), members, DISTRIBUTION_QUANTILES
+    )
+
+    model = DISTRIBUTION_GROUPS[group_by]
+    names = dict(read_session.execute(select(model.id, model.name)).all()) if model is not None else {}
+    data = []
+    for i, key in enumerate(keys.tolist()):
+        row = {group_by: names.get(key)} if model is not None else {}
+        row["count"] = int(counts[i])
+        row["mean"] = round(float(means[i]), 2)
+        row["min"] = float(mins[i])
+        for q, values in zip(DISTRIBUTION_QUANTILES, quantiles):
+            row[f"p{round(q * 100)}"] = round(float(values[i]), 2)
+        row["max"] = float(maxs[i])
+        data.append(row)
+    if model is not None:
+        data.sort(key=lambda row: row[group_by] or "")
+    return {"group_by": group_by, "entries": int(counts.sum()), "data": data}
+
+
+# ============= ANALYTICS STREAM =============
+
+# Delta events for the GET /stream/analytics clients of this process
+# (routers/stream.py). A commit here wakes its watcher at once; writes from
+# other workers and from jobs are picked up when it polls the data version.
+analytics_broker = broker.Broker(app.config['STREAM_QUEUE_SIZE'])
+
+# Month x category cells of the rollup cube: a few hundred rows however
+# many products and sales there are, so re-evaluating after a write is cheap
+STREAM_CELLS_QUERY = rollup_query(
+    {"grain": "month", "from": None, "to": None, "group_by": ["category"], "filters": {}}
+)
+STREAM_ANOMALY_PARAMS = {"mode": "zscore", "window": 3, "threshold": None, "dimensions": ["total", "category"]}
+
+# totals: {period: cell}; points: {(series, name, period): anomaly result};
+# recommendations: {product: row}; top: the best product names, in order
+AnalyticsState = namedtuple("AnalyticsState", ["version", "totals", "points", "recommendations", "top"])
+
+
+@event.listens_for(db.session, "after_commit")
+def _notify_analytics_stream(session):
+    if session.info.pop("data_changed", False):
+        analytics_broker.notify()
+
+
+def analytics_state(version, cells, recommendation_rows):
+    """
+    What the stream reports on, from STREAM_CELLS_QUERY (bucket, category,
+    count, total) rows and RECOMMENDATION_QUERY rows
+    """
+    sums = {}
+    for period, _, count, total in cells:
+        cell = sums.setdefault(period, [0, 0.0])
+        cell[0] += count
+        cell[1] += total
+    totals = {
+        period_label(period): {
+            "period": period_label(period), "month": month_name(period), "count": count, "total": round(total, 2)
+        }
+        for period, (count, total) in sums.items()
+    }
+
+    points = {}
+    if cells:
+        periods, categories, _, values = zip(*cells)
+        results = anomaly_engine.detect(
+            periods, [0] * len(periods), categories, values, **STREAM_ANOMALY_PARAMS
+        )
+        for series, rows in results.items():
+            for row in rows:
+                points[(series, row.get(series), row["period"])] = row
+
+    ranked = build_recommendations(recommendation_rows)["recommendations"]
+    return AnalyticsState(
+        version, totals, points,
+        {row["product"]: row for row in ranked},
+        [row["product"] for row in ranked[:app.config['STREAM_TOP_RECOMMENDATIONS']]]
+    )
+
+
+def analytics_deltas(old, new):
+    """(event, data) pairs taking a client from state old to state new"""
+    events = []
+
+    changed, removed = broker.diff(old.totals, new.totals)
+    if changed or removed:
+        events.append(("totals", {"changed": [new.totals[key] for key in changed], "removed": removed}))
+
+    def flagged_in(state, key):
+        return key in state.points and state.points[key]["anomaly"]
+
+    changed, removed = broker.diff(old.points, new.points)
+    flagged = [dict(new.points[key], series=key[0]) for key in changed
+               if flagged_in(new, key) and not flagged_in(old, key)]
+    cleared = [dict(new.points.get(key, old.points[key]), series=key[0]) for key in changed + removed
+               if flagged_in(old, key) and not flagged_in(new, key)]
+    delta = {
+        # the /anomalies "data" series, row for row
+        "changed": [new.points[key] for key in changed if key[0] == "total"],
+        "removed": [key[2] for key in removed if key[0] == "total"],
+        "flagged": flagged,
+        "cleared": cleared
+    }
+    if any(delta.values()):
+        events.append(("anomalies", delta))
+
+    changed, removed = broker.diff(old.recommendations, new.recommendations)
+    if changed or removed or old.top != new.top:
+        events.append(("recommendations", {
+            "changed": [new.recommendations[key] for key in changed], "removed": removed, "top": new.top
+        }))
+    return events
+
+
+# ============= PDF EXPORT =============
+
+report_cache = reports.ReportCache(
+    app.config['REPORT_CACHE_DIR'] or os.path.join(app.instance_path, "reports")
+)
+ANOMALY_REPORT_PARAMS = {
+    "mode": "zscore", "window": 3, "threshold": None, "dimensions": list(anomaly_engine.DIMENSIONS)
+}
+MONTHLY_TOTALS_QUERY = select(
+    MonthlySales.period, func.sum(MonthlySales.count), func.sum(MonthlySales.total)
+).group_by(MonthlySales.period).order_by(MonthlySales.period)
+
+
+def _monthly_totals_section():
+    yield reports.heading("Monthly totals")
+    rows = read_session.execute(MONTHLY_TOTALS_QUERY)
+    yield from reports.table(
+        ["Period", "Entries", "Total sales"],
+        ((period_label(period), count, total) for period, count, total in rows)
+    )
+
+
+def _recommendations_section():
+    yield reports.heading("Product recommendations")
+    payload = build_recommendations(read_session.execute(RECOMMENDATION_QUERY).all())
+    yield from reports.table(
+        ["Product", "Probability", "Avg sales", "Entries"],
+        ((r["product"], r["probability"], r["avg_sales"], r["total_sales"]) for r in payload["recommendations"])
+    )
+
+
+def _anomaly_sections(flagged_only):
+    cells = read_session.execute(ANOMALY_CELLS_QUERY).all()
+    payload = build_anomaly_response(cells, ANOMALY_REPORT_PARAMS)
+    for key, title, label in (("data", "Total sales", None), ("products", "By product", "product"),
+                              ("categories", "By category", "category")):
+        series = [r for r in payload.get(key, []) if r["anomaly"] or not flagged_only]
+        yield reports.heading(f"Anomalies: {title}")
+        if not series:
+            yield reports.paragraph("No anomalies detected.", note=True)
+            continue
+        columns = ([label.title()] if label else []) + ["Period", "Sales", "Z-score", "Anomaly"]
+        yield from reports.table(columns, (
+            ([r[label]] if label else []) + [r["period"], r["sales"], r["z_score"], "yes" if r["anomaly"] else ""]
+            for r in series
+        ), highlight=lambda row: row[-1] == "yes")
+
+
+def _sales_report(current_user):
+    yield from _monthly_totals_section()
+    yield from _recommendations_section()
+    yield reports.heading("Sales entries")
+    max_rows = app.config['REPORT_MAX_ROWS']
+    result = read_session.execute(
+        _sales_query().limit(max_rows + 1).execution_options(yield_per=SALES_STREAM_CHUNK)
+    )
+    yield from reports.table(
+        ["ID", "Product", "Category", "Period", "Sales", "Recorded"],
+        ((row.id, row.product, row.category, period_label(row.day // 100), row.sales,
+          row.timestamp.strftime("%Y-%m-%d %H:%M")) for row in result),
+        max_rows=max_rows
+    )
+
+
+def _anomalies_report(current_user):
+    yield from _anomaly_sections(flagged_only=False)
+
+
+def _analytics_report(current_user):
+    count, total = read_session.execute(
+        select(func.coalesce(func.sum(ProductStats.count), 0), func.coalesce(func.sum(ProductStats.total), 0.0))
+    ).one()
+    yield reports.heading("Overview")
+    yield from reports.table(["Sales entries", "Total sales", "Products", "Categories"], [(
+        count, total,
+        read_session.execute(select(func.count()).select_from(ProductStats)).scalar(),
+        read_session.execute(select(func.count(func.distinct(MonthlySales.category_id)))).scalar()
+    )])
+    yield from _monthly_totals_section()
+    yield from _recommendations_section()
+    yield from _anomaly_sections(flagged_only=True)
+
+
+def _summaries_report(current_user):
+    yield reports.heading(f"Meeting summaries for {current_user.username}")
+    max_rows = app.config['REPORT_MAX_ROWS']
+    result = read_session.execute(
+        select(MeetingSummary.created_at, MeetingSummary.mode, MeetingSummary.summary)
+        .where(MeetingSummary.user_id == current_user.id)
+        .order_by(MeetingSummary.id.desc())
+        .limit(max_rows + 1)
+        .execution_options(yield_per=SALES_STREAM_CHUNK)
+    )
+    yield from reports.table(
+        ["Date", "Mode", "Summary"],
+        ((created_at.strftime("%Y-%m-%d %H:%M"), mode, summary) for created_at, mode, summary in result),
+        max_rows=max_rows
+    )
+
+
+# type -> (title, body); body(current_user) yields flowables
+REPORTS = {
+    "sales": ("Sales Report", _sales_report),
+    "anomalies": ("Anomaly Report", _anomalies_report),
+    "analytics": ("Business Analytics", _analytics_report),
+    "summaries": ("Meeting Summaries", _summaries_report),
+}
+
+
+def report_version(report_type, user_id):
+    """(cache name, version) of a report: the data version, or for summaries the user's latest one"""
+    if report_type == "summaries":
+        version = read_session.execute(
+            select(func.coalesce(func.max(MeetingSummary.id), 0)).where(MeetingSummary.user_id == user_id)
+        ).scalar()
+        return f"summaries-{user_id}", version
+    return report_type, current_data_version()
 
 
-# ============= ANOMALY DETECTION =============
+def render_report(report_type, user):
+    """Path of the report for user (a Principal), rendering it if needed"""
+    title, body = REPORTS[report_type]
+    name, version = report_version(report_type, user.id)
+    return report_cache.get(name, version, lambda path: reports.render_pdf(
+        path, title, reports.generated_note(version), body(user)
+    ))
+
+
+@app.route("/export/pdf", methods=["GET", "POST"])
+@token_required
+def export_pdf(current_user):
+    """
+    Download a PDF report; body or query: type=sales|anomalies|analytics|summaries
+    Reports are cached on disk until the sales data (or, for summaries, the
+    user's summaries) change. A report that isn't rendered yet answers 202
+    with an export job; download it again once the job has finished.
+    """
+    data = request.get_json(silent=True) or request.args
+    report_type = data.get("type", "sales")
+    if report_type not in REPORTS:
+        return jsonify({"status": "error", "message": f"Invalid report type: {report_type}"}), 400
+    if not reports.available():
+        return jsonify({"status": "error", "message": "PDF export requires reportlab"}), 503
 
-@app.route("/anomalies", methods=["GET"])
-def anomalies():
     try:
-        # Get sales data grouped by month
-        sales_data = SalesData.query.all()
-        
-        if not sales_data:
-            print("⚠️ No sales data found")
-            return jsonify({"data": []})
-        
-        # Group by month
-        monthly_sales = {}
-        for sale in sales_data:
-            if sale.month not in monthly_sales:
-                monthly_sales[sale.month] = 0
-            monthly_sales[sale.month] += sale.sales
-        
-        # Calculate mean and std
-        values = list(monthly_sales.values())
-        mean_val = sum(values) / len(values)
-        
-        # Calculate standard deviation
-        variance = sum((x - mean_val) ** 2 for x in values) / len(values)
-        std_val = variance ** 0.5
-        
-        # Calculate z-scores
-        results = []
-        for month, sales in monthly_sales.items():
-            z_score = (sales - mean_val) / std_val if std_val > 0 else 0
-            is_anomaly = abs(z_score) >= 2
-            
-            results.append({
-                "month": month,
-                "sales": float(sales),
-                "z_score": round(float(z_score), 2),
-                "anomaly": bool(is_anomaly)
-            })
-        
-        # Sort by month order
-        month_order = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        results.sort(key=lambda x: month_order.index(x["month"]) if x["month"] in month_order else 999)
-        
-        print(f"✅ Anomalies calculated: {len([r for r in results if r['anomaly']])} found")
-        
-        return jsonify({"data": results})
-    
+        name, version = report_version(report_type, current_user.id)
+        path = report_cache.find(name, version)
+        if path is None:
+            # Not rendered for this data yet: render in the background
+            return job_accepted(submit_job("export", current_user.id, {"report_type": report_type}, dedupe=True))
+    except jobs.SchedulerUnavailable as e:
+        return job_unavailable(e)
     except Exception as e:
-        print(f"❌ Anomalies error: {e}")
-        return jsonify({"data": []})
+        logger.exception("Export failed")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    logger.info("%s exported for %s", REPORTS[report_type][0], current_user.username)
+    response = send_file(
+        path, mimetype="application/pdf", as_attachment=True, conditional=True, etag=f"{name}-{version}",
+        download_name=f"report_{report_type}_{datetime.date.today().isoformat()}.pdf"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 # ============= INITIALIZE DATABASE =============
 
+@app.cli.command("init-db")
+def init_database_command():
+    """Migrate, create tables and seed; run once per deploy, before starting the server"""
+    init_database()
+
+
 def init_database():
     """Initialize database with sample data"""
     with app.app_context():
+        # Move pre-normalization databases onto the current schema first
+        migrated = migrate_sales_schema()
+        if migrated is not None:
+            logger.info("Migrated %d sales rows to the normalized schema", migrated)
+        dated = migrate_sale_dates()
+        if dated is not None:
+            logger.info("Dated %d sales rows from their month", dated)
+        indexed = migrate_sales_indexes()
+        if indexed is not None:
+            logger.info("Created missing sales indexes: %s", ", ".join(indexed))
+        if migrate_job_leases() is not None:
+            logger.info("Added job leases")
+        summaries = migrate_meeting_summaries()
+        if summaries is not None:
+            logger.info("Migrated %d meeting summaries to compressed storage", summaries)
+        
         # Create tables
         db.create_all()
-        print("✅ Database tables created")
+        logger.info("Database tables created")
+        
+        if db.session.get(DataVersion, 1) is None:
+            db.session.add(DataVersion(id=1, version=0))
+            db.session.commit()
+        if db.session.get(RewriteVersion, 1) is None:
+            db.session.add(RewriteVersion(id=1, version=0))
+            db.session.commit()
+        
+        # Jobs can't outlive the process that scheduled them
+        interrupted = db.session.execute(
+            update(Job).where(Job.status.in_(JOB_ACTIVE)).values(
+                status="failed", error="Interrupted by a server restart", finished_at=datetime.datetime.utcnow()
+            )
+        ).rowcount
+        db.session.commit()
+        if interrupted:
+            logger.warning("Marked %d interrupted jobs as failed", interrupted)
         
         # Check if admin exists
         admin = User.query.filter_by(username='admin').first()
@@ -308,17 +2097,17 @@ def init_database():
             admin = User(
                 username='admin',
                 email='admin@example.com',
-                password_hash=generate_password_hash('123')
+                password_hash=generate_password_hash('123', app.config['PASSWORD_HASH_METHOD'])
             )
             db.session.add(admin)
             db.session.commit()
-            print("✅ Admin user created (username: admin, password: 123)")
+            logger.info("Admin user created (username: admin, password: 123)")
         else:
-            print("✅ Admin user already exists")
+            logger.info("Admin user already exists")
         
         # Check if sample data exists
         if SalesData.query.count() == 0:
-            print("📊 Adding sample sales data...")
+            logger.info("Adding sample sales data")
             sample_data = [
                 ("Laptop", 120, "Jan", "Electronics"),
                 ("Mouse", 80, "Jan", "Accessories"),
@@ -336,198 +2125,830 @@ def init_database():
                 ("Monitor", 100, "Jul", "Electronics"),
             ]
             
-            for product, sales, month, category in sample_data:
-                new_data = SalesData(product=product, sales=sales, month=month, category=category)
-                db.session.add(new_data)
-            
+            rows, _ = upload_sales_data.validate_batch({
+                "product": [row[0] for row in sample_data],
+                "sales": [row[1] for row in sample_data],
+                "month": [row[2] for row in sample_data],
+                "category": [row[3] for row in sample_data],
+                "row": list(range(1, len(sample_data) + 1))
+            })
+            insert_sales_rows(rows)
             db.session.commit()
-            print("✅ Sample data added successfully")
+            logger.info("Sample data added")
         else:
-            print("✅ Sample data already exists")
+            logger.info("Sample data already exists")
+        
+        # Backfill the summaries for databases created before they existed
+        if SalesData.query.count() > 0:
+            if ProductStats.query.count() == 0:
+                count = rebuild_product_stats()
+                logger.info("Product stats built for %d products", count)
+            if MonthlySales.query.count() == 0:
+                count = rebuild_monthly_sales()
+                logger.info("Monthly sales built for %d cells", count)
+            if ProductPair.query.count() == 0:
+                count = rebuild_cooccurrence()
+                logger.info("Product co-occurrence built for %d pairs", count)
+            if SalesRollup.query.count() == 0:
+                count = rebuild_sales_rollup()
+                logger.info("Sales rollup built for %d cells", count)
+            db.session.commit()
 
 
 # ============= DATA MANAGEMENT ENDPOINTS =============
 
-@app.route("/add-sales", methods=["POST"])
-@token_required
-def add_sales(current_user):
-    """
-    Add new sales data
-    Body: {
-        "product": "Laptop",
-        "sales": 150.50,
-        "month": "Jan",
-        "category": "Electronics"
-    }
+def add_sale(product, value, sale_date, category):
+    """Insert one sale and record it in the aggregates, committed; returns its payload"""
+    product_id = dimension_ids(Product, [product])[product]
+    category_id = dimension_ids(Category, [category])[category]
+    
+    new_sale = SalesData(
+        product_id=product_id,
+        sales=value,
+        sale_date=sale_date,
+        period=sale_date.year * 100 + sale_date.month,
+        category_id=category_id
+    )
+    db.session.add(new_sale)
+    record_sales([(product_id, new_sale.sales, new_sale.day, category_id)])
+    db.session.commit()
+    
+    return _sale_payload(new_sale.id, product, new_sale.sales, new_sale.day, category)
+
+
+def add_sales_entries(entries):
+    """
+    Validate {"product", "sales", "date"/"month", "category"} entries and
+    insert them in one transaction, all or nothing.
+    Returns (entries added, errors); nothing is added if any entry is invalid.
     """
+    columns = {
+        field: [entry.get(field) for entry in entries]
+        for field in upload_sales_data.FIELDS
+    }
+    columns["row"] = list(range(1, len(entries) + 1))
+    rows, errors = upload_sales_data.validate_batch(columns)
+    if errors:
+        return 0, errors
+    
     try:
-        data = request.get_json()
-        
-        required_fields = ["product", "sales", "month"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"status": "error", "message": f"Missing field: {field}"}), 400
-        
-        new_sale = SalesData(
-            product=data["product"],
-            sales=float(data["sales"]),
-            month=data["month"],
-            category=data.get("category", "Uncategorized")
-        )
-        
-        db.session.add(new_sale)
+        added_count = insert_sales_rows(rows)
         db.session.commit()
-        
-        print(f"✅ New sales entry added: {data['product']} - ${data['sales']}")
-        
-        return jsonify({
-            "status": "success",
-            "message": "Sales data added successfully",
-            "data": {
-                "id": new_sale.id,
-                "product": new_sale.product,
-                "sales": new_sale.sales,
-                "month": new_sale.month,
-                "category": new_sale.category
-            }
-        }), 201
-        
-    except Exception as e:
-        print(f"❌ Add sales error: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+    except Exception:
+        db.session.rollback()
+        raise
+    return added_count, []
 
 
-@app.route("/bulk-add-sales", methods=["POST"])
-@token_required
-def bulk_add_sales(current_user):
+def insert_sales_rows(rows):
     """
-    Add multiple sales entries at once
-    Body: {
-        "sales": [
-            {"product": "Laptop", "sales": 150, "month": "Jan", "category": "Electronics"},
-            {"product": "Mouse", "sales": 25, "month": "Jan", "category": "Accessories"}
-        ]
-    }
+    Insert validated (product, sales, day, category) rows, names resolved
+    to dimension ids, with one Core executemany and update the derived
+    aggregates, all in the current transaction
     """
+    if not rows:
+        return 0
+    
+    products = dimension_ids(Product, {row[0] for row in rows})
+    categories = dimension_ids(Category, {row[3] for row in rows})
+    id_rows = [
+        (products[product], value, day, categories[category])
+        for product, value, day, category in rows
+    ]
+    
+    # Driver-level executemany with positional tuples: SQLAlchemy's per-row
+    # parameter processing costs more than the insert itself at this volume
+    timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+    dates = {day: day_label(day) for day in {row[2] for row in id_rows}}
+    db.session.connection().exec_driver_sql(
+        "INSERT INTO sales_data (product_id, sales, sale_date, period, category_id, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(product, value, dates[day], day // 100, category, timestamp) for product, value, day, category in id_rows]
+    )
+    record_sales(id_rows)
+    return len(rows)
+
+
+def ingest_sales(batches, cancelled=None):
+    """
+    Validate and insert reader batches, one transaction per batch.
+    Bad rows are skipped and reported; they never abort the load.
+    cancelled() is checked between batches; if it returns True the load
+    stops with JobCancelled, keeping the batches already committed.
+    """
+    inserted = 0
+    rejected = 0
+    errors = []
+    
+    # A batch is hundreds of thousands of small, acyclic objects; every one
+    # allocated counts towards a cyclic collection that finds nothing but
+    # rescans the whole batch. Reference counting frees them all the same.
+    gc_enabled = gc.isenabled()
+    gc.disable()
     try:
-        data = request.get_json()
-        sales_list = data.get("sales", [])
-        
-        if not sales_list:
-            return jsonify({"status": "error", "message": "No sales data provided"}), 400
-        
-        added_count = 0
-        for sale_data in sales_list:
-            new_sale = SalesData(
-                product=sale_data["product"],
-                sales=float(sale_data["sales"]),
-                month=sale_data["month"],
-                category=sale_data.get("category", "Uncategorized")
-            )
-            db.session.add(new_sale)
-            added_count += 1
-        
-        db.session.commit()
-        print(f"✅ Bulk sales added: {added_count} entries")
-        
-        return jsonify({
-            "status": "success",
-            "message": f"{added_count} sales entries added successfully"
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        print(f"❌ Bulk add error: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        for rows, batch_errors in upload_sales_data.validated_batches(batches):
+            if cancelled is not None and cancelled():
+                raise jobs.JobCancelled(f"Cancelled after {inserted} rows")
+            try:
+                inserted += insert_sales_rows(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            
+            rejected += len(batch_errors)
+            room = upload_sales_data.MAX_REPORTED_ERRORS - len(errors)
+            if room > 0:
+                errors.extend(batch_errors[:room])
+    finally:
+        if gc_enabled:
+            gc.enable()
+    
+    return {"inserted": inserted, "rejected": rejected, "errors": errors}
+
 
+INGEST_SPOOL_BLOCK = 1 << 20
 
-@app.route("/get-all-sales", methods=["GET"])
+
+@app.route("/ingest-sales", methods=["POST"])
 @token_required
-def get_all_sales(current_user):
-    """Get all sales data"""
+def ingest_sales_endpoint(current_user):
+    """
+    Load a CSV or NDJSON body of any size into SalesData, as a background job
+    Query: format=csv|ndjson (default: from Content-Type, else csv)
+    CSV needs a header row with product, sales, date and/or month and optional category.
+    The body is spooled to disk and 202 returned with the job; its result
+    has the inserted/rejected counts and the first errors.
+    """
+    fmt = request.args.get("format")
+    if fmt is None:
+        fmt = "ndjson" if request.mimetype in ("application/x-ndjson", "application/jsonl") else "csv"
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"status": "error", "message": f"Invalid format: {fmt}"}), 400
+
     try:
-        sales = SalesData.query.order_by(SalesData.timestamp.desc()).all()
-        
-        results = []
-        for sale in sales:
-            results.append({
-                "id": sale.id,
-                "product": sale.product,
-                "sales": sale.sales,
-                "month": sale.month,
-                "category": sale.category,
-                "timestamp": sale.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            })
-        
-        return jsonify({"status": "success", "data": results})
+        upload_dir = app.config['JOB_UPLOAD_DIR'] or os.path.join(app.instance_path, "uploads")
+        os.makedirs(upload_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=upload_dir, suffix=f".{fmt}", delete=False) as spool:
+            while True:
+                block = request.stream.read(INGEST_SPOOL_BLOCK)
+                if not block:
+                    break
+                spool.write(block)
         
+        job = submit_job("ingest", current_user.id, {"path": spool.name, "fmt": fmt})
+        logger.info("Ingest queued as job %s", job.id)
+        return job_accepted(job)
+    
+    except jobs.SchedulerUnavailable as e:
+        return job_unavailable(e)
     except Exception as e:
-        print(f"❌ Get sales error: {e}")
+        logger.exception("Ingest failed")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-@app.route("/delete-sales/<int:sale_id>", methods=["DELETE"])
-@token_required
-def delete_sales(current_user, sale_id):
-    """Delete a sales entry"""
-    try:
-        sale = SalesData.query.get(sale_id)
-        
-        if not sale:
-            return jsonify({"status": "error", "message": "Sales entry not found"}), 404
-        
-        db.session.delete(sale)
+SALES_COLUMNS = ["id", "product", "sales", "date", "month", "period", "category", "timestamp"]
+SALES_PAGE_DEFAULT = 500
+SALES_PAGE_MAX = 10000
+SALES_STREAM_CHUNK = 1000
+
+
+def _sale_payload(sale_id, product, sales, day, category):
+    period = day // 100
+    return {
+        "id": sale_id,
+        "product": product,
+        "sales": sales,
+        "date": day_label(day),
+        "month": month_name(period),
+        "period": period_label(period),
+        "category": category
+    }
+
+
+def _sale_row(row):
+    payload = _sale_payload(row.id, row.product, row.sales, row.day, row.category)
+    payload["timestamp"] = row.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    return payload
+
+
+def _encode_sales_cursor(row):
+    raw = f"{row.timestamp.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_sales_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    timestamp, sale_id = raw.rsplit("|", 1)
+    return datetime.datetime.fromisoformat(timestamp), int(sale_id)
+
+
+def _sales_query(after=None):
+    """Newest-first SalesData columns, optionally after a (timestamp, id) keyset position"""
+    query = select(
+        SalesData.id, Product.name.label("product"), SalesData.sales,
+        SALE_DAY.label("day"), Category.name.label("category"), SalesData.timestamp
+    ).join(Product, Product.id == SalesData.product_id).join(
+        Category, Category.id == SalesData.category_id
+    ).order_by(SalesData.timestamp.desc(), SalesData.id.desc())
+    if after is not None:
+        query = query.where(tuple_(SalesData.timestamp, SalesData.id) < tuple_(*after))
+    return query
+
+
+def delete_sale(sale_id):
+    """Delete one sale and take it out of the aggregates, committed; False if there is no such sale"""
+    sale = db.session.get(SalesData, sale_id)
+    if sale is None:
+        return False
+
+    db.session.delete(sale)
+    db.session.flush()
+    unrecord_sales([(sale.product_id, sale.sales, sale.day, sale.category_id)])
+    db.session.commit()
+    return True
+
+
+def update_sale(sale_id, data):
+    """
+    Apply an update body to one sale and move it between aggregate cells,
+    committed. Returns its payload, or None if there is no such sale.
+    Body: any of product, sales, category, date ("2025-01-15") or month;
+    a month moves the sale to that month of its own year (keeping the day
+    where the month has it) unless given with a year, as "2025-03".
+    Raises ValueError for a bad date, month or sales value.
+    """
+    sale = db.session.get(SalesData, sale_id)
+    if sale is None:
+        return None
+    old_row = (sale.product_id, sale.sales, sale.day, sale.category_id)
+
+    # Validate and resolve everything before touching the row
+    if "date" in data:
+        sale_date = parse_sale_date(data["date"], sale.sale_date.year)
+    elif "month" in data:
+        period = parse_period(data["month"], sale.sale_date.year)
+        sale_date = move_to_month(sale.sale_date, period // 100, period % 100)
+    else:
+        sale_date = sale.sale_date
+    value = float(data["sales"]) if "sales" in data else sale.sales
+    if not math.isfinite(value):
+        raise ValueError("Invalid sales value")
+
+    if "product" in data:
+        sale.product_id = dimension_ids(Product, [data["product"]])[data["product"]]
+    if "category" in data:
+        category = data["category"] or "Uncategorized"
+        sale.category_id = dimension_ids(Category, [category])[category]
+    sale.sales = value
+    sale.sale_date = sale_date
+    sale.period = sale_date.year * 100 + sale_date.month
+
+    new_row = (sale.product_id, sale.sales, sale.day, sale.category_id)
+    if new_row != old_row:
+        db.session.flush()
+        unrecord_sales([old_row])
+        record_sales([new_row])
+    db.session.commit()
+
+    return _sale_payload(
+        sale.id,
+        dimension_name(Product, sale.product_id),
+        sale.sales,
+        sale.day,
+        dimension_name(Category, sale.category_id)
+    )
+
+
+# ============= BULK UPDATE / DELETE =============
+
+SALES_BATCH_CHUNK = 5000  # rows per transaction
+SALES_BATCH_COLUMNS = (SalesData.id, SalesData.product_id, SalesData.sales, SALE_DAY, SalesData.category_id)
+SALES_FILTER_KEYS = ("product", "category", "from", "to", "recorded_from", "recorded_to")
+SALES_CHANGE_KEYS = ("product", "category", "sales", "date", "month")
+
+
+def parse_sales_selection(data):
+    """
+    Which rows a bulk update/delete applies to: {"ids": [...]} or
+    {"filter": {...SALES_FILTER_KEYS}}, the filter values taking the same
+    forms as the analytics query args. Names may also be given as a list,
+    whose items are taken whole, commas included.
+    Returns (SQL conditions, one per chunk of ids, error).
+    """
+    if ("ids" in data) == ("filter" in data):
+        return None, "Provide either ids or filter"
+
+    if "ids" in data:
+        try:
+            ids = sorted({int(i) for i in data["ids"]})
+        except (TypeError, ValueError):
+            return None, "ids must be a list of integers"
+        if not ids:
+            return None, "No ids provided"
+        return [
+            SalesData.id.in_(ids[i:i + SALES_BATCH_CHUNK]) for i in range(0, len(ids), SALES_BATCH_CHUNK)
+        ], None
+
+    args = data["filter"]
+    if not isinstance(args, dict):
+        return None, "filter must be an object"
+    unknown = set(args) - set(SALES_FILTER_KEYS)
+    if unknown:
+        return None, f"Invalid filter field: {sorted(unknown)[0]}"
+    for key in ("from", "to", "recorded_from", "recorded_to"):
+        if args.get(key) is not None and not isinstance(args[key], str):
+            return None, f"Invalid {key}: {args[key]}"
+
+    period_range, error = parse_period_range(args)
+    if error:
+        return None, error
+    recorded, error = parse_recorded_range(args)
+    if error:
+        return None, error
+
+    conditions = []
+    start, end = period_range
+    if start is not None:
+        conditions.append(SalesData.period >= start)
+    if end is not None:
+        conditions.append(SalesData.period <= end)
+    if recorded["recorded_from"]:
+        conditions.append(SalesData.timestamp >= datetime.datetime.fromisoformat(recorded["recorded_from"]))
+    if recorded["recorded_to"]:
+        conditions.append(
+            SalesData.timestamp < datetime.datetime.fromisoformat(recorded["recorded_to"]) + datetime.timedelta(days=1)
+        )
+    id_columns = {"product": SalesData.product_id, "category": SalesData.category_id}
+    for dimension, names in parse_name_filters(args).items():
+        model = ROLLUP_DIMENSIONS[dimension]
+        conditions.append(id_columns[dimension].in_(select(model.id).where(model.name.in_(names))))
+
+    # An empty filter would match the whole table
+    if not conditions:
+        return None, f"filter needs at least one of: {', '.join(SALES_FILTER_KEYS)}"
+    return [and_(*conditions)], None
+
+
+def parse_sales_changes(changes):
+    """Validate a bulk update's "set" object; returns ({field: value}, error)"""
+    if not isinstance(changes, dict) or not changes:
+        return None, "Nothing to update"
+    unknown = set(changes) - set(SALES_CHANGE_KEYS)
+    if unknown:
+        return None, f"Invalid field: {sorted(unknown)[0]}"
+
+    parsed = {}
+    if "product" in changes:
+        product = str(changes["product"] or "").strip()
+        if not product or len(product) > upload_sales_data.MAX_LENGTHS["product"]:
+            return None, "Invalid product"
+        parsed["product"] = product
+    if "category" in changes:
+        category = str(changes["category"] or "").strip() or "Uncategorized"
+        if len(category) > upload_sales_data.MAX_LENGTHS["category"]:
+            return None, "category too long"
+        parsed["category"] = category
+    if "sales" in changes:
+        try:
+            parsed["sales"] = float(changes["sales"])
+        except (TypeError, ValueError):
+            return None, "Invalid sales value"
+        if not math.isfinite(parsed["sales"]):
+            return None, "Invalid sales value"
+    if "date" in changes and "month" in changes:
+        return None, "Provide either date or month"
+    if "date" in changes:
+        try:
+            sale_date = parse_sale_date(changes["date"])
+        except ValueError as e:
+            return None, str(e)
+        parsed["sale_date"] = sale_date
+        parsed["period"] = sale_date.year * 100 + sale_date.month
+    if "month" in changes:
+        try:
+            # A bare month name lands in year 1 here: each row keeps its own year, as in /update-sales
+            period = parse_period(changes["month"], 1)
+        except ValueError as e:
+            return None, str(e)
+        if period // 100 == 1:
+            year = SalesData.period // 100
+            parsed["period"] = SalesData.period - SalesData.period % 100 + period % 100
+        else:
+            year = period // 100
+            parsed["period"] = period
+        # Each row keeps its day of the month, clamped to the new month's length
+        first = func.printf("%04d-%02d-01", year, period % 100)
+        parsed["sale_date"] = func.min(
+            func.date(first, func.printf("+%d days", cast(func.strftime("%d", SalesData.sale_date), Integer) - 1)),
+            func.date(first, "+1 month", "-1 day")
+        )
+    return parsed, None
+
+
+def _sales_batches(selection):
+    """
+    The selected (id, product_id, sales, day, category_id) rows, at most
+    SALES_BATCH_CHUNK at a time in id order. Paged on id, so rows an update
+    moves in or out of a filter are neither revisited nor skipped.
+    """
+    for condition in selection:
+        last = 0
+        while True:
+            rows = db.session.execute(
+                select(*SALES_BATCH_COLUMNS)
+                .where(condition, SalesData.id > last)
+                .order_by(SalesData.id)
+                .limit(SALES_BATCH_CHUNK)
+            ).all()
+            if not rows:
+                break
+            yield rows
+            last = rows[-1][0]
+
+
+def sales_change_values(changes):
+    """parse_sales_changes() output -> {SalesData column name: value or SQL expression}"""
+    values = {key: value for key, value in changes.items() if key in ("sales", "sale_date", "period")}
+    if "product" in changes:
+        values["product_id"] = dimension_ids(Product, [changes["product"]])[changes["product"]]
+    if "category" in changes:
+        values["category_id"] = dimension_ids(Category, [changes["category"]])[changes["category"]]
+    return values
+
+
+def update_sales_rows(selection, values):
+    """
+    Set values ({SalesData column name: value or SQL expression}) on the
+    selected rows with one UPDATE per chunk and move the changed rows in
+    every derived aggregate, committing per chunk. Yields (matched, changed)
+    per committed chunk.
+    """
+    table = SalesData.__table__
+    for rows in _sales_batches(selection):
+        old_rows = {row[0]: tuple(row[1:]) for row in rows}
+        new_rows = db.session.execute(
+            table.update()
+            .where(table.c.id.in_(old_rows))
+            .values(values)
+            .returning(table.c.id, table.c.product_id, table.c.sales, SALE_DAY, table.c.category_id)
+        ).all()
+
+        changed = [(old_rows[row[0]], tuple(row[1:])) for row in new_rows if tuple(row[1:]) != old_rows[row[0]]]
+        if changed:
+            unrecord_sales(old for old, _ in changed)
+            record_sales(new for _, new in changed)
         db.session.commit()
-        
-        print(f"✅ Sales entry deleted: ID {sale_id}")
-        
-        return jsonify({"status": "success", "message": "Sales entry deleted"})
-        
-    except Exception as e:
-        print(f"❌ Delete error: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        yield len(rows), len(changed)
 
 
-@app.route("/update-sales/<int:sale_id>", methods=["PUT"])
-@token_required
-def update_sales(current_user, sale_id):
-    """Update a sales entry"""
+def delete_sales_rows(selection):
+    """
+    Delete the selected rows with one DELETE per chunk and withdraw them from
+    every derived aggregate, committing per chunk. Yields the rows deleted
+    per committed chunk.
+    """
+    for rows in _sales_batches(selection):
+        db.session.execute(delete(SalesData).where(SalesData.id.in_([row[0] for row in rows])))
+        unrecord_sales(tuple(row[1:]) for row in rows)
+        db.session.commit()
+        yield len(rows)
+
+
+# ============= BACKGROUND JOBS =============
+
+JOB_ACTIVE = ("queued", "running")
+
+
+def _timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+def job_payload(job, with_result=False):
+    payload = {
+        "id": job.id,
+        "type": job.type,
+        "status": job.status,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "created_at": _timestamp(job.created_at),
+        "started_at": _timestamp(job.started_at),
+        "finished_at": _timestamp(job.finished_at)
+    }
+    if with_result and job.result is not None:
+        payload["result"] = json.loads(job.result)
+    return payload
+
+
+def submit_job(job_type, user_id, params, dedupe=False):
+    """
+    Record a job and hand it to the scheduler. With dedupe, the user's
+    identical queued or running job is returned instead of a new one, unless
+    its lease ran out (see reap_orphaned_jobs).
+    Raises jobs.SchedulerUnavailable, the job recorded as failed, when no
+    worker can take it.
+    """
+    params = json.dumps(params, sort_keys=True)
+    if dedupe:
+        job = db.session.execute(select(Job).where(
+            Job.type == job_type, Job.user_id == user_id, Job.params == params, Job.status.in_(JOB_ACTIVE),
+            Job.heartbeat_at >= _lease_cutoff()
+        ).limit(1)).scalar()
+        if job is not None:
+            return job
+        reap_orphaned_jobs()
+
+    job = Job(
+        id=uuid.uuid4().hex, type=job_type, user_id=user_id, params=params, status="queued",
+        heartbeat_at=datetime.datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
     try:
-        sale = SalesData.query.get(sale_id)
-        
-        if not sale:
-            return jsonify({"status": "error", "message": "Sales entry not found"}), 404
-        
-        data = request.get_json()
-        
-        if "product" in data:
-            sale.product = data["product"]
-        if "sales" in data:
-            sale.sales = float(data["sales"])
-        if "month" in data:
-            sale.month = data["month"]
-        if "category" in data:
-            sale.category = data["category"]
-        
+        job_scheduler.submit(job.id, job_type)
+    except jobs.SchedulerUnavailable as e:
+        _discard_job_files(job_type, params)
+        _finish_job(job.id, "failed", error=str(e))
+        raise
+    return job
+
+
+def _lease_cutoff():
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=app.config['JOB_LEASE'])
+
+
+def _renew_job_leases(job_ids):
+    """The scheduler's heartbeat: renew the leases of this process's jobs, and fail other processes' orphans"""
+    with app.app_context():
+        try:
+            db.session.execute(update(Job).where(Job.id.in_(job_ids), Job.status.in_(JOB_ACTIVE)).values(
+                heartbeat_at=datetime.datetime.utcnow()
+            ))
+            db.session.commit()
+            reap_orphaned_jobs()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Renewing job leases failed")
+
+
+def reap_orphaned_jobs():
+    """
+    Fail the queued and running jobs whose lease ran out: the server process
+    that scheduled them died (its job workers die with it) without marking
+    them. Returns how many there were.
+    """
+    expired = and_(
+        Job.status.in_(JOB_ACTIVE), or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < _lease_cutoff())
+    )
+    orphaned = db.session.execute(
+        update(Job).where(expired).values(
+            status="failed", error="Orphaned: the server process running it stopped",
+            finished_at=datetime.datetime.utcnow()
+        ).returning(Job.type, Job.params)
+    ).all()
+    db.session.commit()
+    for job_type, params in orphaned:
+        _discard_job_files(job_type, params)
+    if orphaned:
+        logger.warning("Marked %d orphaned jobs as failed", len(orphaned))
+    return len(orphaned)
+
+
+def job_accepted(job):
+    response = jsonify({"status": "accepted", "job": job_payload(job)})
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response
+
+
+def job_unavailable(error):
+    logger.error("Job not started: %s", error)
+    response = jsonify({"status": "error", "message": "Background jobs are unavailable, please retry"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(app.config['ADMISSION_RETRY_AFTER'])
+    return response
+
+
+def _finish_job(job_id, status, result=None, error=None):
+    db.session.execute(update(Job).where(Job.id == job_id).values(
+        status=status,
+        result=None if result is None else json.dumps(result),
+        error=error,
+        finished_at=datetime.datetime.utcnow()
+    ))
+    db.session.commit()
+
+
+def _cancel_requested(job_id):
+    return bool(db.session.execute(select(Job.cancel_requested).where(Job.id == job_id)).scalar())
+
+
+def _discard_job_files(job_type, params):
+    if job_type == "ingest":
+        path = json.loads(params)["path"]
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _ingest_job(job_id, user_id, path, fmt):
+    try:
+        with open(path, encoding="utf-8", newline="") as stream:
+            result = ingest_sales(
+                upload_sales_data.read_batches(stream, fmt), cancelled=lambda: _cancel_requested(job_id)
+            )
+    finally:
+        os.unlink(path)
+    logger.info("Ingested %d sales rows (%d rejected)", result['inserted'], result['rejected'])
+    # Append the new rows to the columnar snapshot here rather than in the next analytics request
+    sales_columns(current_data_version())
+    return result
+
+
+def _export_job(job_id, user_id, report_type):
+    user = read_session.get(User, user_id)
+    render_report(report_type, Principal(user.id, user.username, user.email))
+    return {"report_type": report_type, "download": f"/export/pdf?type={report_type}"}
+
+
+def _rebuild_aggregates_job(job_id, user_id):
+    products, cells, pairs, rollup_cells = rebuild_aggregates()
+    return {"products": products, "monthly_cells": cells, "product_pairs": pairs, "rollup_cells": rollup_cells}
+
+
+def _summarize_job(job_id, user_id, text_id, mode):
+    text = db.session.get(MeetingText, text_id).text
+    return save_summary(user_id, text, text_digest(text), mode)
+
+
+# type -> handler(job_id, user_id, **params), run in a job worker process;
+# returns the JSON-serializable result
+JOB_HANDLERS = {
+    "ingest": _ingest_job,
+    "export": _export_job,
+    "rebuild-aggregates": _rebuild_aggregates_job,
+    "summarize": _summarize_job,
+}
+
+
+def _run_job(job_id):
+    """Run one job; the entry point in job worker processes"""
+    with app.app_context():
+        claimed = db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", started_at=datetime.datetime.utcnow())
+        ).rowcount
         db.session.commit()
-        
-        print(f"✅ Sales entry updated: ID {sale_id}")
-        
-        return jsonify({
-            "status": "success",
-            "message": "Sales entry updated",
-            "data": {
-                "id": sale.id,
-                "product": sale.product,
-                "sales": sale.sales,
-                "month": sale.month,
-                "category": sale.category
-            }
-        })
-        
-    except Exception as e:
-        print(f"❌ Update error: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        if not claimed:
+            return  # cancelled before it started
+
+        job_type, user_id, params = db.session.execute(
+            select(Job.type, Job.user_id, Job.params).where(Job.id == job_id)
+        ).one()
+        try:
+            result = JOB_HANDLERS[job_type](job_id, user_id, **json.loads(params))
+        except jobs.JobCancelled as e:
+            db.session.rollback()
+            _finish_job(job_id, "cancelled", error=str(e))
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Job %s (%s) failed", job_id, job_type)
+            _finish_job(job_id, "failed", error=str(e))
+        else:
+            _finish_job(job_id, "succeeded", result=result)
+
+
+def _job_crashed(job_id, error):
+    """
+    The worker pool running or holding job_id died, or no worker could be
+    started for it; runs in the scheduler's thread
+    """
+    if not isinstance(error, jobs.SchedulerUnavailable):
+        error = f"Job worker crashed: {error}"
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job is not None and job.status in JOB_ACTIVE:
+            _discard_job_files(job.type, job.params)
+            _finish_job(job_id, "failed", error=str(error))
+
+
+job_scheduler = jobs.JobScheduler(
+    _run_job, _job_crashed, workers=app.config['JOB_WORKERS'], limits=app.config['JOB_LIMITS'],
+    on_heartbeat=_renew_job_leases, heartbeat=app.config['JOB_LEASE'] / 4
+)
+
+
+def _export_job_params(params):
+    report_type = params.get("report_type", "sales")
+    if report_type not in REPORTS:
+        raise ValueError(f"Invalid report type: {report_type}")
+    return {"report_type": report_type}
+
+
+# Jobs that can be started directly through POST /jobs: type -> params validator
+JOB_PARAMS = {
+    "rebuild-aggregates": lambda params: {},
+    "export": _export_job_params,
+}
+
+
+def own_job(job, user_id):
+    """
+    Whether the job is the user's. Anonymous jobs (user_id None, from POST
+    /summarize without a token) are anyone's who knows their random id.
+    """
+    return job is not None and job.user_id == user_id
+
+
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop; returns its job_payload()"""
+    now = datetime.datetime.utcnow()
+    dequeued = db.session.execute(
+        update(Job).where(Job.id == job_id, Job.status == "queued")
+        .values(status="cancelled", error="Cancelled before it started", finished_at=now)
+    ).rowcount
+    if not dequeued:
+        db.session.execute(update(Job).where(Job.id == job_id, Job.status == "running").values(cancel_requested=True))
+    db.session.commit()
+
+    job = db.session.get(Job, job_id)
+    if dequeued:
+        job_scheduler.cancel(job_id)
+        _discard_job_files(job.type, job.params)
+
+    logger.info("Job %s %s", job_id, "cancelled" if dequeued else "asked to stop")
+    return job_payload(job)
+
+
+# ============= CACHE STATS =============
+
+@app.route("/cache-stats", methods=["GET"])
+@token_required
+def cache_stats(current_user):
+    return jsonify({
+        "auth": auth_cache.stats(),
+        "login_failures": login_failures.stats(),
+        "password_hasher": password_hasher.stats(),
+        "responses": response_cache.stats(),
+        "summarizer": summarizer.stats(),
+        "summaries": summary_cache.stats(),
+        "reports": report_cache.stats(),
+        "jobs": job_scheduler.stats(),
+        "forecasts": forecast_cache.stats(),
+        "recommender": neighbor_index_cache.stats(),
+        "columnar": sales_columns_store.stats(),
+        "stream": analytics_broker.stats(),
+        "admission": admission_control.stats()
+    })
+
+
+# ============= WORKER PRELOAD =============
+
+def warm_caches():
+    """
+    Build what every server worker would otherwise build on its first
+    requests: the dimension id maps, the neighbour index and the
+    /recommendation and default /anomalies responses, and load the
+    summarization model. Called in the server's parent process before it
+    forks the workers (gunicorn.conf.py), so they start warm and share this
+    memory copy-on-write. Also fails the jobs orphaned by a previous server
+    (see reap_orphaned_jobs). Leaves no connection open.
+    """
+    load_summarizer()
+    with app.app_context():
+        for model, cache in _dimension_ids.items():
+            cache.update(read_session.execute(select(model.name, model.id)).all())
+        reap_orphaned_jobs()
+        version = current_data_version()
+        index, _, _ = neighbor_index(version)
+        sales_columns(version)
+        response_cache.put(
+            "recommendation", {}, version, build_recommendations(read_session.execute(RECOMMENDATION_QUERY).all())
+        )
+        params, _ = parse_anomaly_params({})
+        response_cache.put(
+            "anomalies", params, version,
+            build_anomaly_response(read_session.execute(ANOMALY_CELLS_QUERY).all(), params)
+        )
+        products = len(_dimension_ids[Product])
+        db.engine.dispose()
+    read_engine.dispose()
+    logger.info("Caches warmed at data version %d: %d products, %d in the neighbour index", version, products, len(index))
+
+
+# ============= METRICS =============
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Request latency, response and SQL metrics of this process in the
+    Prometheus text format; ?format=json gives per-route p50/p95/p99 instead
+    """
+    if request.args.get("format") == "json":
+        return jsonify({**request_metrics.summary(), "admission": admission_control.stats()})
+    return Response(
+        request_metrics.render_prometheus() + admission_control.render_prometheus(),
+        mimetype="text/plain; version=0.0.4"
+    )
 
 
 # ============= HEALTH CHECK =============
@@ -544,18 +2965,11 @@ def health_check():
 # ============= RUN SERVER =============
 
 if __name__ == "__main__":
-    print("="*60)
-    print("Initializing database...")
-    print("="*60)
-    
+    logger.info("Initializing database")
     init_database()
     
-    print("="*60)
-    print("🚀 Server starting on http://127.0.0.1:5000")
-    print("="*60)
-    print("\n📝 Test login with:")
-    print("   Username: admin")
-    print("   Password: 123")
-    print("\n⌨️  Press CTRL+C to quit\n")
+    logger.info("Server starting on http://127.0.0.1:5000 (test login: admin / 123)")
     
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Every route, the FastAPI routers and this app, as gunicorn serves them
+    import uvicorn
+    uvicorn.run("asgi:app", port=5000, reload=True)
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""
+Request and SQL instrumentation, exported in the Prometheus text format.
+
+- WSGIMiddleware (the Flask app) and ASGIMiddleware (the FastAPI routers)
+  time every request until its body is fully sent, into one latency
+  histogram per method and route template
+- instrument_engine hooks an SQLAlchemy engine: every statement is timed
+  into a per-engine histogram and added to the current request's totals
+  (a context variable, so it works for threads and asyncio tasks alike);
+  statements slower than a threshold are logged
+- Histogram keeps cumulative bucket counts, so p50/p95/p99 are estimated by
+  interpolating inside the bucket holding the rank, as Prometheus'
+  histogram_quantile() does
+
+Everything is per process: scrape each worker, or sum the series.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from werkzeug.wsgi import ClosingIterator
+
+# seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+UNMATCHED_ROUTE = "<unmatched>"
+SLOW_QUERY_LOG_CHARS = 500
+
+# [statements, seconds] of the request being handled, if any
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self):
+        """[(upper bound, observations <= it)], ending with +Inf"""
+        with self._lock:
+            counts = list(self._counts)
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        cumulative = self.cumulative()
+        total = cumulative[-1][1]
+        if not total:
+            return None
+        rank = q * total
+        lower, below = 0.0, 0
+        for bound, count in cumulative:
+            if count >= rank:
+                if bound == float("inf"):
+                    return lower  # beyond the last bucket; its lower edge is the best estimate
+                return lower + (bound - lower) * (rank - below) / (count - below)
+            lower, below = bound, count
+        return lower
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._latency = {}  # (method, route) -> Histogram
+        self._responses = {}  # (method, route, status) -> count
+        self._request_queries = {}  # (method, route) -> [statements, seconds]
+        self._queries = {}  # engine -> Histogram
+        self.slow_queries = 0
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    # ----- recording -----
+
+    def start_request(self):
+        """Start counting the current context's SQL; returns the [statements, seconds] totals"""
+        totals = [0, 0.0]
+        _request_queries.set(totals)
+        return totals
+
+    def observe_request(self, method, route, status, seconds, queries):
+        self._histogram(self._latency, (method, route)).observe(seconds)
+        with self._lock:
+            key = (method, route, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+            totals = self._request_queries.setdefault((method, route), [0, 0.0])
+            totals[0] += queries[0]
+            totals[1] += queries[1]
+
+    def observe_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def observe_query(self, engine, seconds):
+        self._histogram(self._queries, engine).observe(seconds)
+        totals = _request_queries.get()
+        if totals is not None:
+            totals[0] += 1
+            totals[1] += seconds
+
+    # ----- reporting -----
+
+    def summary(self):
+        """Per-route count, latency quantiles and SQL totals, for JSON"""
+        with self._lock:
+            latency = dict(self._latency)
+            request_queries = {key: list(totals) for key, totals in self._request_queries.items()}
+        routes = []
+        for (method, route), histogram in sorted(latency.items(), key=lambda item: item[0][::-1]):
+            statements, seconds = request_queries.get((method, route), (0, 0.0))
+            count = histogram.count
+            routes.append({
+                "method": method,
+                "route": route,
+                "count": count,
+                **{f"p{round(q * 100)}_ms": _ms(histogram.quantile(q)) for q in QUANTILES},
+                "avg_ms": _ms(histogram.sum / count) if count else None,
+                "sql_per_request": round(statements / count, 2) if count else 0.0,
+                "sql_ms_per_request": _ms(seconds / count) if count else None
+            })
+        return {
+            "routes": routes,
+            "queries": {
+                engine: {"count": h.count, **{f"p{round(q * 100)}_ms": _ms(h.quantile(q)) for q in QUANTILES}}
+                for engine, h in sorted(self._queries.items())
+            },
+            "slow_queries": self.slow_queries
+        }
+
+    def render_prometheus(self):
+        with self._lock:
+            latency = sorted(self._latency.items())
+            responses = sorted(self._responses.items())
+            request_queries = sorted((key, list(totals)) for key, totals in self._request_queries.items())
+            queries = sorted(self._queries.items())
+
+        lines = [
+            "# HELP http_request_duration_seconds Time from request start to the last body byte.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in latency:
+            lines += _histogram_lines("http_request_duration_seconds", {"method": method, "route": route}, histogram)
+
+        lines += [
+            "# HELP http_responses_total Responses sent, by status code.",
+            "# TYPE http_responses_total counter",
+        ]
+        lines += [
+            _sample("http_responses_total", {"method": method, "route": route, "status": status}, count)
+            for (method, route, status), count in responses
+        ]
+
+        lines += [
+            "# HELP http_request_db_statements_total SQL statements run while handling requests.",
+            "# TYPE http_request_db_statements_total counter",
+        ]
+        lines += [
+            _sample("http_request_db_statements_total", {"method": method, "route": route}, statements)
+            for (method, route), (statements, _) in request_queries
+        ]
+        lines += [
+            "# HELP http_request_db_seconds_total Time spent in SQL statements while handling requests.",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        lines += [
+            _sample("http_request_db_seconds_total", {"method": method, "route": route}, seconds)
+            for (method, route), (_, seconds) in request_queries
+        ]
+
+        lines += [
+            "# HELP db_query_duration_seconds SQL statement execution time.",
+            "# TYPE db_query_duration_seconds histogram",
+        ]
+        for engine, histogram in queries:
+            lines += _histogram_lines("db_query_duration_seconds", {"engine": engine}, histogram)
+
+        lines += [
+            "# HELP db_slow_queries_total SQL statements slower than the slow query threshold.",
+            "# TYPE db_slow_queries_total counter",
+            _sample("db_slow_queries_total", {}, self.slow_queries),
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += "{" + ",".join(f'{key}="{_escape(v)}"' for key, v in labels.items()) + "}"
+    return f"{name} {value}"
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = [
+        _sample(f"{name}_bucket", {**labels, "le": "+Inf" if bound == float("inf") else bound}, count)
+        for bound, count in histogram.cumulative()
+    ]
+    lines.append(_sample(f"{name}_sum", labels, round(histogram.sum, 6)))
+    lines.append(_sample(f"{name}_count", labels, histogram.count))
+    return lines
+
+
+def render_family(name, kind, help_text, samples):
+    """Prometheus text lines of one metric family from (labels, value) samples"""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + [
+        _sample(name, labels, value) for labels, value in samples
+    ]
+
+
+# ----- SQL -----
+
+def instrument_engine(engine, name, metrics, slow_threshold, logger):
+    """
+    Time every statement run on engine (an Engine, or an AsyncEngine's
+    sync_engine). Statements taking slow_threshold seconds or more are
+    logged with their SQL; None disables the log.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        metrics.observe_query(name, seconds)
+        if slow_threshold is not None and seconds >= slow_threshold:
+            metrics.observe_slow_query()
+            logger.warning(
+                "Slow query (%.0f ms, %s%s): %s", seconds * 1000, name,
+                ", executemany" if executemany else "", statement[:SLOW_QUERY_LOG_CHARS]
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        # after_cursor_execute doesn't run for a failed statement
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+# ----- middleware -----
+
+class WSGIMiddleware:
+    """
+    Instrument a WSGI app. The route label is read from
+    environ["metrics.route"], which the app sets once it has routed the
+    request; requests it doesn't set it for count as UNMATCHED_ROUTE.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        queries = self.metrics.start_request()
+        status = ["500"]
+
+        def _start_response(status_line, headers, exc_info=None):
+            status[0] = status_line.split(" ", 1)[0]
+            return start_response(status_line, headers, exc_info)
+
+        def _finished():
+            _request_queries.set(None)
+            self.metrics.observe_request(
+                environ.get("REQUEST_METHOD", "GET"), environ.get("metrics.route", UNMATCHED_ROUTE),
+                status[0], time.perf_counter() - start, queries
+            )
+
+        try:
+            body = self.app(environ, _start_response)
+        except BaseException:
+            _finished()
+            raise
+        return ClosingIterator(body, _finished)
+
+
+class ASGIMiddleware:
+    """
+    Instrument an ASGI app's HTTP requests, labelled with the template of
+    the route that handled them. Requests handled by skip_route (e.g. a
+    mounted app that records its own metrics) are left out.
+    """
+
+    def __init__(self, app, metrics, skip_route=None):
+        self.app = app
+        self.metrics = metrics
+        self.skip_route = skip_route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        queries = self.metrics.start_request()
+        status = [500]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _request_queries.set(None)
+            route = scope.get("route")
+            if route is None or not (self.skip_route and self.skip_route(route)):
+                self.metrics.observe_request(
+                    scope["method"], getattr(route, "path", UNMATCHED_ROUTE),
+                    str(status[0]), time.perf_counter() - start, queries
+                )
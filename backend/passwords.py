@@ -0,0 +1,67 @@
+"""
+Password hashing off the request thread.
+
+Hashes run on a small thread pool (hashlib's PBKDF2/scrypt release the
+GIL), so a burst of logins can use at most `workers` cores per server
+worker process; the default of 2 keeps several processes from
+oversubscribing the host. Once `max_pending` hashes are queued or running,
+new requests are refused with HashPoolFull (503) at once instead of
+holding a request thread while they wait their turn.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashPoolFull(Exception):
+    """Too many password hashes are already queued"""
+
+
+class PasswordHasher:
+    def __init__(self, method, workers=2, max_pending=8):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashPoolFull("Too many password operations in progress")
+
+        with self._lock:
+            self.pending += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when pwhash was made with a different method or cost"""
+        return pwhash.split("$", 1)[0] != self.method
+
+    def stats(self):
+        return {
+            "method": self.method.split(":", 1)[0],
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,83 @@
+"""
+Sales dates and periods.
+
+Every sale has a real date (SalesData.sale_date). Its month, the period, is
+derived from it and stored next to it as an integer YYYYMM (202501 =
+January 2025), which the indexes and the monthly aggregates are keyed on.
+In memory, aggregate code carries dates as integer days YYYYMMDD
+(20250115), so the period is day // 100.
+
+The API still speaks month names: "Jan" (taken to be in a default year,
+on the 1st) or an explicit "2025-01" / "2025-01-15" are all accepted on
+input, and results carry the date, the short month name and the "YYYY-MM"
+label.
+"""
+import calendar
+import datetime
+
+MONTH_ORDER = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+_MONTH_NUMBERS = {}
+for _number, _name in enumerate(MONTH_ORDER, start=1):
+    _full = datetime.date(2000, _number, 1).strftime("%B").lower()
+    _MONTH_NUMBERS[_name.lower()] = _number
+    _MONTH_NUMBERS[_full] = _number
+_MONTH_NUMBERS["sept"] = 9
+
+
+def month_number(value):
+    """1-12 for a month name ("Jan", "january"), else None"""
+    return _MONTH_NUMBERS.get(str(value).strip().lower())
+
+
+def parse_sale_date(value, default_year=None):
+    """Parse a month name (the 1st of it) or a YYYY-MM[-DD] string into a date"""
+    text = str(value).strip()
+    number = month_number(text)
+    if number is not None:
+        return datetime.date(default_year or datetime.datetime.utcnow().year, number, 1)
+
+    try:
+        if len(text) > 7:
+            return datetime.date.fromisoformat(text[:10])
+        return datetime.datetime.strptime(text, "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}") from None
+
+
+def parse_period(value, default_year=None):
+    """Parse a month name or YYYY-MM[-DD] string into a YYYYMM integer"""
+    try:
+        date = parse_sale_date(value, default_year)
+    except ValueError:
+        raise ValueError(f"Invalid month: {value}") from None
+    return date.year * 100 + date.month
+
+
+def move_to_month(date, year, month):
+    """date moved to year/month, keeping its day where that month has it (Jan 31 -> Feb 28)"""
+    return datetime.date(year, month, min(date.day, calendar.monthrange(year, month)[1]))
+
+
+def day_number(date):
+    """date(2025, 1, 15) -> 20250115"""
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def day_label(day):
+    """20250115 -> "2025-01-15" """
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+
+def period_year(period):
+    return period // 100
+
+
+def month_name(period):
+    """202501 -> "Jan" """
+    return MONTH_ORDER[period % 100 - 1]
+
+
+def period_label(period):
+    """202501 -> "2025-01" """
+    return f"{period // 100:04d}-{period % 100:02d}"
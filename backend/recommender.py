@@ -0,0 +1,202 @@
+"""
+Item-to-item recommendations from product co-occurrence.
+
+Sales carry no order or customer, so the "basket" is a context: one month
+of one category. Two products co-occur in every context where both have
+sales, i.e. where both have a MonthlySales cell. The pair counts
+
+    C[a, b] = number of contexts holding both a and b
+    C[a, a] = number of contexts holding a
+
+only change when a cell appears or disappears, so they are maintained
+incrementally: a new (or vanished) cell adds (or removes) one for each
+product in its context. Similarity is the cosine of the binary context
+vectors, C[a, b] / sqrt(C[a, a] * C[b, b]).
+
+NeighborIndex holds the k best neighbours of every product, built from the
+pair counts in one vectorized pass; a lookup is a dict access and a slice.
+The number of pairs grows with the square of the products per context, so
+contexts are kept narrow (month x category) on purpose.
+
+That pass is still O(pairs), and any sales write moves the data version, so
+NeighborIndexCache keeps serving the last index built while one background
+thread builds the next: only the very first build makes a request wait.
+"""
+import threading
+
+import numpy as np
+
+PAIR_CHUNK = 4_000_000  # pending pair keys before they are folded
+
+
+def _fold(keys, counts=None):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+
+
+def cooccurrence_counts(periods, categories, products, changed):
+    """
+    Pair count changes caused by cells appearing (or disappearing).
+    periods/categories/products describe every cell of the affected
+    contexts, new (or vanishing) ones included; changed marks the new (or
+    vanishing) cells.
+    Every unordered pair in a context with at least one changed member
+    counts once, a changed cell with itself included.
+    Returns (a, b, counts) with a <= b.
+    """
+    periods = np.asarray(periods, dtype=np.int64)
+    categories = np.asarray(categories, dtype=np.int64)
+    products = np.asarray(products, dtype=np.int64)
+    changed = np.asarray(changed, dtype=bool)
+    if not changed.any():
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    base = int(products.max()) + 1
+    order = np.lexsort((products, categories, periods))
+    periods, categories, products, changed = periods[order], categories[order], products[order], changed[order]
+    bounds = np.flatnonzero((np.diff(periods) != 0) | (np.diff(categories) != 0)) + 1
+
+    pending, pending_size, folded = [], 0, []
+    for members, flags in zip(np.split(products, bounds), np.split(changed, bounds)):
+        if not flags.any():
+            continue
+        sources = members[flags]
+        a = np.repeat(sources, len(members))
+        b = np.tile(members, len(sources))
+        # A pair of two changed members shows up in both orders; keep one
+        keep = ~np.tile(flags, len(sources)) | (a <= b)
+        a, b = a[keep], b[keep]
+        pending.append(np.minimum(a, b) * base + np.maximum(a, b))
+        pending_size += len(a)
+        if pending_size >= PAIR_CHUNK:
+            folded.append(_fold(np.concatenate(pending)))
+            pending, pending_size = [], 0
+    if pending:
+        folded.append(_fold(np.concatenate(pending)))
+
+    if len(folded) == 1:
+        keys, counts = folded[0]
+    else:
+        keys, counts = _fold(
+            np.concatenate([k for k, _ in folded]), np.concatenate([c for _, c in folded])
+        )
+    return keys // base, keys % base, counts
+
+
+class NeighborIndex:
+    """Top-k neighbours per product from (product, other, count) pair rows, product <= other"""
+
+    def __init__(self, pairs, k):
+        a, b, counts = np.asarray(pairs, dtype=np.int64).reshape(-1, 3).T
+        self.k = k
+
+        own = a == b
+        ids, sizes = a[own], counts[own]
+        order = np.argsort(ids)
+        ids, sizes = ids[order], sizes[order]
+
+        # Both directions of every pair, scored
+        off = ~own
+        source = np.concatenate([a[off], b[off]])
+        target = np.concatenate([b[off], a[off]])
+        shared = np.concatenate([counts[off], counts[off]])
+        score = shared / np.sqrt(
+            sizes[np.searchsorted(ids, source)] * sizes[np.searchsorted(ids, target)]
+        )
+
+        # Best first per source: score, then shared contexts, then id
+        order = np.lexsort((target, -shared, -score, source))
+        source, target, shared, score = source[order], target[order], shared[order], score[order]
+        starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]]) if len(source) else source
+        rank = np.arange(len(source)) - np.repeat(starts, np.diff(np.r_[starts, len(source)]))
+        keep = rank < k
+
+        source, target, shared, score = source[keep], target[keep], shared[keep], score[keep]
+
+        self._targets = target.tolist()
+        self._scores = np.round(score, 4).tolist()
+        self._shared = shared.tolist()
+        self._slices = dict.fromkeys(ids.tolist(), (0, 0))
+        bounds = np.flatnonzero(np.r_[True, source[1:] != source[:-1], True]) if len(source) else []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            self._slices[int(source[start])] = (int(start), int(end))
+        self.contexts = dict(zip(ids.tolist(), sizes.tolist()))
+
+        self.strongest = None  # (product id, neighbour id, score, shared contexts) of the best pair
+        if len(source):
+            best = np.lexsort((target, source, -shared, -score))[0]
+            self.strongest = (int(source[best]), int(target[best]), self._scores[best], int(shared[best]))
+
+    def __contains__(self, product_id):
+        return product_id in self._slices
+
+    def __len__(self):
+        return len(self._slices)
+
+    def neighbors(self, product_id, k=None):
+        """[(neighbour id, score, shared contexts)], best first, at most k"""
+        start, end = self._slices.get(product_id, (0, 0))
+        end = min(end, start + (self.k if k is None else k))
+        return list(zip(self._targets[start:end], self._scores[start:end], self._shared[start:end]))
+
+
+class NeighborIndexCache:
+    """
+    The newest index entry built and the data version it was built at.
+    build(version) makes an entry from the current data, or returns None
+    when it fails; it runs on a background thread.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self.version = None
+        self.entry = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.builds = 0
+
+    def get(self, version):
+        """
+        The entry for version, else the newest older one while a rebuild for
+        version runs in the background; None when nothing is built yet
+        """
+        with self._lock:
+            if self.entry is None:
+                return None
+            if self.version >= version:
+                self.hits += 1
+                return self.entry
+            self.stale_hits += 1
+            if not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild, args=(version,), name="neighbor-index", daemon=True).start()
+            return self.entry
+
+    def put(self, version, entry):
+        """Keep entry, built at version, unless a newer one is kept; returns the one kept"""
+        with self._lock:
+            self.builds += 1
+            if self.version is None or version > self.version:
+                self.version, self.entry = version, entry
+            return self.entry
+
+    def _rebuild(self, version):
+        try:
+            entry = self._build(version)
+            if entry is not None:
+                self.put(version, entry)
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "builds": self.builds,
+            "rebuilding": self._rebuilding
+        }
@@ -0,0 +1,224 @@
+"""
+PDF report rendering for /export/pdf.
+
+Reports are described as a generator of reportlab flowables. Row data is
+turned into one page-sized table at a time, and the flowables are pulled
+from the generator only as the layout engine consumes them, so neither the
+rows nor their flowables are held in memory as a whole. reportlab does keep
+every finished page until the PDF is written (about 0.6 MB per 1,000
+rows), so tables over the caller's max_rows are cut short with a note.
+
+Rendered files are cached on disk under a key that the caller derives from
+the data version, so a report is rendered once per change of the data and
+every other download is a plain file send.
+"""
+import datetime
+import functools
+import os
+import tempfile
+import threading
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:  # optional; /export/pdf reports it as unavailable
+    SimpleDocTemplate = None
+
+ROWS_PER_TABLE = 40  # about one A4 page at the table font size
+FLOWABLE_LOOKAHEAD = 8
+
+
+class ReportUnavailable(Exception):
+    """reportlab is not installed"""
+
+
+class _LazyFlowables(list):
+    """
+    The list a doc template consumes from the front, refilled from an
+    iterator so that only a few flowables exist at a time.
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = iter(source)
+        self._fill()
+
+    def _fill(self):
+        while self._source is not None and super().__len__() < FLOWABLE_LOOKAHEAD:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._fill()
+
+
+@functools.lru_cache(maxsize=None)
+def _styles():
+    styles = getSampleStyleSheet()
+    return styles["Title"], styles["Heading2"], styles["BodyText"], styles["Italic"]
+
+
+_TABLE_STYLE = [
+    ("FONTSIZE", (0, 0), (-1, -1), 8),
+    ("BACKGROUND", (0, 0), (-1, 0), "#1f2937"),
+    ("TEXTCOLOR", (0, 0), (-1, 0), "#ffffff"),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), ["#ffffff", "#f3f4f6"]),
+    ("GRID", (0, 0), (-1, -1), 0.25, "#d1d5db"),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+]
+
+
+def heading(text):
+    return Paragraph(text, _styles()[1])
+
+
+def paragraph(text, note=False):
+    _, _, body, italic = _styles()
+    return Paragraph(text, italic if note else body)
+
+
+def table(columns, rows, highlight=None, max_rows=None):
+    """
+    Flowables for a table: one page-sized Table per ROWS_PER_TABLE rows,
+    consumed lazily from rows, and after max_rows a note that the rest are
+    left out. highlight(row) marks rows to shade.
+    """
+    chunk = []
+    for count, row in enumerate(rows):
+        if count == max_rows:
+            if chunk:
+                yield _table(columns, chunk, highlight)
+            yield paragraph(f"Only the first {max_rows:,} rows are included.", note=True)
+            return
+        chunk.append(row)
+        if len(chunk) == ROWS_PER_TABLE:
+            yield _table(columns, chunk, highlight)
+            chunk = []
+    if chunk:
+        yield _table(columns, chunk, highlight)
+
+
+def _table(columns, rows, highlight):
+    style = list(_TABLE_STYLE)
+    if highlight is not None:
+        style += [
+            ("BACKGROUND", (0, i), (-1, i), "#fee2e2")
+            for i, row in enumerate(rows, start=1) if highlight(row)
+        ]
+    return Table([columns] + [[_cell(value) for value in row] for row in rows], repeatRows=1,
+                 style=TableStyle(style))
+
+
+def _cell(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, str) and len(value) > 60:
+        return paragraph(value)
+    return value
+
+
+def available():
+    return SimpleDocTemplate is not None
+
+
+def render_pdf(path, title, subtitle, body):
+    """Write title, subtitle and the flowables yielded by body to path"""
+    if SimpleDocTemplate is None:
+        raise ReportUnavailable("PDF export requires reportlab")
+
+    title_style = _styles()[0]
+
+    def _footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 7)
+        canvas.setFillColor(colors.grey)
+        canvas.drawRightString(A4[0] - 1.5 * cm, 1 * cm, f"{title} - page {doc.page}")
+        canvas.restoreState()
+
+    def _flowables():
+        yield Paragraph(title, title_style)
+        yield paragraph(subtitle, note=True)
+        yield Spacer(1, 0.5 * cm)
+        yield from body
+
+    doc = SimpleDocTemplate(
+        path, pagesize=A4, title=title,
+        leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm
+    )
+    doc.build(_LazyFlowables(_flowables()), onFirstPage=_footer, onLaterPages=_footer)
+
+
+def generated_note(version):
+    now = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
+    return f"Generated {now} - revision {version}"
+
+
+class ReportCache:
+    """
+    Rendered PDFs on disk, one file per report name. A file is reused while
+    its version matches; rendering a new version replaces the old file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    def _path(self, name, version):
+        return os.path.join(self.directory, f"{name}-{version}.pdf")
+
+    def _lock(self, name):
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def find(self, name, version):
+        """Path of the report name at version if it has been rendered, else None"""
+        path = self._path(name, version)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+        return None
+
+    def get(self, name, version, render):
+        """
+        Path of the report name at version, calling render(path) to create
+        it if needed. Concurrent requests for the same report wait for one
+        render instead of repeating it.
+        """
+        path = self._path(name, version)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+
+        with self._lock(name):
+            if os.path.exists(path):
+                self.hits += 1
+                return path
+
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{name}-", suffix=".pdf")
+            os.close(fd)
+            try:
+                render(tmp)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self.renders += 1
+
+            prefix = f"{name}-"
+            for entry in os.listdir(self.directory):
+                if entry.startswith(prefix) and entry != os.path.basename(path):
+                    os.unlink(os.path.join(self.directory, entry))
+        return path
+
+    def stats(self):
+        return {"directory": self.directory, "hits": self.hits, "renders": self.renders}
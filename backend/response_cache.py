@@ -0,0 +1,61 @@
+"""
+Versioned cache of serialized analytics responses.
+
+Entries are keyed on (endpoint, params, data version), where the data
+version is bumped by every sales write, so a cached body is reused until the
+underlying data changes and never needs explicit invalidation. Each body
+carries a strong ETag (a hash of its bytes) for conditional GETs.
+
+Framework-agnostic: the async routes serve it (routers/common.py
+cached_json), and main.warm_caches fills it before the workers fork.
+"""
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+from cache import LRUCache
+
+CachedResponse = namedtuple("CachedResponse", ["body", "etag"])
+
+
+def etag_matches(if_none_match, etag):
+    """True when an If-None-Match header value matches etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class VersionedResponseCache:
+    def __init__(self, maxsize=256):
+        self._entries = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def _key(endpoint, params, version):
+        return (endpoint, json.dumps(params, sort_keys=True), version)
+
+    def get(self, endpoint, params, version):
+        return self._entries.get(self._key(endpoint, params, version))
+
+    def put(self, endpoint, params, version, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        entry = CachedResponse(body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+        self._entries.set(self._key(endpoint, params, version), entry)
+        return entry
+
+    def record_not_modified(self, entry):
+        with self._lock:
+            self.not_modified += 1
+            self.bytes_saved += len(entry.body)
+
+    def stats(self):
+        stats = self._entries.stats()
+        stats["not_modified"] = self.not_modified
+        stats["bytes_saved"] = self.bytes_saved
+        return stats
@@ -0,0 +1,188 @@
+"""
+Time rollup cube over the sales cells.
+
+Every (period, product, category) cell of MonthlySales is rolled up to each
+month grain (month, quarter, year) at three levels:
+
+    product x category   product_id, category_id set
+    category             product_id 0
+    total                product_id 0, category_id 0
+
+A query reads the smallest level holding every dimension it groups or
+filters by, so a dashboard chart over years of data reads one cell per
+bucket (total) or per bucket and category instead of every product's.
+Product-only queries read the product x category level: a product rarely
+sells in more than one category, so a separate product level would be a
+near copy of it.
+
+The day grains (day, week) are rolled up from the sale dates, at the total
+and category levels only: a product x category level per day would hold
+about a cell per sale, so keeping it would cost ingest another upsert for
+nearly every row. Product-level day and week queries are answered from the
+columnar snapshot instead (see main.py).
+
+Buckets are integers that sort in time order within a grain:
+month YYYYMM (202501), quarter YYYYQ (20251), year YYYY (2025),
+day YYYYMMDD (20250115), ISO week YYYYWW (202503).
+"""
+import calendar
+import datetime
+
+import numpy as np
+
+from periods import day_number, parse_period
+
+GRAINS = {"month": 1, "quarter": 2, "year": 3, "day": 4, "week": 5}  # name -> stored code
+PERIOD_GRAINS = ("month", "quarter", "year")  # bucketed from periods
+DAY_GRAINS = ("day", "week")  # bucketed from sale days
+DIMENSIONS = ("product", "category")
+LEVELS = ("total", "category", "product_category")
+
+
+def buckets(periods, grain):
+    """YYYYMM periods (int array) -> buckets of grain"""
+    periods = np.asarray(periods, dtype=np.int64)
+    if grain == "month":
+        return periods
+    if grain == "quarter":
+        return periods // 100 * 10 + (periods % 100 - 1) // 3 + 1
+    return periods // 100
+
+
+def day_dates(days):
+    """YYYYMMDD days (int array) -> datetime64[D] array"""
+    days = np.asarray(days, dtype=np.int64)
+    months = (days // 10000 - 1970) * 12 + days // 100 % 100 - 1
+    return months.astype("datetime64[M]").astype("datetime64[D]") + (days % 100 - 1).astype("timedelta64[D]")
+
+
+def day_buckets(days, grain):
+    """YYYYMMDD days (int array) -> buckets of a day grain"""
+    days = np.asarray(days, dtype=np.int64)
+    if grain == "day":
+        return days
+    dates = day_dates(days)
+    # An ISO week belongs to the year its Thursday falls in; 1970-01-01 was a Thursday
+    weekday = (dates.astype(np.int64) + 3) % 7
+    thursday = dates + (3 - weekday).astype("timedelta64[D]")
+    year = thursday.astype("datetime64[Y]")
+    week = (thursday - year.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+    return (year.astype(np.int64) + 1970) * 100 + week
+
+
+def bucket_label(bucket, grain):
+    """
+    202501 -> "2025-01", 20251 -> "2025-Q1", 2025 -> "2025",
+    20250115 -> "2025-01-15", week 202503 -> "2025-W03"
+    """
+    if grain == "month":
+        return f"{bucket // 100:04d}-{bucket % 100:02d}"
+    if grain == "quarter":
+        return f"{bucket // 10:04d}-Q{bucket % 10}"
+    if grain == "day":
+        return f"{bucket // 10000:04d}-{bucket // 100 % 100:02d}-{bucket % 100:02d}"
+    if grain == "week":
+        return f"{bucket // 100:04d}-W{bucket % 100:02d}"
+    return f"{bucket:04d}"
+
+
+def parse_bound(value, end=False):
+    """
+    "2025", "2025-Q2", "2025-03" or "2025-03-15" -> the first (or, with end,
+    the last) YYYYMM period it covers
+    """
+    text = str(value).strip()
+    try:
+        if len(text) == 4:
+            year = int(text)
+            return year * 100 + (12 if end else 1)
+        if len(text) == 7 and text[5] in "qQ":
+            year, quarter = int(text[:4]), int(text[6])
+            if not 1 <= quarter <= 4:
+                raise ValueError
+            return year * 100 + quarter * 3 - (0 if end else 2)
+    except ValueError:
+        raise ValueError(f"Invalid period: {value}") from None
+    if len(text) < 7:
+        raise ValueError(f"Invalid period: {value}")
+    return parse_period(text)
+
+
+def parse_day_bound(value, end=False):
+    """As parse_bound, but the first (or last) YYYYMMDD day covered"""
+    text = str(value).strip()
+    if len(text) == 10:
+        try:
+            return day_number(datetime.date.fromisoformat(text))
+        except ValueError:
+            raise ValueError(f"Invalid period: {value}") from None
+    period = parse_bound(text, end)
+    return period * 100 + (calendar.monthrange(period // 100, period % 100)[1] if end else 1)
+
+
+def level_for(dimensions):
+    """Smallest level holding every dimension in dimensions"""
+    if "product" in dimensions:
+        return "product_category"
+    if "category" in dimensions:
+        return "category"
+    return "total"
+
+
+def rollup_cells(periods, products, categories, counts, totals):
+    """
+    Roll (period, product, category, count, total) cell changes up to every
+    period grain and level. Returns (grain codes, buckets, products, categories,
+    counts, totals) arrays, one entry per cube cell; product and category
+    are 0 where the level sums over them.
+    """
+    periods = np.asarray(periods, dtype=np.int64)
+    products = np.asarray(products, dtype=np.int64)
+    categories = np.asarray(categories, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    totals = np.asarray(totals, dtype=np.float64)
+    zeros = np.zeros_like(products)
+
+    # One int64 key per (bucket, product, category); buckets are at most 6 digits
+    product_base = int(products.max(initial=0)) + 1
+    category_base = int(categories.max(initial=0)) + 1
+
+    columns = [[] for _ in range(6)]
+    for grain in PERIOD_GRAINS:
+        bucket = buckets(periods, grain)
+        for product, category in ((products, categories), (zeros, categories), (zeros, zeros)):
+            keys, inverse = np.unique((bucket * product_base + product) * category_base + category, return_inverse=True)
+            columns[0].append(np.full(len(keys), GRAINS[grain], dtype=np.int64))
+            columns[1].append(keys // category_base // product_base)
+            columns[2].append(keys // category_base % product_base)
+            columns[3].append(keys % category_base)
+            columns[4].append(np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64))
+            columns[5].append(np.bincount(inverse, weights=totals, minlength=len(keys)))
+    return tuple(np.concatenate(column) for column in columns)
+
+
+def day_rollup_cells(days, categories, counts, totals):
+    """
+    Roll (day, category, count, total) cell changes up to every day grain
+    at the category and total levels; returns arrays as rollup_cells, with
+    product 0 throughout.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    categories = np.asarray(categories, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    totals = np.asarray(totals, dtype=np.float64)
+    zeros = np.zeros_like(categories)
+    category_base = int(categories.max(initial=0)) + 1
+
+    columns = [[] for _ in range(6)]
+    for grain in DAY_GRAINS:
+        bucket = day_buckets(days, grain)
+        for category in (categories, zeros):
+            keys, inverse = np.unique(bucket * category_base + category, return_inverse=True)
+            columns[0].append(np.full(len(keys), GRAINS[grain], dtype=np.int64))
+            columns[1].append(keys // category_base)
+            columns[2].append(np.zeros(len(keys), dtype=np.int64))
+            columns[3].append(keys % category_base)
+            columns[4].append(np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64))
+            columns[5].append(np.bincount(inverse, weights=totals, minlength=len(keys)))
+    return tuple(np.concatenate(column) for column in columns)
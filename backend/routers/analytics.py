@@ -0,0 +1,209 @@
+"""
+The analytics routes, all read-only: GET /recommendation,
+/recommendation/{product}, /anomalies, /forecast, /analytics/rollup and
+/analytics/distribution.
+
+Responses go through the versioned response cache with strong ETags
+(routers/common.py cached_json). Rows are read over aiosqlite; NumPy work
+and the columnar snapshot (main.sales_columns, which may refresh its
+files from the database) run on the thread pool.
+"""
+from fastapi import APIRouter, Request
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from async_db import async_session
+from main import (
+    ANOMALY_CELLS_QUERY,
+    DATA_VERSION_QUERY,
+    FORECAST_CELLS_SQL,
+    FORECAST_DIMENSIONS,
+    PRODUCT_NAMES_QUERY,
+    PRODUCT_PAIRS_SQL,
+    RECOMMENDATION_QUERY,
+    app,
+    build_anomaly_response,
+    build_distribution_response,
+    build_forecast_response,
+    build_item_recommendations,
+    build_neighbor_index,
+    build_recommendations,
+    build_rollup_response,
+    fit_forecasts,
+    forecast_cache,
+    logger,
+    neighbor_index_cache,
+    parse_anomaly_params,
+    parse_distribution_params,
+    parse_forecast_params,
+    parse_rollup_params,
+    rollup_query,
+    sales_columns,
+    snapshot_rollup_rows,
+)
+import rollup
+from routers.common import cached_json, error, fetch_tuples, run_sync
+
+router = APIRouter()
+
+
+@router.get("/recommendation")
+async def recommendation(request: Request):
+    async def build(session, version):
+        return build_recommendations((await session.execute(RECOMMENDATION_QUERY)).all())
+
+    try:
+        return await cached_json(request, "recommendation", {}, build)
+    except Exception:
+        logger.exception("Recommendation failed")
+        return {"recommendations": []}
+
+
+async def neighbor_index(session, version):
+    """main.neighbor_index over the async session"""
+    entry = neighbor_index_cache.get(version)
+    if entry is None:
+        pairs = await fetch_tuples(session, PRODUCT_PAIRS_SQL)
+        names = dict((await session.execute(PRODUCT_NAMES_QUERY)).all())
+        entry = neighbor_index_cache.put(version, await run_in_threadpool(build_neighbor_index, pairs, names))
+    return entry
+
+
+@router.get("/recommendation/{product}")
+async def item_recommendation(product: str, request: Request):
+    """
+    Products most often sold alongside product, i.e. in the same months and
+    categories, best first
+    Query: k=5 (1-RECOMMENDER_TOP_K)
+    """
+    top_k = app.config['RECOMMENDER_TOP_K']
+    try:
+        k = int(request.query_params.get("k", 5))
+    except ValueError:
+        return error("Invalid k")
+    if not 1 <= k <= top_k:
+        return error(f"k must be between 1 and {top_k}")
+
+    try:
+        async with async_session() as session:
+            version = (await session.execute(DATA_VERSION_QUERY)).scalar()
+            payload = build_item_recommendations(await neighbor_index(session, version), product, k)
+        if payload is None:
+            return error(f"No sales recorded for {product}", 404)
+        return payload
+
+    except Exception as e:
+        logger.exception("Recommendation failed")
+        return error(str(e), 500)
+
+
+@router.get("/anomalies")
+async def anomalies(request: Request):
+    """
+    Z-score anomalies over the maintained monthly aggregates
+    Query: mode=zscore|robust|rolling, window=3 (rolling only),
+           threshold=<float>, dimensions=total,product,category
+    """
+    params, message = parse_anomaly_params(request.query_params)
+    if message:
+        return error(message)
+
+    async def build(session, version):
+        cells = (await session.execute(ANOMALY_CELLS_QUERY)).all()
+        # NumPy scoring is CPU work; keep it off the event loop
+        return await run_in_threadpool(build_anomaly_response, cells, params)
+
+    try:
+        return await cached_json(request, "anomalies", params, build)
+    except Exception:
+        logger.exception("Anomaly detection failed")
+        return {"data": []}
+
+
+@router.get("/forecast")
+async def sales_forecast(request: Request):
+    """
+    Sales forecasts for the months after the latest recorded one
+    Query: model=holt|linear|seasonal, horizon=3 (1-24),
+           dimensions=total,product,category
+    "periods" labels the forecast months; per-series forecasts line up with it.
+    """
+    params, message = parse_forecast_params(request.query_params)
+    if message:
+        return error(message)
+
+    async def build(session, version):
+        # Fitted once per data version, whatever the horizon
+        key = (version, params["model"], tuple(params["dimensions"]))
+        fits = forecast_cache.get(key)
+        if fits is None:
+            cells = await fetch_tuples(session, FORECAST_CELLS_SQL)
+            names = {}
+            for dimension in params["dimensions"]:
+                table = FORECAST_DIMENSIONS[dimension]
+                if table is not None:
+                    names[dimension] = dict((await session.execute(select(table.id, table.name))).all())
+            fits = await run_in_threadpool(fit_forecasts, cells, names, params["model"], params["dimensions"])
+            forecast_cache.set(key, fits)
+        return build_forecast_response(fits, params["horizon"])
+
+    try:
+        return await cached_json(request, "forecast", params, build)
+    except Exception as e:
+        logger.exception("Forecast failed")
+        return error(str(e), 500)
+
+
+@router.get("/analytics/rollup")
+async def sales_rollup(request: Request):
+    """
+    Sales count, total and average per time bucket, read from the
+    maintained rollup cube
+    Query: grain=day|week|month|quarter|year (weeks are ISO weeks),
+           from=<YYYY|YYYY-Qn|YYYY-MM|YYYY-MM-DD>, to=<same> (inclusive;
+           buckets overlapping the range are returned whole),
+           group_by=product,category, product=<names>, category=<names>
+           (comma separated filters)
+    Day and week buckets by product come from the columnar snapshot, as
+    the cube holds those grains only down to the category level.
+    """
+    params, message = parse_rollup_params(request.query_params)
+    if message:
+        return error(message)
+
+    async def build(session, version):
+        dimensions = set(params["group_by"]) | set(params["filters"])
+        if params["grain"] in rollup.DAY_GRAINS and rollup.level_for(dimensions) == "product_category":
+            rows = await run_sync(lambda: snapshot_rollup_rows(sales_columns(version), params))
+        else:
+            rows = (await session.execute(rollup_query(params))).all()
+        return build_rollup_response(rows, params)
+
+    try:
+        return await cached_json(request, "rollup", params, build)
+    except Exception as e:
+        logger.exception("Rollup query failed")
+        return error(str(e), 500)
+
+
+@router.get("/analytics/distribution")
+async def sales_distribution(request: Request):
+    """
+    Distribution of individual sales entries: count, mean, min, p25, p50,
+    p75, p90 and max, from the columnar snapshot
+    Query: group_by=total|product|category, from=/to= periods (as
+           /analytics/rollup), product=/category= names,
+           recorded_from=/recorded_to=YYYY-MM-DD (when entries were recorded)
+    """
+    params, message = parse_distribution_params(request.query_params)
+    if message:
+        return error(message)
+
+    async def build(session, version):
+        return await run_sync(lambda: build_distribution_response(sales_columns(version), params))
+
+    try:
+        return await cached_json(request, "distribution", params, build)
+    except Exception as e:
+        logger.exception("Distribution failed")
+        return error(str(e), 500)
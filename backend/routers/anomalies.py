@@ -1,26 +1,37 @@
+from typing import Literal, Optional
+
 from fastapi import APIRouter
 from pydantic import BaseModel
 import numpy as np
 
+from anomaly_engine import DEFAULT_THRESHOLDS, score_matrix
+
 router = APIRouter()
 
 class DataInput(BaseModel):
     numbers: list[float]
+    mode: Literal["zscore", "robust", "rolling"] = "zscore"
+    window: int = 3
+    threshold: Optional[float] = None
 
 @router.post("/anomalies")
 def detect_anomalies(data: DataInput):
-    values = np.array(data.numbers)
-    mean = np.mean(values)
-    std = np.std(values)
-    z_scores = (values - mean) / std
+    values = np.array(data.numbers, dtype=np.float64)
+    threshold = data.threshold if data.threshold is not None else DEFAULT_THRESHOLDS[data.mode]
+    z_scores = score_matrix(values[None, :], data.mode, max(data.window, 2))[0]
 
-    results = []
-    for i, v in enumerate(values):
-        results.append({
+    results = [
+        {
             "month": f"Month {i+1}",
-            "sales": float(v),
-            "z_score": round(float(z_scores[i]), 2),
-            "anomaly": abs(z_scores[i]) >= 2
-        })
+            "sales": v,
+            "z_score": z,
+            "anomaly": flag
+        }
+        for i, (v, z, flag) in enumerate(zip(
+            values.tolist(),
+            np.round(z_scores, 2).tolist(),
+            (np.abs(z_scores) >= threshold).tolist()
+        ))
+    ]
 
     return {"data": results}
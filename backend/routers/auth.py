@@ -0,0 +1,80 @@
+"""
+POST /login and POST /register.
+
+Password hashing blocks on main.py's password_hasher pool, so both run on
+the thread pool; a full pool answers 503 rather than queueing the request.
+"""
+from fastapi import APIRouter, Request
+
+from main import issue_token, log_in, logger, register_user
+from passwords import HashPoolFull
+from routers.common import error, json_body, run_sync
+
+router = APIRouter()
+
+
+def _busy():
+    return error("Server busy, please retry", 503, headers={"Retry-After": "1"})
+
+
+def _login(username, password):
+    """log_in, with the user as the response needs it (the User is bound to this thread's session)"""
+    user, message = log_in(username, password)
+    if user is None:
+        return None, message
+    return {"id": user.id, "username": user.username, "email": user.email}, None
+
+
+@router.post("/login")
+async def login(request: Request):
+    data = await json_body(request) or {}
+    username = data.get("username")
+    password = data.get("password")
+
+    logger.debug("Login attempt: %s", username)
+
+    if not username or not password:
+        logger.info("Login rejected: missing username or password")
+        return error("Username and password required")
+
+    try:
+        user, message = await run_sync(_login, username, password)
+    except HashPoolFull:
+        logger.warning("Login rejected: password hash pool full")
+        return _busy()
+    except Exception as e:
+        logger.exception("Login failed")
+        return error(str(e), 500)
+
+    if user is None:
+        logger.info("Login rejected: %s", message)
+        return error("Invalid credentials", 401)
+
+    logger.info("Login successful for %s", username)
+    return {"status": "success", "token": issue_token(user["id"]), "user": user}
+
+
+@router.post("/register", status_code=201)
+async def register(request: Request):
+    data = await json_body(request) or {}
+    username = data.get("username")
+    email = data.get("email")
+    password = data.get("password")
+
+    if not username or not email or not password:
+        return error("Missing required fields")
+
+    try:
+        created, message = await run_sync(register_user, username, email, password)
+    except HashPoolFull:
+        logger.warning("Registration rejected: password hash pool full")
+        return _busy()
+    except Exception as e:
+        logger.exception("Registration failed")
+        return error(str(e), 500)
+
+    if not created:
+        return error(message, 409)
+
+    logger.info("New user registered: %s", username)
+    return {"status": "success", "message": "User registered successfully"}
@@ -0,0 +1,117 @@
+"""
+What the async routes share: authentication, JSON bodies and errors, the
+versioned response cache, and running main.py's sync code (the writer
+session, CPU-bound builders) on the thread pool instead of the event loop.
+
+Reads go through async_db.async_session. Writes keep using main.db.session
+on the thread pool: SQLite takes one writer at a time, and the aggregate
+maintenance they run (record_sales and friends) is shared with the jobs.
+"""
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from async_db import async_session
+from main import DATA_VERSION_QUERY, app, auth_cache, logger, response_cache, verify_token
+from response_cache import etag_matches
+
+
+def error(message, status_code=400, headers=None, **extra):
+    return JSONResponse({"status": "error", "message": message, **extra}, status_code=status_code, headers=headers)
+
+
+async def json_body(request):
+    """The request body as a JSON object, or None if it isn't one"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def authenticate(request, optional=False):
+    """
+    (Principal, None) for the request's bearer token, as main.token_required
+    checks it, else (None, 401 response). With optional, a request without
+    a token is (None, None); an invalid token is still a 401.
+    """
+    token = request.headers.get("authorization")
+    if not token:
+        if optional:
+            return None, None
+        return None, JSONResponse({"message": "Token is missing"}, status_code=401)
+    if token.startswith("Bearer "):
+        token = token.split(" ")[1]
+
+    principal = auth_cache.get(token)
+    if principal is not None:
+        return principal, None
+    try:
+        async with async_session() as session:
+            return await session.run_sync(lambda sync_session: verify_token(token, sync_session)), None
+    except Exception as e:
+        logger.debug("Token rejected: %s", e)
+        return None, JSONResponse({"message": "Token is invalid"}, status_code=401)
+
+
+def _in_app_context(function, *args):
+    with app.app_context():
+        return function(*args)
+
+
+async def run_sync(function, *args):
+    """function(*args) on the thread pool, inside a Flask app context (for db.session and read_session)"""
+    return await run_in_threadpool(_in_app_context, function, *args)
+
+
+async def fetch_tuples(session, sql, params=()):
+    """
+    Plain tuples for raw SQL through the session's DBAPI cursor: many rows
+    convert to arrays an order of magnitude faster than Row objects
+    """
+    def fetch(sync_session):
+        cursor = sync_session.connection().connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    return await session.run_sync(fetch)
+
+
+def cached_response(request, entry):
+    """A response_cache entry as JSON with its strong ETag, or 304 if If-None-Match matches it"""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.record_not_modified(entry)
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+async def cached_json(request, endpoint, params, build):
+    """
+    Serve await build(session, data version) through the versioned response
+    cache (see cached_response); it only runs when the cache misses
+    """
+    async with async_session() as session:
+        version = (await session.execute(DATA_VERSION_QUERY)).scalar()
+        entry = response_cache.get(endpoint, params, version)
+        if entry is None:
+            entry = response_cache.put(endpoint, params, version, await build(session, version))
+    return cached_response(request, entry)
+
+
+def job_accepted(payload):
+    """202 for the job_payload() of a job started by main.submit_job, as main.job_accepted"""
+    return JSONResponse(
+        {"status": "accepted", "job": payload}, status_code=202, headers={"Location": f"/jobs/{payload['id']}"}
+    )
+
+
+def job_unavailable(e):
+    """503 for jobs.SchedulerUnavailable, as main.job_unavailable"""
+    logger.error("Job not started: %s", e)
+    return error(
+        "Background jobs are unavailable, please retry", 503,
+        headers={"Retry-After": str(app.config['ADMISSION_RETRY_AFTER'])}
+    )
@@ -0,0 +1,102 @@
+"""
+The background job routes: POST /jobs, GET /jobs, GET /jobs/<id>,
+GET /jobs/<id>/result and DELETE /jobs/<id>.
+
+A job id is enough to poll a job started without a token (see
+main.own_job), so the per-job routes take one optionally. Starting and
+cancelling write through main.py's writer session on the thread pool.
+"""
+import json
+
+from fastapi import APIRouter, Request
+from sqlalchemy import select
+
+from async_db import async_session
+from main import JOB_ACTIVE, JOB_PARAMS, Job, cancel_job, job_payload, own_job, submit_job
+import jobs
+from routers.common import authenticate, error, job_accepted, job_unavailable, json_body, run_sync
+
+router = APIRouter()
+
+
+def _submit(job_type, user_id, params):
+    """submit_job, deduplicated, as its job_payload() (the Job is bound to this thread's session)"""
+    return job_payload(submit_job(job_type, user_id, params, dedupe=True))
+
+
+async def _find_job(request, job_id):
+    """(the caller's job, None), else (None, 401 or 404 response)"""
+    principal, denied = await authenticate(request, optional=True)
+    if denied:
+        return None, denied
+    async with async_session() as session:
+        job = await session.get(Job, job_id)
+    if not own_job(job, principal and principal.id):
+        return None, error("Job not found", 404)
+    return job, None
+
+
+@router.post("/jobs")
+async def create_job(request: Request):
+    """Start a job: {"type": "rebuild-aggregates"} or {"type": "export", "params": {"report_type": "sales"}}"""
+    principal, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    data = await json_body(request) or {}
+    job_type = data.get("type")
+    if job_type not in JOB_PARAMS:
+        return error(f"Invalid job type: {job_type}")
+    try:
+        params = JOB_PARAMS[job_type](data.get("params") or {})
+    except ValueError as e:
+        return error(str(e))
+
+    try:
+        return job_accepted(await run_sync(_submit, job_type, principal.id, params))
+    except jobs.SchedulerUnavailable as e:
+        return job_unavailable(e)
+
+
+@router.get("/jobs")
+async def list_jobs(request: Request):
+    """The current user's 50 most recent jobs"""
+    principal, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    async with async_session() as session:
+        rows = (await session.execute(
+            select(Job).where(Job.user_id == principal.id).order_by(Job.created_at.desc()).limit(50)
+        )).scalars()
+        return {"status": "success", "data": [job_payload(job) for job in rows]}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    job, denied = await _find_job(request, job_id)
+    if denied:
+        return denied
+    return {"status": "success", "job": job_payload(job, with_result=True)}
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(request: Request, job_id: str):
+    job, denied = await _find_job(request, job_id)
+    if denied:
+        return denied
+    if job.status != "succeeded":
+        return error(f"Job is {job.status}", 409, job=job_payload(job))
+    return {"status": "success", "result": json.loads(job.result)}
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel(request: Request, job_id: str):
+    """Cancel a queued job, or ask a running one to stop"""
+    job, denied = await _find_job(request, job_id)
+    if denied:
+        return denied
+    if job.status not in JOB_ACTIVE:
+        return error(f"Job is {job.status}", 409)
+
+    return {"status": "success", "job": await run_sync(cancel_job, job_id)}
@@ -1,9 +1,367 @@
-from fastapi import APIRouter
+"""
+The sales data routes: GET /get-all-sales (keyset pages or a stream),
+POST /add-sales, PUT /update-sales/<id>, DELETE /delete-sales/<id>,
+POST /bulk-add-sales, /bulk-update-sales, /bulk-delete-sales, and the
+dashboard's GET /sales.
+
+Reads run over aiosqlite. Writes run main.py's sync write paths on the
+thread pool (routers/common.py run_sync), where they update the derived
+aggregates in the same transactions as the rows.
+"""
+import csv
+import io
+import json
+import math
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func, select
+
+from async_db import async_session
+from main import (
+    DATA_VERSION_QUERY,
+    SALES_COLUMNS,
+    SALES_PAGE_DEFAULT,
+    SALES_PAGE_MAX,
+    SALES_STREAM_CHUNK,
+    SalesData,
+    _decode_sales_cursor,
+    _encode_sales_cursor,
+    _sale_row,
+    _sales_query,
+    add_sale,
+    add_sales_entries,
+    db,
+    delete_sale,
+    delete_sales_rows,
+    logger,
+    parse_sales_changes,
+    parse_sales_selection,
+    sales_change_values,
+    update_sale,
+    update_sales_rows,
+)
+from periods import parse_sale_date
+from routers.analytics import neighbor_index
+from routers.common import authenticate, error, json_body, run_sync
+import upload_sales_data
 
 router = APIRouter()
 
+
 @router.get("/sales")
-def get_sales_recommendation():
+async def get_sales_recommendation():
+    async with async_session() as session:
+        version = (await session.execute(DATA_VERSION_QUERY)).scalar()
+        index, names, _ = await neighbor_index(session, version)
+
+    if index.strongest is None:
+        return {"recommendation": "Not enough sales data for recommendations yet."}
+
+    product, other, score, _ = index.strongest
     return {
-        "recommendation": "Customers who bought Product A also showed interest in Product B."
+        "recommendation": f"Customers who bought {names[product]} also showed interest in {names[other]}.",
+        "score": score
+    }
+
+
+STREAM_MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def _stream_sales(after, fmt):
+    """Yield the sales table in chunks from a server-side cursor"""
+    if fmt == "csv":
+        yield ",".join(SALES_COLUMNS) + "\r\n"
+    elif fmt == "json":
+        yield '{"status": "success", "data": ['
+
+    first = True
+    async with async_session() as session:
+        result = await session.stream(_sales_query(after).execution_options(yield_per=SALES_STREAM_CHUNK))
+        async for chunk in result.partitions():
+            rows = [_sale_row(row) for row in chunk]
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=SALES_COLUMNS)
+                writer.writerows(rows)
+                yield buffer.getvalue()
+            elif fmt == "ndjson":
+                yield "".join(json.dumps(r) + "\n" for r in rows)
+            else:
+                body = ", ".join(json.dumps(r) for r in rows)
+                yield body if first else ", " + body
+                first = False
+
+    if fmt == "json":
+        yield "]}"
+
+
+@router.get("/get-all-sales")
+async def get_all_sales(request: Request):
+    """
+    Get sales data, newest first
+    Query: limit=<n>, cursor=<next_cursor>  -> one keyset page plus next_cursor
+           format=json|ndjson|csv            -> stream every row (after cursor, if given)
+    Without limit/cursor the full table is streamed in the original JSON shape.
+    """
+    _, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    args = request.query_params
+    fmt = args.get("format", "json")
+    if fmt not in STREAM_MEDIA_TYPES:
+        return error(f"Invalid format: {fmt}")
+
+    try:
+        cursor = args.get("cursor")
+        after = _decode_sales_cursor(cursor) if cursor else None
+    except ValueError:
+        return error("Invalid cursor")
+    try:
+        limit = int(args["limit"]) if args.get("limit") else None
+    except ValueError:
+        return error("Invalid limit")
+
+    if fmt != "json" or (limit is None and not cursor):
+        return StreamingResponse(_stream_sales(after, fmt), media_type=STREAM_MEDIA_TYPES[fmt])
+
+    try:
+        limit = max(1, min(limit or SALES_PAGE_DEFAULT, SALES_PAGE_MAX))
+        async with async_session() as session:
+            rows = (await session.execute(_sales_query(after).limit(limit + 1))).all()
+        page = rows[:limit]
+
+        return {
+            "status": "success",
+            "data": [_sale_row(row) for row in page],
+            "next_cursor": _encode_sales_cursor(page[-1]) if len(rows) > limit else None
+        }
+
+    except Exception as e:
+        logger.exception("Get sales failed")
+        return error(str(e), 500)
+
+
+@router.post("/add-sales", status_code=201)
+async def add_sales(request: Request):
+    """
+    Add new sales data
+    Body: {
+        "product": "Laptop",
+        "sales": 150.50,
+        "date": "2025-01-15",     (or "month": "Jan", for the 1st of it)
+        "category": "Electronics"
+    }
+    """
+    _, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    data = await json_body(request)
+    if data is None:
+        return error("Invalid JSON body")
+    for field in ("product", "sales"):
+        if field not in data:
+            return error(f"Missing field: {field}")
+    if "date" not in data and "month" not in data:
+        return error("Missing field: date or month")
+
+    try:
+        sale_date = parse_sale_date(data["date"] if "date" in data else data["month"])
+        value = float(data["sales"])
+    except (TypeError, ValueError) as e:
+        return error(str(e))
+    if not math.isfinite(value):
+        return error("Invalid sales value")
+
+    try:
+        payload = await run_sync(add_sale, data["product"], value, sale_date, data.get("category") or "Uncategorized")
+        logger.info("Sales entry added: %s - $%s", data['product'], data['sales'])
+        return {"status": "success", "message": "Sales data added successfully", "data": payload}
+
+    except Exception as e:
+        logger.exception("Add sales failed")
+        return error(str(e), 500)
+
+
+@router.put("/update-sales/{sale_id}")
+async def update_sales(request: Request, sale_id: int):
+    """
+    Update a sales entry
+    Body: any of product, sales, category, date ("2025-01-15") or month;
+    a month moves the sale to that month of its own year (keeping the day
+    where the month has it) unless given with a year, as "2025-03".
+    """
+    _, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    data = await json_body(request)
+    if data is None:
+        return error("Invalid JSON body")
+
+    try:
+        payload = await run_sync(update_sale, sale_id, data)
+    except (TypeError, ValueError) as e:
+        return error(str(e))
+    except Exception as e:
+        logger.exception("Update failed")
+        return error(str(e), 500)
+
+    if payload is None:
+        return error("Sales entry not found", 404)
+    logger.info("Sales entry updated: ID %d", sale_id)
+    return {"status": "success", "message": "Sales entry updated", "data": payload}
+
+
+@router.delete("/delete-sales/{sale_id}")
+async def delete_sales(request: Request, sale_id: int):
+    """Delete a sales entry"""
+    _, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    try:
+        deleted = await run_sync(delete_sale, sale_id)
+    except Exception as e:
+        logger.exception("Delete failed")
+        return error(str(e), 500)
+
+    if not deleted:
+        return error("Sales entry not found", 404)
+    logger.info("Sales entry deleted: ID %d", sale_id)
+    return {"status": "success", "message": "Sales entry deleted"}
+
+
+@router.post("/bulk-add-sales", status_code=201)
+async def bulk_add_sales(request: Request):
+    """
+    Add multiple sales entries at once
+    Body: {
+        "sales": [
+            {"product": "Laptop", "sales": 150, "date": "2025-01-15", "category": "Electronics"},
+            {"product": "Mouse", "sales": 25, "month": "Jan", "category": "Accessories"}
+        ]
     }
+    All or nothing: a bad entry rejects the whole request.
+    """
+    _, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    data = await json_body(request)
+    sales_list = (data or {}).get("sales")
+    if not sales_list:
+        return error("No sales data provided")
+    if not isinstance(sales_list, list) or not all(isinstance(sale, dict) for sale in sales_list):
+        return error("sales must be a list of objects")
+
+    try:
+        added_count, errors = await run_sync(add_sales_entries, sales_list)
+        if errors:
+            return error(
+                f"{len(errors)} invalid sales entries", errors=errors[:upload_sales_data.MAX_REPORTED_ERRORS]
+            )
+
+        logger.info("Bulk sales added: %d entries", added_count)
+        return {"status": "success", "message": f"{added_count} sales entries added successfully"}
+
+    except Exception as e:
+        logger.exception("Bulk add failed")
+        return error(str(e), 500)
+
+
+async def _count_selection(selection):
+    async with async_session() as session:
+        return sum([
+            (await session.execute(select(func.count()).select_from(SalesData).where(condition))).scalar()
+            for condition in selection
+        ])
+
+
+def _update_selection(selection, changes):
+    """Run update_sales_rows to the end; returns (response body, status code)"""
+    matched = updated = 0
+    try:
+        for chunk_matched, chunk_updated in update_sales_rows(selection, sales_change_values(changes)):
+            matched += chunk_matched
+            updated += chunk_updated
+        logger.info("Bulk sales update: %d matched, %d updated", matched, updated)
+        return {"status": "success", "dry_run": False, "matched": matched, "updated": updated}, 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Bulk update failed after %d entries", updated)
+        return {"status": "error", "message": str(e), "matched": matched, "updated": updated}, 500
+
+
+def _delete_selection(selection):
+    """Run delete_sales_rows to the end; returns (response body, status code)"""
+    deleted = 0
+    try:
+        for chunk_deleted in delete_sales_rows(selection):
+            deleted += chunk_deleted
+        logger.info("Bulk sales delete: %d deleted", deleted)
+        return {"status": "success", "dry_run": False, "deleted": deleted}, 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Bulk delete failed after %d entries", deleted)
+        return {"status": "error", "message": str(e), "deleted": deleted}, 500
+
+
+@router.post("/bulk-update-sales")
+async def bulk_update_sales(request: Request):
+    """
+    Update every sales entry matching ids or a filter
+    Body: {
+        "ids": [1, 2, 3],                  (or)
+        "filter": {"product": "Laptop", "category": "Electronics", "from": "2025-01", "to": "2025-Q2",
+                   "recorded_from": "2025-06-01", "recorded_to": "2025-06-30"},
+        "set": {"product": "Laptop Pro", "category": "Electronics", "sales": 100, "month": "Mar"},
+        "dry_run": false
+    }
+    Runs in transactions of SALES_BATCH_CHUNK rows: a failure keeps the
+    chunks already committed, and the response says how many those were.
+    dry_run only counts the matching entries.
+    """
+    _, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    data = await json_body(request) or {}
+    selection, message = parse_sales_selection(data)
+    if not message:
+        changes, message = parse_sales_changes(data.get("set"))
+    if message:
+        return error(message)
+
+    if data.get("dry_run"):
+        return {"status": "success", "dry_run": True, "matched": await _count_selection(selection)}
+
+    body, status_code = await run_sync(_update_selection, selection, changes)
+    return JSONResponse(body, status_code=status_code)
+
+
+@router.post("/bulk-delete-sales")
+async def bulk_delete_sales(request: Request):
+    """
+    Delete every sales entry matching ids or a filter
+    Body: {"ids": [...]} or {"filter": {...}}, as /bulk-update-sales, plus "dry_run": false
+    Runs in transactions of SALES_BATCH_CHUNK rows, like /bulk-update-sales.
+    """
+    _, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    data = await json_body(request) or {}
+    selection, message = parse_sales_selection(data)
+    if message:
+        return error(message)
+
+    if data.get("dry_run"):
+        return {"status": "success", "dry_run": True, "matched": await _count_selection(selection)}
+
+    body, status_code = await run_sync(_delete_selection, selection)
+    return JSONResponse(body, status_code=status_code)
@@ -0,0 +1,117 @@
+"""
+GET /stream/analytics: server-sent events carrying what changed in the sales
+analytics, so open dashboards stop refetching /anomalies and /recommendation.
+
+One watcher task per process runs while the process has subscribers. It
+re-reads the maintained aggregates only when the data version moved (woken
+at once by commits in this process, otherwise by polling every
+STREAM_POLL_INTERVAL), computes the deltas once and fans them out through
+main.analytics_broker. Idle subscribers cost a parked coroutine and a
+heartbeat comment every STREAM_HEARTBEAT seconds.
+
+Events (each with id: <data version>):
+    ready            {"version"}: sent on every (re)connect; fetch state now
+    totals           {"changed": [monthly cells], "removed": [periods]}
+    anomalies        {"changed", "removed": the /anomalies "data" series,
+                      "flagged", "cleared": newly (un)flagged points of the
+                      total and per-category series}
+    recommendations  {"changed": [rows], "removed": [products], "top": [products]}
+    resync           {}: events were dropped (slow client); fetch state again
+"""
+import asyncio
+import contextvars
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from async_db import async_session
+from broker import format_event
+from main import (
+    DATA_VERSION_QUERY,
+    RECOMMENDATION_QUERY,
+    STREAM_CELLS_QUERY,
+    analytics_broker,
+    analytics_deltas,
+    analytics_state,
+    app,
+    logger,
+)
+
+router = APIRouter()
+
+RETRY_MS = 3000  # EventSource reconnect delay
+
+
+class AnalyticsFeed:
+    def __init__(self, broker):
+        self.broker = broker
+        self.state = None  # main.AnalyticsState while the watcher runs
+        self._lock = asyncio.Lock()
+        self._watcher = None
+
+    async def update(self):
+        """Bring state up to the current data version, publishing the deltas"""
+        async with self._lock:
+            async with async_session() as session:
+                version = (await session.execute(DATA_VERSION_QUERY)).scalar()
+                if self.state is not None and self.state.version == version:
+                    return self.state
+                cells = (await session.execute(STREAM_CELLS_QUERY)).all()
+                recommendations = (await session.execute(RECOMMENDATION_QUERY)).all()
+
+            state = await run_in_threadpool(analytics_state, version, cells, recommendations)
+            if self.state is not None:
+                for event, data in analytics_deltas(self.state, state):
+                    self.broker.publish(format_event(event, data, version))
+            self.state = state
+            return state
+
+    def start(self):
+        if self._watcher is None:
+            # A fresh context: not the metrics context of the request that started it
+            self._watcher = asyncio.create_task(self._watch(), context=contextvars.Context())
+
+    async def _watch(self):
+        try:
+            while len(self.broker):
+                try:
+                    await self.update()
+                except Exception:
+                    logger.exception("Analytics stream update failed")
+                await self.broker.wait_for_change(app.config['STREAM_POLL_INTERVAL'])
+        finally:
+            # Without subscribers nothing keeps the state current
+            self._watcher = None
+            self.state = None
+
+
+feed = AnalyticsFeed(analytics_broker)
+
+
+async def _events():
+    # Subscribed before reading the state: nothing committed after it is missed
+    subscription = analytics_broker.subscribe()
+    try:
+        feed.start()
+        try:
+            state = await feed.update()
+        except Exception:
+            logger.exception("Analytics stream failed to start")
+            return
+        yield f"retry: {RETRY_MS}\n\n" + format_event("ready", {"version": state.version}, state.version)
+
+        while True:
+            message = await subscription.next(app.config['STREAM_HEARTBEAT'])
+            yield message if message is not None else ": keepalive\n\n"
+    finally:
+        analytics_broker.unsubscribe(subscription)
+
+
+@router.get("/stream/analytics")
+async def analytics_stream():
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,12 +1,114 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+"""
+The meeting summary routes: POST /summarize and GET /summaries.
+
+POST /summarize serves both frontends: with a bearer token the summary is
+recorded for the user (and listed by GET /summaries), without one it is
+only returned. Summarizing blocks on the batching summarizer, so it runs
+on the thread pool; long transcripts through the model become a
+"summarize" job either way, polled at GET /jobs/<id>.
+"""
+import base64
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from async_db import async_session
+from main import (
+    SUMMARIZER_MODES,
+    SUMMARY_MIN_LENGTH,
+    SUMMARY_PAGE_DEFAULT,
+    SUMMARY_PAGE_MAX,
+    app,
+    job_payload,
+    logger,
+    start_summary,
+    summary_history_query,
+)
+import jobs
+from routers.common import authenticate, error, job_accepted, job_unavailable, json_body, run_sync
 
 router = APIRouter()
 
-class MeetingText(BaseModel):
-    text: str
+
+def _summarize(user_id, text, mode):
+    """start_summary, with the job as its job_payload() (the Job is bound to this thread's session)"""
+    payload, job = start_summary(user_id, text, mode)
+    return payload, None if job is None else job_payload(job)
+
 
 @router.post("/summarize")
-def summarize_meeting(data: MeetingText):
-    summary = data.text[:100] + "..."
-    return {"summary": summary}
+async def summarize(request: Request):
+    principal, denied = await authenticate(request, optional=True)
+    if denied:
+        return denied
+
+    data = await json_body(request) or {}
+    text = data.get("text") or ""
+    mode = data.get("mode")
+
+    if not isinstance(text, str) or len(text) < SUMMARY_MIN_LENGTH:
+        return JSONResponse({"error": "Text too short to summarize"}, status_code=400)
+    if len(text) > app.config['SUMMARY_MAX_LENGTH']:
+        return JSONResponse({"error": "Text too long to summarize"}, status_code=413)
+    if mode is not None and mode not in SUMMARIZER_MODES:
+        return JSONResponse({"error": f"Invalid mode: {mode}"}, status_code=400)
+
+    try:
+        payload, job = await run_sync(_summarize, principal and principal.id, text, mode)
+        if job is not None:
+            return job_accepted(job)
+
+        logger.info(
+            "Summary %s for %s", "reused" if payload["cached"] else "created",
+            principal.username if principal else "anonymous caller"
+        )
+        return payload
+
+    except jobs.SchedulerUnavailable as e:
+        return job_unavailable(e)
+    except Exception as e:
+        logger.exception("Summarization failed")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@router.get("/summaries")
+async def summary_history(request: Request):
+    """
+    The current user's summaries, newest first, without the original texts
+    Query: limit=<n>, cursor=<next_cursor>
+    """
+    principal, denied = await authenticate(request)
+    if denied:
+        return denied
+
+    try:
+        cursor = request.query_params.get("cursor")
+        before = int(base64.urlsafe_b64decode(cursor.encode()).decode()) if cursor else None
+        limit = int(request.query_params.get("limit", SUMMARY_PAGE_DEFAULT))
+    except ValueError:
+        return error("Invalid cursor")
+    limit = max(1, min(limit, SUMMARY_PAGE_MAX))
+
+    try:
+        async with async_session() as session:
+            rows = (await session.execute(summary_history_query(principal.id, before).limit(limit + 1))).all()
+        page = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = base64.urlsafe_b64encode(str(page[-1].id).encode()).decode()
+        return {
+            "status": "success",
+            "data": [{
+                "id": row.id,
+                "summary": row.summary,
+                "mode": row.mode,
+                "original_length": row.length,
+                "created_at": row.created_at.strftime("%Y-%m-%d %H:%M:%S")
+            } for row in page],
+            "next_cursor": next_cursor
+        }
+
+    except Exception as e:
+        logger.exception("Summary history failed")
+        return error(str(e), 500)
@@ -0,0 +1,55 @@
+"""
+SQLite storage tuning.
+
+Every connection gets WAL journaling and the pragmas below. The app then
+uses two pools on the same file: Flask-SQLAlchemy's engine is limited to a
+single writer connection (SQLite allows one writer at a time anyway, so
+writers queue on the pool instead of failing with "database is locked"),
+and a separate pool of query-only connections serves reads. Under WAL,
+readers see the last committed snapshot and never wait for the writer.
+
+A SQLite connection must not be used on both sides of a fork(), so every
+pool is reset in forked children (see reset_after_fork).
+"""
+import os
+
+from sqlalchemy import create_engine, event
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # safe under WAL; fsync at checkpoints only
+    "busy_timeout": 5000,  # ms
+    "cache_size": -65536,  # KiB, i.e. 64 MB per connection
+    "mmap_size": 268435456,  # 256 MB
+    "temp_store": "MEMORY",
+}
+
+WRITER_ENGINE_OPTIONS = {"pool_size": 1, "max_overflow": 0, "pool_timeout": 30}
+
+
+def apply_pragmas(engine, pragmas, read_only=False):
+    """Run the pragmas on every new DBAPI connection of engine"""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def create_read_engine(url, pool_size, pragmas):
+    """Pool of query-only connections on the same database as url"""
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0, pool_timeout=30)
+    apply_pragmas(engine, pragmas, read_only=True)
+    return engine
+
+
+def reset_after_fork(engine):
+    """
+    Start forked children (e.g. preloaded server workers) with an empty pool
+    for engine. The parent's connections are dropped, not closed: the parent
+    may still be using them.
+    """
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
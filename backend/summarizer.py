@@ -0,0 +1,246 @@
+"""
+Meeting summarization.
+
+extractive_summary is the cheap fallback: the first few sentences of the
+text. BatchingSummarizer runs a local seq2seq transformer on the CPU:
+
+- the model is loaded once per process: at server startup (load(), which
+  retries with backoff; gunicorn's master loads it before forking, so the
+  workers share it), else by the first summary. A failed load is
+  retried by the first summary after retry_after seconds; until then
+  `failed` is True and callers fall back to extractive_summary
+- callers put texts on a queue; a single inference thread, started by the
+  first summary in each process (threads don't survive a fork), takes up to
+  max_batch_size of them, waiting at most max_wait seconds for the batch to
+  fill, and runs them through one padded generate() call, so concurrent
+  requests share forward passes instead of queueing behind each other
+- texts longer than the model's input are split on sentence boundaries into
+  chunks, the chunks are summarized (in the same batches as everyone
+  else's), and the joined partial summaries are summarized again until one
+  summary is left (map-reduce)
+- the fast tokenizer is not thread safe ("Already borrowed"), and both the
+  request threads (chunking) and the inference thread use it, so every
+  call to it holds _tokenizer_lock
+
+torch and transformers are only imported when the model is first needed.
+"""
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Bump when extractive_summary's output changes; keys stored summaries
+EXTRACTIVE_VERSION = "extractive:1"
+
+
+class SummarizerUnavailable(Exception):
+    """The transformer model could not be loaded"""
+
+
+def extractive_summary(text, max_chars=150, max_sentences=5):
+    """Leading sentences of text, up to max_chars"""
+    sentences = text.replace('!', '.').replace('?', '.').split('.')
+    sentences = [s.strip() for s in sentences if s.strip()]
+
+    summary_sentences = []
+    summary_length = 0
+    for sentence in sentences[:max_sentences]:
+        if summary_length + len(sentence) < max_chars:
+            summary_sentences.append(sentence)
+            summary_length += len(sentence)
+        else:
+            break
+
+    return '. '.join(summary_sentences) + '.'
+
+
+class BatchingSummarizer:
+    def __init__(self, model_name, max_batch_size=8, max_wait=0.05, max_input_tokens=1024,
+                 max_summary_tokens=128, num_beams=2, threads=None, timeout=300, retry_after=60):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_input_tokens = max_input_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.num_beams = num_beams
+        self.threads = threads
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._queue = queue.Queue()
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._tokenizer_lock = threading.Lock()
+        self._tokenizer = None
+        self._model = None
+        self._torch = None
+        self._server = None
+        self._load_error = None
+        self._retry_at = 0.0
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    # ----- model -----
+
+    def _load(self, force=False):
+        """Load the model unless it is loaded; without force, not before a failed load's retry_after"""
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            if self.failed and not force:
+                raise SummarizerUnavailable(self._load_error)
+            try:
+                import torch
+                from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+                if self.threads:
+                    torch.set_num_threads(self.threads)
+                tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name).eval()
+            except Exception as e:
+                self._load_error = f"{self.model_name}: {e}"
+                self._retry_at = time.monotonic() + self.retry_after
+                raise SummarizerUnavailable(self._load_error) from e
+
+            self._load_error = None
+            self._torch = torch
+            self._tokenizer = tokenizer
+            self.max_input_tokens = min(self.max_input_tokens, tokenizer.model_max_length)
+            self._model = model
+
+    def load(self, attempts=3, backoff=2.0):
+        """
+        Load the model now, retrying a failure after backoff, then twice
+        that, ...; raises SummarizerUnavailable once attempts are used up
+        """
+        for attempt in range(attempts):
+            try:
+                return self._load(force=True)
+            except SummarizerUnavailable:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+
+    @property
+    def version(self):
+        """Identifies the model and generation settings; keys stored summaries"""
+        return f"{self.model_name}:{self.max_summary_tokens}:{self.num_beams}"
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def failed(self):
+        """True from a failed load until it may be retried (retry_after seconds later)"""
+        return self._load_error is not None and time.monotonic() < self._retry_at
+
+    def _generate(self, texts):
+        with self._tokenizer_lock:
+            inputs = self._tokenizer(
+                texts, truncation=True, max_length=self.max_input_tokens, padding=True, return_tensors="pt"
+            )
+        with self._torch.inference_mode():
+            output = self._model.generate(
+                **inputs, max_new_tokens=self.max_summary_tokens, num_beams=self.num_beams, early_stopping=True
+            )
+        with self._tokenizer_lock:
+            return self._tokenizer.batch_decode(output, skip_special_tokens=True)
+
+    # ----- dynamic batching -----
+
+    def _serve(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+            try:
+                summaries = self._generate([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), summary in zip(batch, summaries):
+                future.set_result(summary.strip())
+
+    def _start_server(self):
+        """Start this process's inference thread unless it is running"""
+        with self._load_lock:
+            if self._server is None or not self._server.is_alive():
+                self._server = threading.Thread(target=self._serve, name="summarizer", daemon=True)
+                self._server.start()
+
+    def _submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    # ----- map-reduce over long texts -----
+
+    def _chunks(self, text):
+        """Pack whole sentences into chunks of at most max_input_tokens"""
+        sentences = [s for s in _SENTENCE_END.split(text.strip()) if s]
+        with self._tokenizer_lock:
+            encoded = self._tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        lengths = [len(ids) for ids in encoded]
+        budget = self.max_input_tokens - 2  # bos/eos
+
+        chunks, current, size = [], [], 0
+        for sentence, length in zip(sentences, lengths):
+            if current and size + length > budget:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+            # A single overlong sentence is truncated by the tokenizer
+            current.append(sentence)
+            size += length
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    def summarize(self, text):
+        """Summarize text of any length; raises SummarizerUnavailable if the model can't load"""
+        self._load()
+        self._start_server()
+        chunks = self._chunks(text)
+        while True:
+            futures = [self._submit(chunk) for chunk in chunks]
+            partials = [future.result(timeout=self.timeout) for future in futures]
+            if len(partials) == 1:
+                return partials[0]
+            merged = self._chunks(" ".join(partials))
+            if len(merged) >= len(chunks):
+                # Partial summaries no longer shrink; stop reducing
+                return " ".join(partials)
+            chunks = merged
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "error": self._load_error,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait
+        }
@@ -0,0 +1,124 @@
+"""
+Tests run against a throwaway database: the environment below is read by
+main.py's app.config.from_prefixed_env() when it is first imported.
+
+    cd backend && pip install -r requirements-dev.txt && python -m pytest -q
+"""
+import contextvars
+import math
+import os
+import shutil
+import sys
+import tempfile
+
+from fastapi.testclient import TestClient
+from flask import has_app_context
+import pytest
+from sqlalchemy import delete, text
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTANCE = tempfile.mkdtemp(prefix="business-manager-tests-")
+
+os.environ.update({
+    "FLASK_SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(INSTANCE, 'test.db')}",
+    "FLASK_COLUMNAR_DIR": os.path.join(INSTANCE, "columnar"),
+    "FLASK_REPORT_CACHE_DIR": os.path.join(INSTANCE, "reports"),
+    "FLASK_JOB_UPLOAD_DIR": os.path.join(INSTANCE, "uploads"),
+    "FLASK_PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+    "FLASK_SUMMARIZER_MODE": "extractive",
+    "FLASK_RATE_LIMIT_PER_USER": "null",
+    "FLASK_LOG_LEVEL": "WARNING",
+})
+sys.path.insert(0, BACKEND)
+
+import main  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    main.init_database()
+    yield
+    main.job_scheduler.shutdown()
+    shutil.rmtree(INSTANCE, ignore_errors=True)
+
+
+@pytest.fixture
+def app_context():
+    with main.app.app_context():
+        yield
+
+
+class ASGIClient(TestClient):
+    """
+    Sends each request as a separate caller would: the test's writer
+    session (see app_context) committed, so the single writer connection is
+    free, and from an empty context, as the portal would otherwise carry
+    the test's app context into the Flask routes
+    """
+    def request(self, *args, **kwargs):
+        if has_app_context():
+            main.db.session.commit()
+        return contextvars.Context().run(super().request, *args, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def asgi_client(database):
+    """One client (and event loop) for the session: the async engine's connections belong to the loop"""
+    import asgi
+
+    with ASGIClient(asgi.app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(asgi_client):
+    return asgi_client
+
+
+@pytest.fixture(scope="session")
+def token(asgi_client):
+    response = asgi_client.post("/login", json={"username": "admin", "password": "123"})
+    return response.json()["token"]
+
+
+@pytest.fixture
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def empty_sales(app_context):
+    """Start from no sales rows and empty aggregates"""
+    main.db.session.execute(delete(main.SalesData))
+    main.rebuild_aggregates()
+
+
+def add_sales(client, auth, rows):
+    """POST /bulk-add-sales [{"product", "sales", "month", "category"}, ...]"""
+    response = client.post("/bulk-add-sales", json={"sales": rows}, headers=auth)
+    assert response.status_code in (200, 201), response.json()
+    return response.json()
+
+
+def aggregate_tables():
+    """Every maintained aggregate as {table: {key: values}}"""
+    tables = {}
+    for table, key_length in (("product_stats", 1), ("monthly_sales", 3), ("product_pair", 2), ("sales_rollup", 4)):
+        columns = "product_id, count, total, total_sq, min_sales, max_sales" if table == "product_stats" else "*"
+        rows = main.db.session.execute(text(f"SELECT {columns} FROM {table}")).all()
+        tables[table] = {row[:key_length]: row[key_length:] for row in rows}
+    return tables
+
+
+def assert_aggregates_match_rebuild():
+    """The maintained aggregates equal what rebuild_aggregates() computes from SalesData"""
+    maintained = aggregate_tables()
+    main.rebuild_aggregates()
+    rebuilt = aggregate_tables()
+    for table in rebuilt:
+        assert maintained[table].keys() == rebuilt[table].keys(), table
+        for key, values in rebuilt[table].items():
+            assert all(
+                a == b or (isinstance(a, float) and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6))
+                for a, b in zip(maintained[table][key], values)
+            ), (table, key, maintained[table][key], values)
@@ -0,0 +1,91 @@
+import asyncio
+
+import admission
+
+
+def test_token_bucket_spends_its_burst_then_refills():
+    bucket = admission.TokenBucket(rate=2, burst=3, now=0)
+    assert [bucket.take(0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(0) == 0.5
+    assert bucket.take(0.5) == 0
+
+
+def test_route_limit_queues_in_order_and_turns_away_the_rest():
+    async def scenario():
+        limit = admission.RouteLimit(concurrency=1, queue=1, timeout=5)
+        assert await limit.acquire()
+        waiting = asyncio.ensure_future(limit.acquire())
+        await asyncio.sleep(0)
+        assert limit.queued == 1
+        assert not await limit.acquire()  # queue full
+
+        limit.release()  # handed to the waiting request
+        assert await waiting
+        assert (limit.active, limit.queued) == (1, 0)
+        limit.release()
+        return limit.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert (stats["admitted"], stats["rejected"], stats["timeouts"]) == (2, 1, 0)
+
+
+def test_route_limit_times_out_queued_requests():
+    async def scenario():
+        limit = admission.RouteLimit(concurrency=1, queue=1, timeout=0.01)
+        assert await limit.acquire()
+        assert not await limit.acquire()
+        return limit
+
+    limit = asyncio.run(scenario())
+    assert (limit.timeouts, limit.queued, limit.active) == (1, 0, 1)
+
+
+def call(middleware, path, user=None):
+    """(status, headers) of one request through middleware"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": [], "client": ("10.0.0.1", 1), "user": user}
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]["status"], dict(messages[0]["headers"])
+
+
+def test_middleware_rate_limits_callers_and_sheds_busy_routes():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    control = admission.AdmissionControl(
+        {"/slow": (1, 0)}, queue_timeout=1, retry_after=2, user_rate=(1, 2), anonymous_rate=None,
+        identify=lambda scope: scope["user"]
+    )
+    middleware = admission.ASGIMiddleware(app, control)
+
+    assert call(middleware, "/", "alice")[0] == 200
+    assert call(middleware, "/", "alice")[0] == 200
+    status, headers = call(middleware, "/", "alice")
+    assert status == 429
+    assert headers[b"retry-after"] == b"1"
+    # Other users, and anonymous callers without a limit, are unaffected
+    assert call(middleware, "/", "bob")[0] == 200
+    assert call(middleware, "/")[0] == 200
+
+    control.routes["/slow"].active = 1  # a request holding the route's only slot
+    status, headers = call(middleware, "/slow")
+    assert status == 503
+    assert headers[b"retry-after"] == b"2"
+    assert control.stats()["routes"]["/slow"]["rejected"] == 1
+    assert control.stats()["users"]["limited"] == 1
+
+
+def test_admission_stats_are_exposed(client, auth):
+    stats = client.get("/cache-stats", headers=auth).json()["admission"]
+    assert set(stats["routes"]) >= {"/summarize", "/get-all-sales"}
+    assert stats["routes"]["/get-all-sales"]["active"] == 0
+    assert "admission_queued_requests" in client.get("/metrics").text
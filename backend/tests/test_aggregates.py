@@ -0,0 +1,102 @@
+import datetime
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+import main
+from conftest import add_sales, assert_aggregates_match_rebuild
+
+
+def sale_ids(product):
+    return main.db.session.execute(
+        select(main.SalesData.id).join(main.Product).where(main.Product.name == product).order_by(main.SalesData.id)
+    ).scalars().all()
+
+
+def add_unrecorded_sale(product, sales, period):
+    """A SalesData row the aggregates don't know about, so a rebuild changes them"""
+    product_id = main.dimension_ids(main.Product, [product])[product]
+    category_id = main.dimension_ids(main.Category, ["Electronics"])["Electronics"]
+    main.db.session.add(main.SalesData(
+        product_id=product_id, category_id=category_id, sales=sales,
+        sale_date=datetime.date(period // 100, period % 100, 1), period=period
+    ))
+    main.db.session.commit()
+
+
+def test_aggregates_match_rebuild_after_mixed_writes(client, auth, empty_sales):
+    add_sales(client, auth, [
+        {"product": "Laptop", "sales": 120, "month": "Jan", "category": "Electronics"},
+        {"product": "Laptop", "sales": 180, "month": "Feb", "category": "Electronics"},
+        {"product": "Mouse", "sales": 25, "month": "Jan", "category": "Accessories"},
+        {"product": "Mouse", "sales": 30, "month": "Jan", "category": "Accessories"},
+        {"product": "Keyboard", "sales": 45, "month": "Jan", "category": "Accessories"},
+        {"product": "Monitor", "sales": 200, "month": "Mar", "category": "Electronics"},
+    ])
+    response = client.post("/add-sales", headers=auth, json={"product": "Cable", "sales": 5, "month": "Feb"})
+    assert response.status_code == 201
+
+    mouse, other_mouse = sale_ids("Mouse")
+    laptop = sale_ids("Laptop")[0]
+    # Move a row to another product, month and category; drop an extreme value
+    assert client.put(f"/update-sales/{mouse}", headers=auth, json={
+        "product": "Laptop", "month": "Mar", "category": "Electronics", "sales": 75
+    }).status_code == 200
+    assert client.put(f"/update-sales/{other_mouse}", headers=auth, json={"sales": 31}).status_code == 200
+    assert client.delete(f"/delete-sales/{laptop}", headers=auth).status_code == 200
+    assert client.delete(f"/delete-sales/{sale_ids('Keyboard')[0]}", headers=auth).status_code == 200
+
+    assert_aggregates_match_rebuild()
+
+
+def test_rebuild_aggregates_is_one_transaction(client, auth, empty_sales, monkeypatch):
+    add_sales(client, auth, [
+        {"product": "Laptop", "sales": 120, "month": "Jan", "category": "Electronics"},
+        {"product": "Mouse", "sales": 25, "month": "Jan", "category": "Accessories"},
+    ])
+    add_unrecorded_sale("Tablet", 300, 202401)
+    version = main.current_data_version()
+
+    def fail():
+        raise RuntimeError("rollup rebuild failed")
+
+    monkeypatch.setattr(main, "rebuild_sales_rollup", fail)
+    with pytest.raises(RuntimeError):
+        main.rebuild_aggregates()
+
+    # Nothing of the failed rebuild is visible, the version included
+    assert main.db.session.execute(select(func.count()).select_from(main.ProductStats)).scalar() == 2
+    assert main.current_data_version() == version
+
+
+def test_readers_never_see_half_rebuilt_tables(client, auth, empty_sales, monkeypatch):
+    add_sales(client, auth, [
+        {"product": "Laptop", "sales": 120, "month": "Jan", "category": "Electronics"},
+        {"product": "Mouse", "sales": 25, "month": "Feb", "category": "Accessories"},
+    ])
+    add_unrecorded_sale("Tablet", 300, 202401)
+
+    seen = []
+    rebuild_sales_rollup = main.rebuild_sales_rollup
+
+    def observed():
+        # Mid-rebuild, on another connection: the committed tables are intact
+        def read():
+            with main.app.app_context():
+                seen.append((
+                    main.read_session.execute(select(func.count()).select_from(main.ProductStats)).scalar(),
+                    main.read_session.execute(select(func.count()).select_from(main.MonthlySales)).scalar(),
+                ))
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join()
+        return rebuild_sales_rollup()
+
+    monkeypatch.setattr(main, "rebuild_sales_rollup", observed)
+    version = main.current_data_version()
+    main.rebuild_aggregates()
+
+    assert seen == [(2, 2)]
+    assert main.current_data_version() == version + 1
+    assert main.db.session.execute(select(func.count()).select_from(main.ProductStats)).scalar() == 3
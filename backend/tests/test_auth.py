@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+import main
+from passwords import HashPoolFull, PasswordHasher
+
+
+def test_register_then_log_in(client):
+    user = {"username": "carol", "email": "carol@example.com", "password": "s3cret"}
+    assert client.post("/register", json=user).status_code == 201
+    assert client.post("/register", json=user).status_code == 409
+    assert client.post("/register", json={"username": "dave"}).status_code == 400
+
+    response = client.post("/login", json={"username": "carol", "password": "s3cret"})
+    assert response.status_code == 200
+    assert response.json()["user"]["email"] == "carol@example.com"
+    token = response.json()["token"]
+    assert client.get("/jobs", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    assert client.post("/login", json={"username": "carol", "password": "wrong"}).status_code == 401
+    assert client.post("/login", json={"username": "nobody", "password": "x"}).status_code == 401
+    assert client.post("/login", json={"username": "carol"}).status_code == 400
+
+
+def test_full_hash_pool_answers_503(client, monkeypatch):
+    def full(*args):
+        raise HashPoolFull("busy")
+
+    monkeypatch.setattr(main.password_hasher, "verify", full)
+    response = client.post("/login", json={"username": "admin", "password": "not-cached"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_hasher_refuses_work_beyond_its_queue():
+    started, release = threading.Event(), threading.Event()
+
+    def slow(*args):
+        started.set()
+        release.wait(5)
+        return True
+
+    hasher = PasswordHasher("pbkdf2:sha256:1000", workers=1, max_pending=1)
+    waiting = threading.Thread(target=hasher._run, args=(slow,))
+    waiting.start()
+    started.wait(5)
+    with pytest.raises(HashPoolFull):
+        hasher.verify("hash", "password")
+    release.set()
+    waiting.join()
+    assert (hasher.stats()["rejected"], hasher.stats()["completed"]) == (1, 1)
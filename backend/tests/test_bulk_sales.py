@@ -0,0 +1,111 @@
+import json
+
+import main
+from conftest import add_sales, assert_aggregates_match_rebuild
+
+SALES = [
+    {"product": "Cable, USB-C", "sales": 12, "month": "2024-01", "category": "Accessories"},
+    {"product": "Cable", "sales": 8, "month": "2024-01", "category": "Accessories"},
+    {"product": "USB-C", "sales": 9, "month": "2024-02", "category": "Accessories"},
+    {"product": "Laptop", "sales": 900, "month": "2024-02", "category": "Electronics"},
+    {"product": "Laptop", "sales": 950, "month": "2024-03", "category": "Electronics"},
+]
+
+
+def products(client, auth):
+    rows = client.get("/get-all-sales?limit=100", headers=auth).json()["data"]
+    return sorted((row["product"], row["sales"], row["period"]) for row in rows)
+
+
+def test_bulk_update_by_filter(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+    response = client.post("/bulk-update-sales", headers=auth, json={
+        "filter": {"product": "Laptop", "from": "2024-03"},
+        "set": {"sales": 1000, "month": "Apr", "category": "Computers"}
+    })
+    assert response.json() == {"status": "success", "dry_run": False, "matched": 1, "updated": 1}
+    assert ("Laptop", 1000.0, "2024-04") in products(client, auth)
+    assert_aggregates_match_rebuild()
+
+
+def test_bulk_update_by_ids_and_dry_run(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+    ids = [row["id"] for row in client.get("/get-all-sales?limit=100", headers=auth).json()["data"]
+           if row["product"] != "Laptop"]
+
+    dry = client.post("/bulk-update-sales", headers=auth, json={"ids": ids, "set": {"product": "Adapter"}, "dry_run": True})
+    assert dry.json()["matched"] == 3
+    assert "Adapter" not in {product for product, _, _ in products(client, auth)}
+
+    response = client.post("/bulk-update-sales", headers=auth, json={"ids": ids, "set": {"product": "Adapter"}})
+    assert response.json()["updated"] == 3
+    assert [p for p, _, _ in products(client, auth)].count("Adapter") == 3
+    assert_aggregates_match_rebuild()
+
+
+def test_list_filters_keep_names_with_commas(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+    response = client.post("/bulk-delete-sales", headers=auth, json={
+        "filter": {"product": ["Cable, USB-C"]}, "dry_run": True
+    })
+    assert response.json()["matched"] == 1
+
+    # A string is still a comma separated list, as in the analytics query args
+    response = client.post("/bulk-delete-sales", headers=auth, json={
+        "filter": {"product": "Cable,USB-C"}, "dry_run": True
+    })
+    assert response.json()["matched"] == 2
+
+    response = client.post("/bulk-delete-sales", headers=auth, json={"filter": {"product": ["Cable, USB-C", "Laptop"]}})
+    assert response.json() == {"status": "success", "dry_run": False, "deleted": 3}
+    assert [p for p, _, _ in products(client, auth)] == ["Cable", "USB-C"]
+    assert_aggregates_match_rebuild()
+
+
+def test_bulk_delete_across_chunks(client, auth, empty_sales, monkeypatch):
+    monkeypatch.setattr(main, "SALES_BATCH_CHUNK", 2)
+    add_sales(client, auth, SALES)
+    response = client.post("/bulk-delete-sales", headers=auth, json={"filter": {"category": "Accessories"}})
+    assert response.json()["deleted"] == 3
+    assert [p for p, _, _ in products(client, auth)] == ["Laptop", "Laptop"]
+    assert_aggregates_match_rebuild()
+
+
+def test_bulk_validation(client, auth):
+    post = client.post
+    assert post("/bulk-delete-sales", json={"ids": [1]}).status_code == 401
+    assert post("/bulk-delete-sales", headers=auth, json={}).status_code == 400
+    assert post("/bulk-delete-sales", headers=auth, json={"ids": [1], "filter": {"product": "x"}}).status_code == 400
+    assert post("/bulk-delete-sales", headers=auth, json={"filter": {}}).status_code == 400
+    assert post("/bulk-delete-sales", headers=auth, json={"filter": {"shop": "x"}}).status_code == 400
+    assert post("/bulk-delete-sales", headers=auth, json={"filter": {"from": ["2024"]}}).status_code == 400
+    assert post("/bulk-update-sales", headers=auth, json={"ids": [1], "set": {}}).status_code == 400
+    assert post("/bulk-update-sales", headers=auth, json={"ids": [1], "set": {"sales": "many"}}).status_code == 400
+
+
+def test_get_all_sales_streams_every_format(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+    page = client.get("/get-all-sales?limit=2", headers=auth).json()
+    assert len(page["data"]) == 2
+
+    full = client.get("/get-all-sales", headers=auth).json()["data"]
+    assert [row["id"] for row in full[:2]] == [row["id"] for row in page["data"]]
+    rest = client.get(f"/get-all-sales?format=ndjson&cursor={page['next_cursor']}", headers=auth)
+    assert rest.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in rest.text.splitlines()] == full[2:]
+
+    lines = client.get("/get-all-sales?format=csv", headers=auth).text.splitlines()
+    assert lines[0] == ",".join(main.SALES_COLUMNS)
+    assert len(lines) == len(SALES) + 1
+
+
+def test_single_writes_reject_non_finite_sales(client, auth, empty_sales):
+    for value in ("nan", "inf", "-Infinity"):
+        response = client.post("/add-sales", headers=auth, json={"product": "Laptop", "sales": value, "date": "2024-01-15"})
+        assert response.status_code == 400, value
+        assert response.json()["message"] == "Invalid sales value"
+
+    add_sales(client, auth, SALES[:1])
+    sale_id = client.get("/get-all-sales?limit=1", headers=auth).json()["data"][0]["id"]
+    assert client.put(f"/update-sales/{sale_id}", headers=auth, json={"sales": "nan"}).status_code == 400
+    assert_aggregates_match_rebuild()
@@ -0,0 +1,32 @@
+from sqlalchemy import delete
+
+import main
+from conftest import add_sales
+
+SALE = {"product": "Laptop", "sales": 120, "month": "Jan", "category": "Electronics"}
+
+
+def test_bump_recreates_missing_version_row(client, auth, app_context):
+    main.db.session.execute(delete(main.DataVersion))
+    main.db.session.commit()
+    assert main.current_data_version() == 0
+
+    add_sales(client, auth, [SALE])
+    assert main.current_data_version() == 1
+    add_sales(client, auth, [SALE])
+    assert main.current_data_version() == 2
+
+
+def test_etag_revalidation_follows_data_version(client, auth, app_context):
+    first = client.get("/analytics/rollup?grain=month")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    repeat = client.get("/analytics/rollup?grain=month", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.headers["ETag"] == etag
+
+    add_sales(client, auth, [SALE])
+    changed = client.get("/analytics/rollup?grain=month", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
@@ -0,0 +1,47 @@
+import io
+
+from sqlalchemy import text
+
+import main
+import upload_sales_data
+from conftest import assert_aggregates_match_rebuild
+
+CSV = """product,sales,date,category
+Laptop,120,2024-01-05,Electronics
+
+Mouse,25,2024-01-05
+Laptop,abc,2024-01-06,Electronics
+Monitor,200,2024-02-30,Electronics
+Laptop,180,2024-02-10,Electronics
+Mouse,30,2024-02-10,Accessories
+Keyboard,45,,Accessories
+Monitor,210,2024-03-01,Electronics
+"""
+
+
+def test_ingest_in_small_batches(app_context, empty_sales):
+    batches = upload_sales_data.read_batches(io.StringIO(CSV), "csv", batch_size=3)
+    result = main.ingest_sales(batches)
+
+    assert result["inserted"] == 5
+    assert result["rejected"] == 3
+    # Rows count from the first line after the header; the blank line is skipped but numbered
+    assert result["errors"] == [
+        {"row": 4, "error": "Invalid sales value"},
+        {"row": 5, "error": "Invalid date"},
+        {"row": 8, "error": "Missing field: date or month"},
+    ]
+    categories = main.db.session.execute(text(
+        "SELECT category.name FROM sales_data JOIN category ON category.id = sales_data.category_id "
+        "JOIN product ON product.id = sales_data.product_id WHERE product.name = 'Mouse' ORDER BY sales_data.id"
+    )).scalars().all()
+    assert categories == ["Uncategorized", "Accessories"]
+    assert_aggregates_match_rebuild()
+
+
+def test_migration_restores_missing_sales_indexes(app_context):
+    with main.db.engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_sales_data_period_product")
+
+    assert main.migrate_sales_indexes() == ["ix_sales_data_period_product"]
+    assert main.migrate_sales_indexes() is None
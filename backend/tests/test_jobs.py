@@ -0,0 +1,176 @@
+import datetime
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import jobs
+import main
+
+
+def crash(job_id):
+    os._exit(1)
+
+
+def crash_first(job_id):
+    if job_id == "first":
+        os._exit(1)
+    return job_id
+
+
+def wait_for_job(client, auth, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}", headers=auth).json()["job"]
+        if job["status"] not in main.JOB_ACTIVE:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"Job {job_id} still {job['status']}")
+
+
+class Recorder:
+    def __init__(self, expected):
+        self.crashed = {}
+        self.done = threading.Event()
+        self.expected = expected
+
+    def __call__(self, job_id, error):
+        self.crashed[job_id] = error
+        if len(self.crashed) == self.expected:
+            self.done.set()
+
+
+def test_scheduler_replaces_a_broken_pool():
+    recorder = Recorder(expected=1)
+    scheduler = jobs.JobScheduler(crash_first, recorder, workers=1, limits={"t": 1})
+    try:
+        scheduler.submit("first", "t")
+        scheduler.submit("second", "t")  # waits behind the crashing job
+        assert recorder.done.wait(60)
+        assert isinstance(recorder.crashed["first"], BrokenProcessPool)
+
+        deadline = time.monotonic() + 60
+        while scheduler.stats()["completed"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stats = scheduler.stats()
+        assert stats["completed"] == 2
+        assert stats["crashed"] == 1
+        assert stats["running"] == {} and stats["waiting"] == {}
+        assert stats["pools_replaced"] == 1
+        assert "second" not in recorder.crashed
+
+        # Later jobs run on the new pool
+        scheduler.submit("third", "t")
+        deadline = time.monotonic() + 60
+        while scheduler.stats()["completed"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert scheduler.stats()["crashed"] == 1
+    finally:
+        scheduler.shutdown()
+
+
+class BrokenExecutor:
+    def submit(self, *args):
+        raise BrokenProcessPool("gone")
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def test_submit_without_workers_fails_job_with_json_error(client, auth, monkeypatch):
+    monkeypatch.setattr(main.job_scheduler, "_pool", lambda: BrokenExecutor())
+    response = client.post("/jobs", json={"type": "rebuild-aggregates"}, headers=auth)
+    assert response.status_code == 503
+    assert response.json()["status"] == "error"
+    assert "Retry-After" in response.headers
+    assert main.job_scheduler.stats()["running"] == {}
+
+    latest = client.get("/jobs", headers=auth).json()["data"][0]
+    assert latest["type"] == "rebuild-aggregates"
+    assert latest["status"] == "failed"
+
+
+def test_job_lifecycle(client, auth):
+    response = client.post("/jobs", json={"type": "rebuild-aggregates"}, headers=auth)
+    assert response.status_code == 202
+    job_id = response.json()["job"]["id"]
+    assert response.headers["Location"] == f"/jobs/{job_id}"
+
+    job = wait_for_job(client, auth, job_id)
+    assert job["status"] == "succeeded"
+    assert job["started_at"] and job["finished_at"]
+    result = client.get(f"/jobs/{job_id}/result", headers=auth)
+    assert result.status_code == 200
+    assert set(result.json()["result"]) == {"products", "monthly_cells", "product_pairs", "rollup_cells"}
+
+    assert client.delete(f"/jobs/{job_id}", headers=auth).status_code == 409
+    assert client.get("/jobs/unknown", headers=auth).status_code == 404
+
+
+def test_crashed_job_fails_and_frees_its_slot(client, auth, monkeypatch):
+    monkeypatch.setattr(main.job_scheduler, "run", crash)
+    response = client.post("/jobs", json={"type": "rebuild-aggregates"}, headers=auth)
+    assert response.status_code == 202
+    crashed_id = response.json()["job"]["id"]
+
+    job = wait_for_job(client, auth, crashed_id)
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Job worker crashed")
+
+    monkeypatch.setattr(main.job_scheduler, "run", main._run_job)
+    # Not deduplicated onto the dead job, and not stuck behind a leaked slot
+    response = client.post("/jobs", json={"type": "rebuild-aggregates"}, headers=auth)
+    assert response.status_code == 202
+    job_id = response.json()["job"]["id"]
+    assert job_id != crashed_id
+    assert wait_for_job(client, auth, job_id)["status"] == "succeeded"
+
+
+@pytest.fixture(autouse=True)
+def idle_scheduler():
+    yield
+    deadline = time.monotonic() + 30
+    while main.job_scheduler.stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def test_scheduler_heartbeat_reports_its_jobs():
+    beats = []
+    beat = threading.Event()
+
+    def on_heartbeat(job_ids):
+        beats.append(job_ids)
+        beat.set()
+
+    scheduler = jobs.JobScheduler(crash, None, limits={"t": 0}, on_heartbeat=on_heartbeat, heartbeat=0.01)
+    try:
+        scheduler.submit("waiting", "t")  # the limit keeps it waiting
+        assert beat.wait(5)
+        assert beats[0] == ["waiting"]
+    finally:
+        scheduler.shutdown()
+
+
+def test_dedupe_skips_and_reaps_orphaned_jobs(client, auth, app_context, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(main.job_scheduler, "submit", lambda job_id, job_type: submitted.append(job_id))
+    user_id = main.User.query.filter_by(username="admin").first().id
+    stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=main.app.config['JOB_LEASE'] + 1)
+    main.db.session.add(main.Job(
+        id="orphan", type="rebuild-aggregates", user_id=user_id, params="{}", status="running", heartbeat_at=stale
+    ))
+    main.db.session.commit()
+
+    response = client.post("/jobs", json={"type": "rebuild-aggregates"}, headers=auth)
+    assert response.status_code == 202
+    job_id = response.json()["job"]["id"]
+    assert job_id != "orphan" and submitted == [job_id]
+    orphan = client.get("/jobs/orphan", headers=auth).json()["job"]
+    assert orphan["status"] == "failed"
+    assert orphan["error"].startswith("Orphaned")
+
+    # A live job is still deduplicated onto
+    assert client.post("/jobs", json={"type": "rebuild-aggregates"}, headers=auth).json()["job"]["id"] == job_id
+    main._finish_job(job_id, "cancelled")
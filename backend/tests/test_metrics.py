@@ -0,0 +1,29 @@
+import logging
+import threading
+
+from sqlalchemy import create_engine, text
+
+import metrics
+
+
+def test_slow_queries_are_counted_across_threads():
+    recorder = metrics.Metrics()
+    engines = [create_engine("sqlite://") for _ in range(4)]
+    for other in engines:
+        metrics.instrument_engine(other, "test", recorder, 0, logging.getLogger("test.slow"))
+
+    def run(engine):
+        # Every statement is "slow" at a threshold of 0
+        with engine.connect() as conn:
+            for _ in range(200):
+                conn.execute(text("SELECT 1"))
+
+    threads = [threading.Thread(target=run, args=(other,)) for other in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert recorder.slow_queries == 800
+    assert recorder.summary()["queries"]["test"]["count"] == 800
+    assert "db_slow_queries_total 800" in recorder.render_prometheus()
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from conftest import add_sales
+import main
+import recommender
+
+
+def test_neighbor_index_cache_serves_the_old_entry_while_rebuilding():
+    release = threading.Event()
+
+    def build(version):
+        release.wait(5)
+        return f"index {version}"
+
+    cache = recommender.NeighborIndexCache(build)
+    assert cache.get(1) is None
+    assert cache.put(1, "index 1") == "index 1"
+
+    assert cache.get(2) == "index 1"  # starts the rebuild
+    assert cache.get(3) == "index 1"  # one rebuild at a time
+    release.set()
+    deadline = time.monotonic() + 5
+    while cache.get(2) != "index 2" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.version == 2
+    assert cache.put(1, "index 1") == "index 2"  # an older build never replaces a newer one
+
+
+def test_item_recommendations_follow_new_sales(client, auth, empty_sales):
+    add_sales(client, auth, [
+        {"product": "Laptop", "sales": 900, "date": "2024-01-10", "category": "Electronics"},
+        {"product": "Mouse", "sales": 20, "date": "2024-01-12", "category": "Electronics"},
+    ])
+    response = client.get("/recommendation/Laptop")
+    assert [r["product"] for r in response.json()["recommendations"]] == ["Mouse"]
+
+    add_sales(client, auth, [{"product": "Dock", "sales": 150, "date": "2024-01-20", "category": "Electronics"}])
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        products = {r["product"] for r in client.get("/recommendation/Laptop").json()["recommendations"]}
+        if products == {"Mouse", "Dock"}:
+            break
+        time.sleep(0.01)
+    assert products == {"Mouse", "Dock"}
+    assert main.neighbor_index_cache.stats()["builds"] >= 2
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from conftest import add_sales
+import main
+import reports
+
+pytestmark = pytest.mark.skipif(not reports.available(), reason="reportlab not installed")
+
+
+def test_tables_stop_at_max_rows():
+    flowables = list(reports.table(["n"], ([i] for i in range(100)), max_rows=50))
+    assert [len(f._cellvalues) - 1 for f in flowables[:-1]] == [40, 10]
+    assert "first 50 rows" in flowables[-1].text
+    assert len(list(reports.table(["n"], ([i] for i in range(50)), max_rows=50))) == 2
+
+
+def test_sales_report_renders_capped(client, auth, empty_sales, monkeypatch):
+    add_sales(client, auth, [{"product": f"Item {i}", "sales": i, "date": "2024-03-01"} for i in range(8)])
+    monkeypatch.setitem(main.app.config, "REPORT_MAX_ROWS", 5)
+    path = main.render_report("sales", main.Principal(1, "admin", "admin@example.com"))
+    assert os.path.getsize(path) > 0
@@ -0,0 +1,57 @@
+from conftest import add_sales, assert_aggregates_match_rebuild
+
+SALES = [
+    {"product": "Laptop", "sales": 100, "date": "2024-12-30", "category": "Electronics"},
+    {"product": "Laptop", "sales": 300, "date": "2025-01-02", "category": "Electronics"},
+    {"product": "Monitor", "sales": 50, "date": "2025-01-02", "category": "Electronics"},
+    {"product": "Mouse", "sales": 20, "date": "2025-01-06", "category": "Accessories"},
+]
+
+
+def rollup(client, query):
+    response = client.get(f"/analytics/rollup?{query}")
+    assert response.status_code == 200, response.json()
+    return [
+        tuple(cell[key] for key in ("period", "product", "category", "count", "total") if key in cell)
+        for cell in response.json()["data"]
+    ]
+
+
+def test_day_and_week_grains(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+
+    assert rollup(client, "grain=day") == [
+        ("2024-12-30", 1, 100), ("2025-01-02", 2, 350), ("2025-01-06", 1, 20)
+    ]
+    # 2024-12-30 falls in ISO week 1 of 2025
+    assert rollup(client, "grain=week&group_by=category") == [
+        ("2025-W01", "Electronics", 3, 450), ("2025-W02", "Accessories", 1, 20)
+    ]
+    assert rollup(client, "grain=day&from=2025-01-01&to=2025-01-05&category=Electronics") == [
+        ("2025-01-02", 2, 350)
+    ]
+
+
+def test_product_day_buckets_come_from_the_snapshot(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+
+    assert rollup(client, "grain=day&group_by=product") == [
+        ("2024-12-30", "Laptop", 1, 100), ("2025-01-02", "Laptop", 1, 300),
+        ("2025-01-02", "Monitor", 1, 50), ("2025-01-06", "Mouse", 1, 20)
+    ]
+    assert rollup(client, "grain=week&product=Laptop,Mouse&from=2025-01") == [
+        ("2025-W01", 1, 300), ("2025-W02", 1, 20)
+    ]
+
+
+def test_day_grains_follow_updates_and_deletes(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+    ids = {row["date"]: row["id"] for row in client.get("/get-all-sales?limit=100", headers=auth).json()["data"]}
+
+    client.put(f"/update-sales/{ids['2025-01-06']}", headers=auth, json={"date": "2025-01-03"})
+    client.delete(f"/delete-sales/{ids['2024-12-30']}", headers=auth)
+    assert rollup(client, "grain=day") == [("2025-01-02", 2, 350), ("2025-01-03", 1, 20)]
+    assert rollup(client, "grain=week&group_by=product") == [
+        ("2025-W01", "Laptop", 1, 300), ("2025-W01", "Monitor", 1, 50), ("2025-W01", "Mouse", 1, 20)
+    ]
+    assert_aggregates_match_rebuild()
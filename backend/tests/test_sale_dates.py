@@ -0,0 +1,75 @@
+from sqlalchemy import text
+
+import main
+from conftest import add_sales, assert_aggregates_match_rebuild
+
+
+def dates(client, auth):
+    rows = client.get("/get-all-sales?limit=100", headers=auth).json()["data"]
+    return {row["product"]: (row["date"], row["month"], row["period"]) for row in rows}
+
+
+def test_sales_keep_their_date(client, auth, empty_sales):
+    add_sales(client, auth, [
+        {"product": "Laptop", "sales": 120, "date": "2024-02-29", "category": "Electronics"},
+        {"product": "Mouse", "sales": 25, "month": "2024-03", "category": "Accessories"},
+    ])
+    response = client.post("/add-sales", headers=auth, json={"product": "Cable", "sales": 5, "date": "2024-01-15"})
+    assert response.status_code == 201
+    assert response.json()["data"]["date"] == "2024-01-15"
+
+    assert dates(client, auth) == {
+        "Laptop": ("2024-02-29", "Feb", "2024-02"),
+        "Mouse": ("2024-03-01", "Mar", "2024-03"),
+        "Cable": ("2024-01-15", "Jan", "2024-01"),
+    }
+    assert_aggregates_match_rebuild()
+
+
+def test_invalid_or_missing_date_is_rejected(client, auth):
+    bad = client.post("/add-sales", headers=auth, json={"product": "Cable", "sales": 5, "date": "2024-02-30"})
+    assert bad.status_code == 400
+    missing = client.post("/add-sales", headers=auth, json={"product": "Cable", "sales": 5})
+    assert missing.json()["message"] == "Missing field: date or month"
+
+    response = client.post("/bulk-add-sales", headers=auth, json={"sales": [{"product": "Cable", "sales": 5}]})
+    assert response.status_code == 400
+    assert response.json()["errors"] == [{"row": 1, "error": "Missing field: date or month"}]
+
+
+def test_month_change_keeps_the_day_where_it_can(client, auth, empty_sales):
+    add_sales(client, auth, [
+        {"product": "Laptop", "sales": 120, "date": "2023-01-31", "category": "Electronics"},
+        {"product": "Mouse", "sales": 25, "date": "2024-01-31", "category": "Accessories"},
+        {"product": "Cable", "sales": 5, "date": "2024-01-10", "category": "Accessories"},
+    ])
+    ids = {row["product"]: row["id"] for row in client.get("/get-all-sales?limit=100", headers=auth).json()["data"]}
+
+    response = client.put(f"/update-sales/{ids['Laptop']}", headers=auth, json={"month": "Feb"})
+    assert response.json()["data"]["date"] == "2023-02-28"
+
+    # Bulk: each row keeps its own year and day, clamped to the month's length
+    response = client.post("/bulk-update-sales", headers=auth, json={
+        "ids": [ids["Mouse"], ids["Cable"]], "set": {"month": "Feb"}
+    })
+    assert response.json()["updated"] == 2
+    assert dates(client, auth)["Mouse"] == ("2024-02-29", "Feb", "2024-02")
+    assert dates(client, auth)["Cable"] == ("2024-02-10", "Feb", "2024-02")
+
+    client.post("/bulk-update-sales", headers=auth, json={"ids": [ids["Cable"]], "set": {"month": "2025-04"}})
+    assert dates(client, auth)["Cable"] == ("2025-04-10", "Apr", "2025-04")
+    client.post("/bulk-update-sales", headers=auth, json={"ids": [ids["Cable"]], "set": {"date": "2025-06-30"}})
+    assert dates(client, auth)["Cable"] == ("2025-06-30", "Jun", "2025-06")
+
+    assert_aggregates_match_rebuild()
+
+
+def test_migration_dates_existing_sales_from_their_month(client, auth, empty_sales):
+    add_sales(client, auth, [{"product": "Laptop", "sales": 120, "date": "2024-05-20", "category": "Electronics"}])
+    main.db.session.commit()
+    with main.db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE sales_data DROP COLUMN sale_date"))
+
+    assert main.migrate_sale_dates() == 1
+    assert main.migrate_sale_dates() is None
+    assert dates(client, auth)["Laptop"] == ("2024-05-01", "May", "2024-05")
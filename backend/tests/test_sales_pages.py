@@ -0,0 +1,38 @@
+from conftest import add_sales
+
+SALES = [
+    {"product": f"Item {i}", "sales": 10 + i, "date": "2024-01-15", "category": "Accessories"}
+    for i in range(7)
+]
+
+
+def ids(rows):
+    return [row["id"] for row in rows]
+
+
+def test_keyset_pages_cover_every_row_once(client, auth, empty_sales):
+    add_sales(client, auth, SALES)
+    everything = ids(client.get("/get-all-sales", headers=auth).json()["data"])
+    assert len(everything) == len(SALES)
+
+    pages, cursor = [], None
+    while True:
+        query = f"limit=3&cursor={cursor}" if cursor else "limit=3"
+        page = client.get(f"/get-all-sales?{query}", headers=auth).json()
+        pages.append(ids(page["data"]))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        if len(pages) == 1:
+            # Newer rows land before the first page; later pages don't shift
+            add_sales(client, auth, [{"product": "Late", "sales": 1, "date": "2024-02-01"}])
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == everything
+
+
+def test_bad_page_arguments_are_rejected(client, auth):
+    assert client.get("/get-all-sales?limit=2&cursor=not-a-cursor", headers=auth).status_code == 400
+    assert client.get("/get-all-sales?limit=many", headers=auth).status_code == 400
+    assert client.get("/get-all-sales?format=xml", headers=auth).status_code == 400
+    assert client.get("/get-all-sales?limit=2").status_code == 401
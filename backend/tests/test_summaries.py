@@ -0,0 +1,122 @@
+import sys
+
+import pytest
+
+import main
+import summarizer
+from summarizer import BatchingSummarizer, SummarizerUnavailable
+
+TEXT = (
+    "The team reviewed the quarterly numbers. Sales grew in every region. "
+    "Marketing will prepare the launch plan. The next meeting is on Friday."
+)
+
+
+@pytest.fixture
+def no_transformer(monkeypatch):
+    def unavailable(text):
+        raise SummarizerUnavailable("no model in tests")
+
+    monkeypatch.setattr(main.summarizer, "summarize", unavailable)
+
+
+def test_summary_is_reused(client, auth):
+    text = TEXT + " Reuse check."
+    first = client.post("/summarize", json={"text": text, "mode": "extractive"}, headers=auth).json()
+    again = client.post("/summarize", json={"text": text, "mode": "extractive"}, headers=auth).json()
+    assert first["cached"] is False
+    assert again["cached"] is True
+    assert again["summary"] == first["summary"]
+
+
+def test_transformer_fallback_reuses_extractive_summary(client, auth, no_transformer):
+    text = TEXT + " Fallback check."
+    extractive = client.post("/summarize", json={"text": text, "mode": "extractive"}, headers=auth).json()
+    assert extractive["cached"] is False
+
+    fallback = client.post("/summarize", json={"text": text, "mode": "transformer"}, headers=auth).json()
+    assert fallback["mode"] == "extractive"
+    assert fallback["cached"] is True
+    assert fallback["summary"] == extractive["summary"]
+
+
+def test_transformer_fallback_summarizes_new_text(client, auth, no_transformer):
+    text = TEXT + " Fresh fallback."
+    fallback = client.post("/summarize", json={"text": text, "mode": "transformer"}, headers=auth).json()
+    assert fallback["mode"] == "extractive"
+    assert fallback["cached"] is False
+
+
+def test_anonymous_summary_is_not_recorded(client, auth):
+    text = TEXT + " Anonymous check."
+    anonymous = client.post("/summarize", json={"text": text, "mode": "extractive"})
+    assert anonymous.status_code == 200
+    assert anonymous.json()["id"] is None
+
+    # Same route with a token: reuses the summary and records it for the user
+    signed_in = client.post("/summarize", json={"text": text, "mode": "extractive"}, headers=auth).json()
+    assert signed_in["cached"] is True
+    assert signed_in["summary"] == anonymous.json()["summary"]
+    history = client.get("/summaries?limit=1", headers=auth).json()["data"]
+    assert history[0]["id"] == signed_in["id"]
+
+    assert client.post("/summarize", json={"text": "Too short."}).status_code == 400
+    assert client.post("/summarize", json={"text": text}, headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+def test_long_anonymous_summary_runs_as_a_job(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(main.job_scheduler, "submit", lambda job_id, job_type: submitted.append(job_id))
+    monkeypatch.setattr(main.summarizer, "summarize", lambda text: "Transformer summary.")
+    monkeypatch.setitem(main.app.config, "SUMMARY_JOB_THRESHOLD", len(TEXT))
+
+    response = client.post("/summarize", json={"text": TEXT + " Long transcript.", "mode": "transformer"})
+    assert response.status_code == 202
+    job_id = response.json()["job"]["id"]
+    assert submitted == [job_id]
+
+    main._run_job(job_id)  # as a job worker would
+    job = client.get(f"/jobs/{job_id}").json()["job"]
+    assert job["status"] == "succeeded"
+    assert job["result"]["summary"] == "Transformer summary."
+    assert job["result"]["id"] is None
+    assert client.get("/jobs/unknown").status_code == 404
+
+    monkeypatch.setitem(main.app.config, "SUMMARY_MAX_LENGTH", len(TEXT))
+    assert client.post("/summarize", json={"text": TEXT + " Too long."}).status_code == 413
+
+
+def test_failed_model_load_is_retried_later(monkeypatch):
+    monkeypatch.setitem(sys.modules, "torch", None)  # so the import fails
+    model = BatchingSummarizer("missing-model", retry_after=60)
+    with pytest.raises(SummarizerUnavailable):
+        model.summarize(TEXT)
+    assert model.failed
+    retry_at = model._retry_at
+
+    with pytest.raises(SummarizerUnavailable):
+        model.summarize(TEXT)
+    assert model._retry_at == retry_at  # not tried again yet
+
+    model._retry_at = 0  # retry_after has passed
+    assert not model.failed
+    with pytest.raises(SummarizerUnavailable):
+        model.summarize(TEXT)
+    assert model._retry_at > retry_at
+
+
+def test_load_retries_with_backoff(monkeypatch):
+    monkeypatch.setitem(sys.modules, "torch", None)
+    sleeps = []
+    monkeypatch.setattr(summarizer.time, "sleep", sleeps.append)
+    with pytest.raises(SummarizerUnavailable):
+        BatchingSummarizer("missing-model").load(attempts=3, backoff=1)
+    assert sleeps == [1, 2]
+
+
+def test_warm_caches_loads_the_model(monkeypatch):
+    loaded = []
+    monkeypatch.setitem(main.app.config, "SUMMARIZER_MODE", "transformer")
+    monkeypatch.setattr(main.summarizer, "load", lambda: loaded.append(True))
+    main.warm_caches()
+    assert loaded
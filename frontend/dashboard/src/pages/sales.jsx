@@ -13,7 +13,7 @@ function Sales() {
   const [salesData, setSalesData] = useState([]);
 
   const getSales = async () => {
-    const res = await fetch("http://127.0.0.1:8000/sales");
+    const res = await fetch("http://127.0.0.1:5000/sales");
     const data = await res.json();
     setSalesData(data.sales);
   };
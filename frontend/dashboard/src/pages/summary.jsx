@@ -4,16 +4,34 @@ function Summary() {
   const [inputText, setInputText] = useState("");
   const [result, setResult] = useState("");
 
+  // Long transcripts answer 202 with a job; poll it for the summary
+  const waitForJob = async (jobId) => {
+    for (;;) {
+      const res = await fetch(`http://127.0.0.1:5000/jobs/${jobId}`);
+      const { job } = await res.json();
+      if (job.status === "succeeded") {
+        return job.result;
+      }
+      if (job.status === "failed" || job.status === "cancelled") {
+        throw new Error(job.error || `Job ${job.status}`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   const summarize = () => {
-    fetch("http://127.0.0.1:8000/summarize", {
+    fetch("http://127.0.0.1:5000/summarize", {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
       body: JSON.stringify({ text: inputText }),
     })
-      .then((res) => res.json())
-      .then((data) => setResult(data.summary))
+      .then(async (res) => {
+        const data = await res.json();
+        return res.status === 202 ? waitForJob(data.job.id) : data;
+      })
+      .then((data) => setResult(data.summary || data.error))
       .catch(() => setResult("Backend not reachable"));
   };
 
@@ -0,0 +1,29 @@
+// Live changes to the sales analytics (GET /stream/analytics). The server
+// sends "ready" on every connect and "resync" after dropping events for a
+// slow client: both mean the page must refetch, except the very first
+// "ready", which the page's own initial fetch already covers.
+// Returns a function closing the stream.
+export function subscribeAnalytics({ refetch, ...handlers }) {
+  const source = new EventSource("http://127.0.0.1:5000/stream/analytics");
+  let connected = false;
+
+  source.addEventListener("ready", () => {
+    if (connected) {
+      refetch();
+    }
+    connected = true;
+  });
+  source.addEventListener("resync", () => refetch());
+  for (const [event, handler] of Object.entries(handlers)) {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  }
+  return () => source.close();
+}
+
+// Apply a {changed, removed} delta to rows identified by row[key]
+export function applyDelta(rows, { changed = [], removed = [] }, key) {
+  const byKey = new Map(rows.map((row) => [row[key], row]));
+  removed.forEach((k) => byKey.delete(k));
+  changed.forEach((row) => byKey.set(row[key], row));
+  return [...byKey.values()];
+}
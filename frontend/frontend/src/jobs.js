@@ -0,0 +1,17 @@
+// Heavy requests (exports, long summaries) answer 202 with a background job;
+// poll it until it finishes and resolve with the job's result.
+export async function waitForJob(jobId, token, intervalMs = 1000) {
+  for (;;) {
+    const response = await fetch(`http://127.0.0.1:5000/jobs/${jobId}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    const { job } = await response.json();
+    if (job.status === "succeeded") {
+      return job.result;
+    }
+    if (job.status === "failed" || job.status === "cancelled") {
+      throw new Error(job.error || `Job ${job.status}`);
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
@@ -12,6 +12,7 @@ import {
   AreaChart,
   Area
 } from "recharts";
+import { applyDelta, subscribeAnalytics } from "../analyticsStream";
 
 export default function Anomalies() {
   const [data, setData] = useState([]);
@@ -20,6 +21,12 @@ export default function Anomalies() {
 
   useEffect(() => {
     loadAnomalies();
+    return subscribeAnalytics({
+      refetch: loadAnomalies,
+      anomalies: (delta) => setData((rows) =>
+        applyDelta(rows, delta, "period").sort((a, b) => a.period.localeCompare(b.period))
+      )
+    });
   }, []);
 
   const loadAnomalies = async () => {
@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
+import { applyDelta, subscribeAnalytics } from "../analyticsStream";
 
 function Dashboard() {
   const [data, setData] = useState([]);
@@ -14,26 +15,36 @@ function Dashboard() {
 
   useEffect(() => {
     fetchRecommendations();
+    return subscribeAnalytics({
+      refetch: fetchRecommendations,
+      recommendations: (delta) => setData((rows) => {
+        const recommendations = applyDelta(rows, delta, "product").sort((a, b) => b.probability - a.probability);
+        updateStats(recommendations);
+        return recommendations;
+      })
+    });
   }, []);
 
+  const updateStats = (recommendations) => {
+    if (recommendations.length > 0) {
+      const totalSales = recommendations.reduce((sum, item) => sum + (item.avg_sales || 0), 0);
+      const avgConf = recommendations.reduce((sum, item) => sum + item.probability, 0) / recommendations.length;
+      
+      setStats({
+        totalSales: totalSales.toFixed(2),
+        avgConfidence: (avgConf * 100).toFixed(0),
+        topProduct: recommendations[0]?.product || "N/A"
+      });
+    }
+  };
+
   const fetchRecommendations = async () => {
     setLoading(true);
     try {
       const res = await axios.get("http://localhost:5000/recommendation");
       const recommendations = res.data.recommendations || [];
       setData(recommendations);
-      
-      // Calculate stats
-      if (recommendations.length > 0) {
-        const totalSales = recommendations.reduce((sum, item) => sum + (item.avg_sales || 0), 0);
-        const avgConf = recommendations.reduce((sum, item) => sum + item.probability, 0) / recommendations.length;
-        
-        setStats({
-          totalSales: totalSales.toFixed(2),
-          avgConfidence: (avgConf * 100).toFixed(0),
-          topProduct: recommendations[0]?.product || "N/A"
-        });
-      }
+      updateStats(recommendations);
     } catch (err) {
       console.error("Failed to load recommendations:", err);
       setData([]);
@@ -1,5 +1,6 @@
 import React, { useState } from "react";
 import axios from "axios";
+import { waitForJob } from "../jobs";
 
 export default function Export() {
   const [loading, setLoading] = useState(false);
@@ -11,7 +12,7 @@ export default function Export() {
 
     try {
       const token = localStorage.getItem("token");
-      const response = await axios.post(
+      let response = await axios.post(
         "http://127.0.0.1:5000/export/pdf",
         { type: reportType },
         {
@@ -20,6 +21,16 @@ export default function Export() {
         }
       );
 
+      // Reports not rendered yet come back as a background job
+      if (response.status === 202) {
+        const { job } = JSON.parse(await response.data.text());
+        const result = await waitForJob(job.id, token);
+        response = await axios.get(`http://127.0.0.1:5000${result.download}`, {
+          headers: { Authorization: `Bearer ${token}` },
+          responseType: "blob"
+        });
+      }
+
       // Create download link
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement("a");
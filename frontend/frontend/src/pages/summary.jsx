@@ -1,5 +1,6 @@
 import { useState } from "react";
 import axios from "axios";
+import { waitForJob } from "../jobs";
 
 function Summary() {
   const [inputText, setInputText] = useState("");
@@ -49,7 +50,8 @@ function Summary() {
       }
 
       const data = await response.json();
-      setResult(data);
+      // Long transcripts are summarized in the background
+      setResult(response.status === 202 ? await waitForJob(data.job.id, token) : data);
       
     } catch (err) {
       console.error("Summarize error:", err);
@@ -1 +1,10 @@
-
\ No newline at end of file
+"""Convenience wrapper: python upload_sales_data.py <file> from the repository root."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from upload_sales_data import main  # noqa: E402
+
+if __name__ == "__main__":
+    sys.exit(main())